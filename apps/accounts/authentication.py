@@ -0,0 +1,30 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .tokens import get_token_version, user_from_claims
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication backed by the signed authorization claims.
+
+    The user is rebuilt from the token instead of being loaded from the
+    database; only the token version is checked, and that is served from the
+    cache on the hot path.
+    """
+
+    def get_user(self, validated_token):
+        if 'user_type' not in validated_token or 'token_version' not in validated_token:
+            # Tokens issued before the claims were embedded
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        if get_token_version(user_id) != validated_token['token_version']:
+            raise InvalidToken(_("Token has been revoked"))
+
+        return user_from_claims(validated_token)
@@ -0,0 +1,14 @@
+import django_filters
+from .models import User
+
+
+class UserFilter(django_filters.FilterSet):
+    assigned_grocery = django_filters.NumberFilter(field_name='supplier_profile__assigned_grocery')
+    unassigned = django_filters.BooleanFilter(
+        field_name='supplier_profile__assigned_grocery',
+        lookup_expr='isnull'
+    )
+    
+    class Meta:
+        model = User
+        fields = ['user_type', 'is_active', 'assigned_grocery', 'unassigned']
@@ -0,0 +1,53 @@
+import csv
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.accounts.provisioning import provision_suppliers, reassign_suppliers
+
+
+class Command(BaseCommand):
+    help = (
+        "Create supplier accounts in bulk from a CSV or JSON file "
+        "(email, username, password, first_name, last_name, grocery_id, phone_number, hire_date). "
+        "With --reassign, move existing suppliers instead (user_id or email, grocery_id)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with a header row, or a JSON list of objects')
+        parser.add_argument('--reassign', action='store_true', help='Reassign existing suppliers to groceries')
+        parser.add_argument('--workers', type=int, default=None, help='Password hashing processes (default: SUPPLIER_PROVISIONING_WORKERS)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per transaction')
+
+    def handle(self, *args, **options):
+        rows = self.read_rows(Path(options['path']))
+        batch_size = options['batch_size']
+        total, failures = 0, 0
+
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            if options['reassign']:
+                done, errors = reassign_suppliers(batch)
+            else:
+                users, errors = provision_suppliers(batch, workers=options['workers'])
+                done = len(users)
+            total += done
+            failures += len(errors)
+            for error in errors:
+                self.stderr.write(f"row {start + error['row'] + 1}: {error['errors']}")
+
+        verb = 'Reassigned' if options['reassign'] else 'Created'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {total} suppliers, {failures} rows failed"))
+
+    def read_rows(self, path):
+        if not path.exists():
+            raise CommandError(f"{path} does not exist")
+        with path.open(newline='') as f:
+            if path.suffix == '.json':
+                rows = json.load(f)
+            else:
+                rows = list(csv.DictReader(f))
+        if not isinstance(rows, list):
+            raise CommandError("Expected a list of rows")
+        return rows
@@ -2,11 +2,12 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from apps.core.models import TimeStampedModel
+from apps.core.models import TimeStampedModel, FieldTrackerMixin
 from .managers import UserManager
+from .tokens import bump_token_versions
 
 
-class User(AbstractUser, TimeStampedModel):
+class User(FieldTrackerMixin, AbstractUser, TimeStampedModel):
     USER_TYPES = (
         ('admin', 'Admin'),
         ('supplier', 'Supplier'),
@@ -14,9 +15,16 @@ class User(AbstractUser, TimeStampedModel):
     
     email = models.EmailField(unique=True)
     user_type = models.CharField(max_length=10, choices=USER_TYPES)
+    token_version = models.PositiveIntegerField(
+        default=0,
+        help_text="Bumped to revoke every outstanding token of this user"
+    )
     
     objects = UserManager()
     
+    # Set on users rebuilt from token claims, which only carry some fields
+    from_claims = False
+    
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'user_type']
     
@@ -26,11 +34,26 @@ class User(AbstractUser, TimeStampedModel):
         indexes = [
             models.Index(fields=['email']),
             models.Index(fields=['user_type']),
+            models.Index(fields=['user_type', 'is_active']),
+            models.Index(fields=['is_active']),
         ]
     
     def __str__(self):
         return f"{self.get_full_name()} ({self.email})"
     
+    def save(self, *args, **kwargs):
+        if self.from_claims:
+            raise ValueError("Users built from token claims are partial; load the row before saving")
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # token_version only moves through bump_token_versions' F() update;
+            # an instance loaded before a revocation must not write it back
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname != 'token_version' and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+    
     def get_full_name(self):
         """Return the first_name plus the last_name, with a space in between"""
         full_name = f'{self.first_name} {self.last_name}'
@@ -44,7 +67,7 @@ class User(AbstractUser, TimeStampedModel):
     def is_supplier(self):
         return self.user_type == 'supplier'
 
-class AdminProfile(TimeStampedModel):
+class AdminProfile(FieldTrackerMixin, TimeStampedModel):
     user = models.OneToOneField(
         User, 
         on_delete=models.CASCADE, 
@@ -61,7 +84,7 @@ class AdminProfile(TimeStampedModel):
     def __str__(self):
         return f"Admin Profile: {self.user.get_full_name()}"
 
-class SupplierProfile(TimeStampedModel):
+class SupplierProfile(FieldTrackerMixin, TimeStampedModel):
     from apps.groceries.models import Grocery
     user = models.OneToOneField(
         User, 
@@ -79,10 +102,17 @@ class SupplierProfile(TimeStampedModel):
     phone_number = models.CharField(max_length=20, blank=True)
     hire_date = models.DateField(null=True, blank=True)
     
+    from_claims = False
+    
     class Meta:
         verbose_name = 'Supplier Profile'
         verbose_name_plural = 'Supplier Profiles'
     
+    def save(self, *args, **kwargs):
+        if self.from_claims:
+            raise ValueError("Profiles built from token claims are partial; load the row before saving")
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         grocery_name = self.assigned_grocery.name if self.assigned_grocery else "Unassigned"
         return f"Supplier: {self.user.get_full_name()} - {grocery_name}"
@@ -99,8 +129,29 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
-    """Save profile when user is saved"""
-    if instance.user_type == 'admin' and hasattr(instance, 'admin_profile'):
-        instance.admin_profile.save()
-    elif instance.user_type == 'supplier' and hasattr(instance, 'supplier_profile'):
-        instance.supplier_profile.save()
+    """Save the profile along with the user, only if it was loaded and modified"""
+    if instance.user_type == 'admin':
+        related = User.admin_profile.related
+    elif instance.user_type == 'supplier':
+        related = User.supplier_profile.related
+    else:
+        return
+    
+    # Checking the cache avoids the query a hasattr() lookup would issue
+    if related.is_cached(instance):
+        profile = related.get_cached_value(instance)
+        if profile is not None and profile.get_changed_fields():
+            profile.save()
+
+@receiver(post_save, sender=User)
+def revoke_tokens_on_role_change(sender, instance, created, **kwargs):
+    """Claims embed user_type, so role or activation changes revoke tokens"""
+    if not created and instance.has_changed('user_type', 'is_active'):
+        bump_token_versions([instance.pk])
+        instance.token_version += 1
+
+@receiver(post_save, sender=SupplierProfile)
+def revoke_tokens_on_reassignment(sender, instance, created, **kwargs):
+    """Claims embed assigned_grocery_id, so reassignment revokes tokens"""
+    if not created and instance.has_changed('assigned_grocery_id'):
+        bump_token_versions([instance.user_id])
@@ -0,0 +1,239 @@
+"""
+Bulk supplier provisioning.
+
+Password hashing (PBKDF2) dominates the cost of creating an account. The
+management command computes the hashes across a process pool; API requests
+hash a small batch in-process. Users and supplier profiles, including their
+grocery assignment, are then inserted with bulk_create. Invalid rows are
+reported by index instead of failing the whole batch.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from apps.groceries.models import Grocery
+from .models import User, SupplierProfile
+from .tokens import bump_token_versions
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def hash_passwords(passwords, workers=None):
+    """Hash raw passwords, in parallel when the batch is large enough"""
+    workers = workers or settings.SUPPLIER_PROVISIONING_WORKERS
+    if workers <= 1 or len(passwords) < settings.SUPPLIER_PROVISIONING_POOL_THRESHOLD:
+        return [make_password(password) for password in passwords]
+
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+
+def _clean_supplier_row(row, seen_emails, seen_usernames):
+    errors = {}
+    cleaned = {
+        'email': User.objects.normalize_email((row.get('email') or '').strip()),
+        'username': (row.get('username') or '').strip(),
+        'password': row.get('password') or '',
+        'first_name': (row.get('first_name') or '').strip(),
+        'last_name': (row.get('last_name') or '').strip(),
+        'phone_number': (row.get('phone_number') or '').strip(),
+        'grocery_id': row.get('grocery_id') or None,
+        'hire_date': None,
+    }
+
+    try:
+        validate_email(cleaned['email'])
+    except ValidationError:
+        errors['email'] = 'Invalid email format'
+    else:
+        if cleaned['email'].lower() in seen_emails:
+            errors['email'] = 'A user with this email already exists.'
+        seen_emails.add(cleaned['email'].lower())
+
+    if not cleaned['username']:
+        errors['username'] = 'This field is required.'
+    elif cleaned['username'] in seen_usernames:
+        errors['username'] = 'A user with that username already exists.'
+    seen_usernames.add(cleaned['username'])
+
+    if len(cleaned['password']) < 8:
+        errors['password'] = 'Ensure this field has at least 8 characters.'
+
+    if cleaned['grocery_id'] is not None:
+        try:
+            cleaned['grocery_id'] = int(cleaned['grocery_id'])
+        except (TypeError, ValueError):
+            errors['grocery_id'] = 'Invalid grocery id'
+
+    if row.get('hire_date'):
+        hire_date = row['hire_date']
+        cleaned['hire_date'] = hire_date if hasattr(hire_date, 'year') else parse_date(str(hire_date))
+        if cleaned['hire_date'] is None:
+            errors['hire_date'] = 'Invalid date format. Use YYYY-MM-DD'
+
+    return cleaned, errors
+
+
+def _create_suppliers(valid, hashes):
+    users = User.objects.bulk_create([
+        User(
+            email=cleaned['email'],
+            username=cleaned['username'],
+            password=password_hash,
+            first_name=cleaned['first_name'],
+            last_name=cleaned['last_name'],
+            user_type='supplier',
+        )
+        for (_, cleaned), password_hash in zip(valid, hashes)
+    ])
+    SupplierProfile.objects.bulk_create([
+        SupplierProfile(
+            user=user,
+            assigned_grocery_id=cleaned['grocery_id'],
+            phone_number=cleaned['phone_number'],
+            hire_date=cleaned['hire_date'],
+        )
+        for user, (_, cleaned) in zip(users, valid)
+    ])
+    return users
+
+
+def provision_suppliers(rows, workers=1):
+    """
+    Create supplier accounts in bulk.
+
+    Returns ``(users, errors)`` where ``errors`` is a list of
+    ``{'row': index, 'errors': {...}}`` for rows that were skipped.
+    Passwords are hashed in-process unless ``workers`` asks for a pool;
+    None uses SUPPLIER_PROVISIONING_WORKERS.
+    """
+    rows = list(rows)
+    emails = [User.objects.normalize_email((row.get('email') or '').strip()) for row in rows]
+    usernames = [(row.get('username') or '').strip() for row in rows]
+
+    seen_emails = {
+        email.lower() for email in
+        User.objects.filter(email__in=emails).values_list('email', flat=True)
+    }
+    seen_usernames = set(
+        User.objects.filter(username__in=usernames).values_list('username', flat=True)
+    )
+
+    cleaned_rows, errors = [], []
+    for index, row in enumerate(rows):
+        cleaned, row_errors = _clean_supplier_row(row, seen_emails, seen_usernames)
+        if row_errors:
+            errors.append({'row': index, 'errors': row_errors})
+        else:
+            cleaned_rows.append((index, cleaned))
+
+    grocery_ids = {c['grocery_id'] for _, c in cleaned_rows if c['grocery_id'] is not None}
+    existing_groceries = set(
+        Grocery.objects.filter(pk__in=grocery_ids).values_list('pk', flat=True)
+    )
+    valid = []
+    for index, cleaned in cleaned_rows:
+        if cleaned['grocery_id'] is not None and cleaned['grocery_id'] not in existing_groceries:
+            errors.append({'row': index, 'errors': {'grocery_id': 'Grocery not found'}})
+        else:
+            valid.append((index, cleaned))
+
+    if not valid:
+        errors.sort(key=lambda error: error['row'])
+        return [], errors
+
+    hashes = hash_passwords([cleaned['password'] for _, cleaned in valid], workers=workers)
+
+    try:
+        with transaction.atomic():
+            users = _create_suppliers(valid, hashes)
+    except IntegrityError:
+        # A concurrent request took some of the emails or usernames after
+        # they were checked; retry row by row to find which
+        users = []
+        for row, password_hash in zip(valid, hashes):
+            try:
+                with transaction.atomic():
+                    users.extend(_create_suppliers([row], [password_hash]))
+            except IntegrityError:
+                errors.append({'row': row[0], 'errors': {
+                    'non_field_errors': 'A user with this email or username already exists.'
+                }})
+    errors.sort(key=lambda error: error['row'])
+
+    return users, errors
+
+
+def reassign_suppliers(assignments):
+    """
+    Move suppliers between groceries in bulk.
+
+    ``assignments`` is a list of dicts with ``user_id`` or ``email`` and a
+    ``grocery_id`` (None to unassign). Issues one UPDATE per target grocery
+    and revokes the tokens of every supplier whose grocery changed.
+    Returns ``(updated_count, errors)``.
+    """
+    errors = []
+    cleaned = []
+    for index, assignment in enumerate(assignments):
+        try:
+            user_id = int(assignment['user_id']) if assignment.get('user_id') else None
+            grocery_id = int(assignment['grocery_id']) if assignment.get('grocery_id') else None
+        except (TypeError, ValueError):
+            errors.append({'row': index, 'errors': {'non_field_errors': 'Invalid id'}})
+            continue
+        email = User.objects.normalize_email((assignment.get('email') or '').strip())
+        cleaned.append((index, user_id, email, grocery_id))
+
+    current = SupplierProfile.objects.filter(user__user_type='supplier').filter(
+        Q(user_id__in=[user_id for _, user_id, _, _ in cleaned if user_id])
+        | Q(user__email__in=[email for _, user_id, email, _ in cleaned if not user_id])
+    ).values_list('user_id', 'user__email', 'assigned_grocery_id')
+    by_id, by_email = {}, {}
+    for user_id, email, grocery_id in current:
+        by_id[user_id] = by_email[email] = (user_id, grocery_id)
+
+    grocery_ids = {grocery_id for _, _, _, grocery_id in cleaned if grocery_id}
+    existing_groceries = set(
+        Grocery.objects.filter(pk__in=grocery_ids).values_list('pk', flat=True)
+    )
+
+    targets = {}
+    for index, user_id, email, grocery_id in cleaned:
+        match = by_id.get(user_id) if user_id else by_email.get(email)
+        if match is None:
+            errors.append({'row': index, 'errors': {'user': 'Supplier not found'}})
+            continue
+
+        if grocery_id is not None and grocery_id not in existing_groceries:
+            errors.append({'row': index, 'errors': {'grocery_id': 'Grocery not found'}})
+            continue
+
+        user_id, current_grocery_id = match
+        if current_grocery_id != grocery_id:
+            targets.setdefault(grocery_id, set()).add(user_id)
+
+    errors.sort(key=lambda error: error['row'])
+
+    changed = set()
+    now = timezone.now()
+    with transaction.atomic():
+        for grocery_id, ids in targets.items():
+            SupplierProfile.objects.filter(user_id__in=ids).update(
+                assigned_grocery_id=grocery_id, updated_at=now
+            )
+            changed.update(ids)
+        bump_token_versions(changed)
+
+    return len(changed), errors
@@ -1,6 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from .models import User, AdminProfile, SupplierProfile
+from .tokens import claims_for_user
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
@@ -72,3 +76,53 @@ class UserListSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'email', 'full_name', 'user_type', 'is_active', 'assigned_grocery']
+
+class UserSummarySerializer(serializers.ModelSerializer):
+    """Nested user for ?expand="""
+    full_name = serializers.CharField(source='get_full_name', read_only=True)
+    
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'full_name']
+
+class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Embed authorization claims in issued tokens"""
+    
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for claim, value in claims_for_user(user).items():
+            token[claim] = value
+        return token
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """Reject revoked refresh tokens and re-issue claims from the database"""
+    
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        
+        user = User.objects.select_related('supplier_profile').filter(
+            **{api_settings.USER_ID_FIELD: refresh.payload.get(api_settings.USER_ID_CLAIM)}
+        ).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(
+                self.error_messages['no_active_account'],
+                'no_active_account',
+            )
+        
+        version = refresh.payload.get('token_version')
+        if version is not None and version != user.token_version:
+            raise AuthenticationFailed('Token has been revoked', 'token_revoked')
+        
+        for claim, value in claims_for_user(user).items():
+            refresh[claim] = value
+        
+        data = {'access': str(refresh.access_token)}
+        
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        
+        return data
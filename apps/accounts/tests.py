@@ -1,3 +1,269 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.groceries.models import Grocery
+from .authentication import ClaimsJWTAuthentication
+from .models import SupplierProfile, User
+from .provisioning import hash_passwords, provision_suppliers, reassign_suppliers
+from .serializers import CustomTokenObtainPairSerializer
+from .tokens import bump_token_versions, get_token_version
+
+PASSWORD = 'claims-password'
+
+
+class ClaimsAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password=PASSWORD, user_type='admin')
+        cls.supplier = User.objects.create_user(
+            email='supplier@example.com', username='supplier', password=PASSWORD, user_type='supplier',
+            first_name='Sam')
+        cls.grocery, cls.other = Grocery.objects.bulk_create([
+            Grocery(name=name, location='Somewhere', created_by=cls.admin) for name in ('Grocery', 'Other')
+        ])
+        cls.supplier.supplier_profile.assigned_grocery = cls.grocery
+        cls.supplier.supplier_profile.save()
+
+    def setUp(self):
+        cache.clear()
+        # Cached token versions are keyed by user id, which later test databases reuse
+        self.addCleanup(cache.clear)
+        self.supplier.refresh_from_db()
+        self.refresh = CustomTokenObtainPairSerializer.get_token(self.supplier)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+        # Warm the token version cache, as on any long-running worker
+        get_token_version(self.supplier.pk)
+
+    def authenticate(self):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+        return ClaimsJWTAuthentication().authenticate(request)[0]
+
+    def test_claims_user_is_authenticated_without_queries(self):
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+
+        self.assertEqual(user.pk, self.supplier.pk)
+        self.assertEqual(user.user_type, 'supplier')
+        self.assertEqual(user.supplier_profile.assigned_grocery_id, self.grocery.pk)
+
+    def test_claims_user_cannot_be_saved(self):
+        user = self.authenticate()
+
+        with self.assertRaises(ValueError):
+            user.save()
+        with self.assertRaises(ValueError):
+            user.supplier_profile.save()
+        self.supplier.refresh_from_db()
+        self.assertEqual(self.supplier.first_name, 'Sam')
+        self.assertTrue(self.supplier.check_password(PASSWORD))
+
+    def test_reassignment_revokes_tokens(self):
+        self.assertEqual(self.client.get('/api/v1/auth/users/me/').status_code, 200)
+
+        profile = User.objects.get(pk=self.supplier.pk).supplier_profile
+        profile.assigned_grocery = self.other
+        profile.save()
+
+        self.assertEqual(self.client.get('/api/v1/auth/users/me/').status_code, 401)
+        self.assertEqual(User.objects.get(pk=self.supplier.pk).token_version, self.supplier.token_version + 1)
+
+    def test_role_change_revokes_tokens(self):
+        self.assertEqual(self.client.get('/api/v1/auth/users/me/').status_code, 200)
+
+        user = User.objects.get(pk=self.supplier.pk)
+        user.user_type = 'admin'
+        user.save()
+
+        self.assertEqual(self.client.get('/api/v1/auth/users/me/').status_code, 401)
+
+    def test_unrelated_change_keeps_tokens(self):
+        user = User.objects.get(pk=self.supplier.pk)
+        user.first_name = 'Samantha'
+        user.save()
+
+        self.assertEqual(self.client.get('/api/v1/auth/users/me/').status_code, 200)
+
+    def test_revoke_tokens(self):
+        self.assertEqual(self.client.get('/api/v1/auth/users/me/').status_code, 200)
+        admin = APIClient()
+        admin.force_authenticate(self.admin)
+
+        response = admin.post(f'/api/v1/auth/users/{self.supplier.pk}/revoke_tokens/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/v1/auth/users/me/').status_code, 401)
+        refused = APIClient().post('/api/v1/auth/refresh/', {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(refused.status_code, 401)
+
+    def test_stale_instance_saved_after_revocation_keeps_tokens_revoked(self):
+        stale = User.objects.get(pk=self.supplier.pk)
+        bump_token_versions([self.supplier.pk])
+
+        stale.first_name = 'Samantha'
+        stale.save()
+
+        user = User.objects.get(pk=self.supplier.pk)
+        self.assertEqual(user.first_name, 'Samantha')
+        self.assertEqual(user.token_version, self.supplier.token_version + 1)
+        cache.clear()
+        self.assertEqual(self.client.get('/api/v1/auth/users/me/').status_code, 401)
+
+    def test_refresh_reissues_claims_from_the_database(self):
+        User.objects.filter(pk=self.supplier.pk).update(username='renamed')
+
+        response = APIClient().post('/api/v1/auth/refresh/', {'refresh': str(self.refresh)}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        access = AccessToken(response.data['access'])
+        self.assertEqual(access['username'], 'renamed')
+        self.assertEqual(access['assigned_grocery_id'], self.grocery.pk)
+        self.assertEqual(access['token_version'], self.supplier.token_version)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ProvisioningTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password=PASSWORD, user_type='admin')
+        cls.grocery, cls.other = Grocery.objects.bulk_create([
+            Grocery(name=name, location='Somewhere', created_by=cls.admin) for name in ('Grocery', 'Other')
+        ])
+
+    def row(self, name, **fields):
+        return {'email': f'{name}@example.com', 'username': name, 'password': PASSWORD, **fields}
+
+    def test_invalid_rows_are_reported_by_index(self):
+        users, errors = provision_suppliers([
+            self.row('valid', grocery_id=self.grocery.pk, hire_date='2025-01-02'),
+            self.row('bad-email', email='not-an-email'),
+            self.row('admin'),
+            self.row('short', password='short'),
+            self.row('lost', grocery_id=999999),
+            self.row('valid', email='other@example.com'),
+            self.row('bad-date', hire_date='yesterday'),
+        ])
+
+        self.assertEqual([user.username for user in users], ['valid'])
+        self.assertEqual([(error['row'], sorted(error['errors'])) for error in errors], [
+            (1, ['email']), (2, ['email', 'username']), (3, ['password']),
+            (4, ['grocery_id']), (5, ['username']), (6, ['hire_date']),
+        ])
+        profile = SupplierProfile.objects.get(user__username='valid')
+        self.assertEqual(profile.assigned_grocery_id, self.grocery.pk)
+        self.assertEqual(str(profile.hire_date), '2025-01-02')
+        self.assertTrue(profile.user.check_password(PASSWORD))
+
+    def test_concurrently_taken_emails_fail_their_row_only(self):
+        def race(passwords, workers=None):
+            User.objects.create_user(
+                email='taken@example.com', username='racer', password=PASSWORD, user_type='supplier')
+            return hash_passwords(passwords, workers)
+
+        with mock.patch('apps.accounts.provisioning.hash_passwords', side_effect=race):
+            users, errors = provision_suppliers([self.row('first'), self.row('taken'), self.row('last')])
+
+        self.assertEqual([user.username for user in users], ['first', 'last'])
+        self.assertEqual([error['row'] for error in errors], [1])
+        self.assertEqual(SupplierProfile.objects.filter(user__username__in=['first', 'last']).count(), 2)
+
+    def test_api_refuses_batches_meant_for_the_command(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+
+        with self.settings(SUPPLIER_PROVISIONING_REQUEST_ROWS=2):
+            response = client.post('/api/v1/auth/users/bulk_create_suppliers/', {
+                'suppliers': [self.row(f'supplier-{n}') for n in range(3)],
+            }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(User.objects.filter(user_type='supplier').exists())
+
+    def test_bulk_reassignment_revokes_only_moved_suppliers(self):
+        users, _ = provision_suppliers([
+            self.row('moved', grocery_id=self.grocery.pk),
+            self.row('by-email', grocery_id=self.grocery.pk),
+            self.row('stays', grocery_id=self.other.pk),
+        ])
+        moved, by_email, stays = users
+
+        updated, errors = reassign_suppliers([
+            {'user_id': moved.pk, 'grocery_id': self.other.pk},
+            {'email': by_email.email, 'grocery_id': None},
+            {'user_id': stays.pk, 'grocery_id': self.other.pk},
+            {'user_id': self.admin.pk, 'grocery_id': self.other.pk},
+            {'user_id': moved.pk, 'grocery_id': 999999},
+            {'user_id': 'x'},
+        ])
+
+        self.assertEqual(updated, 2)
+        self.assertEqual([(error['row'], list(error['errors'])) for error in errors], [
+            (3, ['user']), (4, ['grocery_id']), (5, ['non_field_errors']),
+        ])
+        profiles = dict(SupplierProfile.objects.values_list('user_id', 'assigned_grocery_id'))
+        self.assertEqual(profiles, {moved.pk: self.other.pk, by_email.pk: None, stays.pk: self.other.pk})
+        versions = dict(User.objects.values_list('pk', 'token_version'))
+        self.assertEqual((versions[moved.pk], versions[by_email.pk], versions[stays.pk]), (1, 1, 0))
+
+
+class UserListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password=PASSWORD, user_type='admin')
+        cls.grocery, cls.other = Grocery.objects.bulk_create([
+            Grocery(name=name, location='Somewhere', created_by=cls.admin) for name in ('Grocery', 'Other')
+        ])
+        cls.assigned, cls.inactive, cls.unassigned = [
+            User.objects.create_user(
+                email=f'{name}@example.com', username=name, password=PASSWORD, user_type='supplier',
+                first_name=first_name)
+            for name, first_name in (('assigned', 'Ann'), ('inactive', 'Ian'), ('unassigned', 'Zed'))
+        ]
+        SupplierProfile.objects.filter(user=cls.assigned).update(assigned_grocery=cls.grocery)
+        SupplierProfile.objects.filter(user=cls.inactive).update(assigned_grocery=cls.other)
+        User.objects.filter(pk=cls.inactive.pk).update(is_active=False)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def ids(self, **params):
+        response = self.client.get('/api/v1/auth/users/', params)
+        self.assertEqual(response.status_code, 200)
+        return [user['id'] for user in response.data['results']]
+
+    def test_filters(self):
+        suppliers = {self.assigned.pk, self.inactive.pk, self.unassigned.pk}
+        self.assertEqual(set(self.ids(user_type='supplier')), suppliers)
+        self.assertEqual(self.ids(user_type='admin'), [self.admin.pk])
+        self.assertEqual(self.ids(is_active='false'), [self.inactive.pk])
+        self.assertEqual(self.ids(assigned_grocery=self.grocery.pk), [self.assigned.pk])
+        self.assertEqual(self.ids(user_type='supplier', unassigned='true'), [self.unassigned.pk])
+        self.assertEqual(set(self.ids(unassigned='false')), {self.assigned.pk, self.inactive.pk})
+
+    def test_search_and_ordering(self):
+        self.assertEqual(self.ids(search='zed'), [self.unassigned.pk])
+        self.assertEqual(self.ids(search='inactive@'), [self.inactive.pk])
+        self.assertEqual(
+            self.ids(ordering='email'),
+            [self.admin.pk, self.assigned.pk, self.inactive.pk, self.unassigned.pk],
+        )
+
+    def test_unchanged_profile_is_not_saved_with_the_user(self):
+        user = User.objects.select_related('supplier_profile').get(pk=self.assigned.pk)
+        user.first_name = 'Anna'
+
+        with self.assertNumQueries(1):
+            user.save()
+
+        user.supplier_profile.phone_number = '555-0100'
+        with self.assertNumQueries(2):
+            user.save()
+        self.assertEqual(SupplierProfile.objects.get(user=self.assigned).phone_number, '555-0100')
@@ -0,0 +1,93 @@
+"""
+Signed authorization claims carried in the JWTs.
+
+``user_type`` and ``assigned_grocery_id`` let requests authenticate without
+loading the user row; ``token_version`` is compared against the current
+version so tokens can be revoked when a supplier is reassigned, deactivated
+or explicitly logged out.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from rest_framework_simplejwt.settings import api_settings
+
+TOKEN_VERSION_CACHE_KEY = 'accounts:token_version:{}'
+
+
+def claims_for_user(user):
+    """Authorization claims to embed in tokens issued for ``user``"""
+    from .models import SupplierProfile
+
+    assigned_grocery_id = None
+    if user.user_type == 'supplier':
+        try:
+            assigned_grocery_id = user.supplier_profile.assigned_grocery_id
+        except SupplierProfile.DoesNotExist:
+            pass
+
+    return {
+        'user_type': user.user_type,
+        'assigned_grocery_id': assigned_grocery_id,
+        'token_version': user.token_version,
+        'email': user.email,
+        'username': user.username,
+    }
+
+
+def user_from_claims(token):
+    """
+    Build an in-memory user from validated token claims without a DB hit.
+
+    Only the claimed fields are set, so the user and its profile refuse to be
+    saved; load the row first to change it.
+    """
+    from .models import User, SupplierProfile
+
+    user = User(
+        # simplejwt stores the id claim as a string
+        pk=User._meta.pk.to_python(token[api_settings.USER_ID_CLAIM]),
+        email=token.get('email', ''),
+        username=token.get('username', ''),
+        user_type=token['user_type'],
+        token_version=token['token_version'],
+        is_active=True,
+    )
+    user._state.adding = False
+    user.from_claims = True
+
+    if user.user_type == 'supplier':
+        profile = SupplierProfile(user=user, assigned_grocery_id=token.get('assigned_grocery_id'))
+        profile._state.adding = False
+        profile.from_claims = True
+        profile._loaded_values = {'assigned_grocery_id': profile.assigned_grocery_id}
+        User.supplier_profile.related.set_cached_value(user, profile)
+    return user
+
+
+def get_token_version(user_id):
+    """Current token version for a user, or None if the user is gone or inactive"""
+    from .models import User
+
+    key = TOKEN_VERSION_CACHE_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = (
+            User.objects.filter(pk=user_id, is_active=True)
+            .values_list('token_version', flat=True)
+            .first()
+        )
+        if version is None:
+            return None
+        cache.set(key, version, settings.TOKEN_VERSION_CACHE_TIMEOUT)
+    return version
+
+
+def bump_token_versions(user_ids):
+    """Invalidate every outstanding token of the given users"""
+    from .models import User
+
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    User.objects.filter(pk__in=user_ids).update(token_version=F('token_version') + 1)
+    cache.delete_many([TOKEN_VERSION_CACHE_KEY.format(user_id) for user_id in user_ids])
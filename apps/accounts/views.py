@@ -1,30 +1,59 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.filters import SearchFilter, OrderingFilter
 from .models import User, SupplierProfile
-from .serializers import UserRegistrationSerializer, UserSerializer, SupplierProfileSerializer
+from .serializers import (
+    UserRegistrationSerializer, UserSerializer, SupplierProfileSerializer,
+    UserListSerializer, CustomTokenObtainPairSerializer
+)
+from .filters import UserFilter
+from .provisioning import provision_suppliers, reassign_suppliers
+from .tokens import bump_token_versions
+from apps.core.mixins import SparseFieldsetMixin
 from apps.core.permissions import IsAdminUser
 from apps.groceries.models import Grocery
 
 User = get_user_model()
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     Admin can CRUD all users
     Suppliers can only read their own profile
     """
-    queryset = User.objects.all()
+    queryset = User.objects.select_related(
+        'supplier_profile__assigned_grocery', 'admin_profile'
+    )
     serializer_class = UserSerializer
+    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filterset_class = UserFilter
+    search_fields = ['email', 'username', 'first_name', 'last_name']
+    ordering_fields = ['email', 'username', 'date_joined', 'created_at']
+    ordering = ['-created_at']
+    query_budgets = {
+        'list': 2, 'retrieve': 1, 'create': 8, 'update': 4, 'partial_update': 4,
+        'destroy': 14, 'me': 1, 'create_supplier': 12, 'assign_grocery': 6,
+        'revoke_tokens': 3, 'bulk_create_suppliers': 8, 'bulk_assign_groceries': 6,
+    }
     
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy', 'list']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'list',
+                           'bulk_create_suppliers', 'bulk_assign_groceries']:
             permission_classes = [IsAdminUser]
         else:
             permission_classes = [permissions.IsAuthenticated]
         return [permission() for permission in permission_classes]
     
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return UserListSerializer
+        return UserSerializer
+    
     @action(detail=False, methods=['post'])
     def create_supplier(self, request):
         """Admin creates supplier and assigns grocery"""
@@ -51,6 +80,39 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response(UserSerializer(user).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['post'])
+    def bulk_create_suppliers(self, request):
+        """Admin provisions many suppliers, with grocery assignment, in one request"""
+        rows = request.data.get('suppliers')
+        if not isinstance(rows, list) or not rows:
+            return Response({'error': 'suppliers must be a non-empty list'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > settings.SUPPLIER_PROVISIONING_REQUEST_ROWS:
+            # Each account costs a password hash; larger batches belong in
+            # the provision_suppliers management command
+            return Response({'error': f'At most {settings.SUPPLIER_PROVISIONING_REQUEST_ROWS} suppliers per request'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        users, errors = provision_suppliers(rows)
+        return Response({
+            'created': [{'id': user.id, 'email': user.email} for user in users],
+            'errors': errors,
+        }, status=status.HTTP_201_CREATED if users else status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=False, methods=['post'])
+    def bulk_assign_groceries(self, request):
+        """Admin reassigns many suppliers to groceries in one request"""
+        assignments = request.data.get('assignments')
+        if not isinstance(assignments, list) or not assignments:
+            return Response({'error': 'assignments must be a non-empty list'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        if len(assignments) > settings.SUPPLIER_PROVISIONING_MAX_ROWS:
+            return Response({'error': f'At most {settings.SUPPLIER_PROVISIONING_MAX_ROWS} assignments per request'}, 
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        updated, errors = reassign_suppliers(assignments)
+        return Response({'updated': updated, 'errors': errors})
+    
     @action(detail=True, methods=['post'])
     def assign_grocery(self, request, pk=None):
         """Admin assigns grocery to supplier"""
@@ -73,25 +135,44 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Grocery not found'}, 
                           status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=True, methods=['post'])
+    def revoke_tokens(self, request, pk=None):
+        """Admin invalidates every outstanding token of a user"""
+        if request.user.user_type != 'admin':
+            return Response({'error': 'Only admins can revoke tokens'}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        
+        user = self.get_object()
+        bump_token_versions([user.pk])
+        return Response({'message': 'Tokens revoked successfully'})
+    
     @action(detail=False, methods=['get'])
     def me(self, request):
         """Get current user profile"""
-        serializer = self.get_serializer(request.user)
+        # request.user may be rebuilt from token claims; load the full row
+        user = User.objects.select_related(
+            'supplier_profile__assigned_grocery', 'admin_profile'
+        ).get(pk=request.user.pk)
+        serializer = self.get_serializer(user)
         return Response(serializer.data)
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     """Custom login with user details"""
+    serializer_class = CustomTokenObtainPairSerializer
+    query_budgets = {'post': 5}
     
     def post(self, request, *args, **kwargs):
-        response = super().post(request, *args, **kwargs)
-        if response.status_code == 200:
-            from rest_framework_simplejwt.tokens import UntypedToken
-            from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-            try:
-                token = response.data['access']
-                user_id = UntypedToken(token)['user_id']
-                user = User.objects.get(id=user_id)
-                response.data['user'] = UserSerializer(user).data
-            except (InvalidToken, TokenError, User.DoesNotExist):
-                pass
-        return response
+        serializer = self.get_serializer(data=request.data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        
+        # The serializer already authenticated the user; reuse it
+        data = dict(serializer.validated_data)
+        data['user'] = UserSerializer(serializer.user).data
+        return Response(data, status=status.HTTP_200_OK)
+
+class CustomTokenRefreshView(TokenRefreshView):
+    """Token refresh that re-issues authorization claims"""
+    query_budgets = {'post': 1}
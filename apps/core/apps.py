@@ -5,3 +5,9 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.core'
     label = "core"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .instrumentation import install_query_recorder, instrument_serializers
+        connection_created.connect(install_query_recorder, dispatch_uid='core.install_query_recorder')
+        instrument_serializers()
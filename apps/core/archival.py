@@ -0,0 +1,44 @@
+"""
+Chunked archival of long-deleted rows.
+
+Soft-deleted rows past their retention period are copied into an archive
+table and removed from the hot table in small batches, each in its own short
+transaction, so no lock is held for longer than one batch.
+"""
+import time
+
+from django.db import transaction
+
+
+def purge_soft_deleted(queryset, archive_model, batch_size=500, pause=0.0, on_batch=None):
+    """
+    Archive and hard delete the rows of ``queryset`` batch by batch.
+
+    ``queryset`` selects the soft-deleted rows to purge (see
+    ``SoftDeleteQuerySet.deleted_before``). ``on_batch(ids)`` runs after each
+    committed batch. Returns the number of rows purged.
+    """
+    model = queryset.model
+    purged = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                queryset.select_for_update(skip_locked=True)
+                .order_by('pk').values()[:batch_size]
+            )
+            if not rows:
+                break
+            ids = [row['id'] for row in rows]
+            archive_model.objects.bulk_create(
+                [archive_model.from_row(row) for row in rows], ignore_conflicts=True
+            )
+            model.all_objects.filter(pk__in=ids, is_deleted=True).delete()
+
+        purged += len(ids)
+        if on_batch is not None:
+            on_batch(ids)
+        if len(rows) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return purged
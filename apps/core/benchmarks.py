@@ -0,0 +1,229 @@
+"""
+API benchmark scenarios and runner.
+
+Each scenario is requested through the Django test client against the
+current database (see the ``seed_benchmark_data`` command) and measured for
+p50/p95 latency, query count and peak Python memory. Results are written as
+a JSON baseline that later runs can be compared against. A scenario that
+gets any non-2xx response is reported as failed rather than timed.
+"""
+import asyncio
+import statistics
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, connections
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+
+from apps.groceries.models import Grocery
+from apps.items.models import Item
+from .compression import available_encodings, compress
+
+# (name, path); {grocery}, {item} and {sku} are filled from the seeded data
+SCENARIOS = [
+    ('items.list', '/api/v1/items/'),
+    ('items.list_filtered', '/api/v1/items/?grocery={grocery}&location=freezer&ordering=-price'),
+    ('items.search', '/api/v1/items/?search=Item%2012'),
+    ('items.retrieve', '/api/v1/items/{item}/'),
+    ('items.by_sku', '/api/v1/items/sku/{sku}/?grocery={grocery}'),
+    ('items.low_stock_items', '/api/v1/items/low_stock_items/'),
+    ('items.inventory_summary', '/api/v1/items/inventory_summary/'),
+    ('item_types.list', '/api/v1/items/types/'),
+    ('groceries.list', '/api/v1/groceries/'),
+    ('groceries.retrieve', '/api/v1/groceries/{grocery}/'),
+    ('groceries.suppliers', '/api/v1/groceries/{grocery}/suppliers/'),
+    ('groceries.analytics', '/api/v1/groceries/{grocery}/analytics/'),
+    ('income.list', '/api/v1/income/'),
+    ('income.analytics', '/api/v1/income/analytics/'),
+    ('income.monthly_report', '/api/v1/income/monthly_report/'),
+    ('income.weekly_trends', '/api/v1/income/weekly_trends/?weeks=12'),
+    ('users.list', '/api/v1/auth/users/'),
+]
+
+# Throttle classes are bound when the views are imported, so they cannot be
+# switched off with override_settings; buckets this large never refuse
+UNTHROTTLED_BUCKETS = {
+    bucket: {'capacity': 10 ** 9, 'rate': 10 ** 9}
+    for bucket in ('admin', 'supplier', 'grocery', 'anon')
+}
+
+# Pages compared across wire formats (run_format_benchmark)
+FORMAT_SCENARIOS = [
+    ('items.list', '/api/v1/items/'),
+    ('income.list', '/api/v1/income/'),
+]
+
+# (name, Accept, Accept-Encoding)
+FORMATS = [
+    ('json', 'application/json', 'identity'),
+    ('json+gzip', 'application/json', 'gzip'),
+    ('json+br', 'application/json', 'br'),
+    ('msgpack', 'application/msgpack', 'identity'),
+    ('msgpack+gzip', 'application/msgpack', 'gzip'),
+    ('msgpack+br', 'application/msgpack', 'br'),
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def scenario_context():
+    grocery = Grocery.objects.order_by('pk').values_list('pk', flat=True).first()
+    item, sku = Item.objects.filter(grocery_id=grocery).order_by('pk').values_list('pk', 'sku').first() or (None, None)
+    return {'grocery': grocery, 'item': item, 'sku': sku}
+
+
+def is_success(status_code):
+    return 200 <= status_code < 300
+
+
+def run_scenario(client, path, iterations, warmup):
+    statuses = [client.get(path).status_code for _ in range(warmup)]
+
+    timings, queries = [], []
+    for _ in range(iterations):
+        with CaptureQueriesContext(connections['default']) as captured:
+            start = time.perf_counter()
+            response = client.get(path)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(captured))
+        statuses.append(response.status_code)
+
+    # Measured separately, tracemalloc slows the timed runs down
+    tracemalloc.start()
+    statuses.append(client.get(path).status_code)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    failed = [status_code for status_code in statuses if not is_success(status_code)]
+    return {
+        # The first failure, so a throttled or broken scenario is never
+        # mistaken for a timed one
+        'status': failed[0] if failed else statuses[-1],
+        'errors': len(failed),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'queries': max(queries),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(user, iterations=20, warmup=2, only=None):
+    client = APIClient(raise_request_exception=False)
+    client.force_authenticate(user)
+    context = scenario_context()
+
+    results = {}
+    for name, path in SCENARIOS:
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        results[name] = run_scenario(client, path.format(**context), iterations, warmup)
+    return results
+
+
+def summarize_concurrent(timings, statuses, elapsed):
+    return {
+        'requests': len(timings),
+        'errors': sum(1 for status_code in statuses if not is_success(status_code)),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(timings) / elapsed, 1),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+    }
+
+
+def run_sync_concurrent(path, headers, requests, workers):
+    """Fire ``requests`` GETs through the WSGI handler from ``workers`` threads,
+    like a sync deployment with that many worker threads in total"""
+    def request(_):
+        client = Client(raise_request_exception=False)
+        start = time.perf_counter()
+        try:
+            response = client.get(path, headers=headers)
+        finally:
+            close_old_connections()
+        return (time.perf_counter() - start) * 1000, response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(request, range(requests)))
+    elapsed = time.perf_counter() - start
+    return summarize_concurrent([r[0] for r in results], [r[1] for r in results], elapsed)
+
+
+def run_async_concurrent(path, headers, requests, concurrency):
+    """Fire ``requests`` GETs through the ASGI handler on one event loop,
+    with at most ``concurrency`` in flight, like a single ASGI worker"""
+    async def main():
+        client = AsyncClient(raise_request_exception=False)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def request():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                return (time.perf_counter() - start) * 1000, response.status_code
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(request() for _ in range(requests)))
+        return results, time.perf_counter() - start
+
+    results, elapsed = asyncio.run(main())
+    return summarize_concurrent([r[0] for r in results], [r[1] for r in results], elapsed)
+
+
+def compare(baseline, current, threshold):
+    """
+    Regressions of ``current`` against ``baseline`` results.
+
+    Latency regresses when p95 grows by more than ``threshold`` percent;
+    any increase in query count is a regression.
+    """
+    regressions = []
+    for name, result in current.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result['queries'] > before['queries']:
+            regressions.append(f"{name}: queries {before['queries']} -> {result['queries']}")
+        if before['p95_ms'] and result['p95_ms'] > before['p95_ms'] * (1 + threshold / 100):
+            regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {result['p95_ms']}ms")
+    return regressions
+
+
+def run_format_benchmark(client, path, iterations):
+    """
+    Bytes on the wire and encoding CPU time (render + compress, mean ms) of
+    ``path`` in each of ``FORMATS`` the installation supports.
+    """
+    renderers = {renderer.media_type: renderer for renderer in api_settings.DEFAULT_RENDERER_CLASSES}
+    results = {}
+    for name, accept, encoding in FORMATS:
+        renderer_class = renderers.get(accept)
+        if renderer_class is None or (encoding != 'identity' and encoding not in available_encodings()):
+            continue
+        response = client.get(path, HTTP_ACCEPT=accept, HTTP_ACCEPT_ENCODING=encoding)
+        renderer = renderer_class()
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            content = renderer.render(response.data, accept)
+            if encoding != 'identity':
+                compress(content, encoding)
+        elapsed = time.perf_counter() - start
+
+        results[name] = {
+            'status': response.status_code,
+            'content_encoding': response.get('Content-Encoding', 'identity'),
+            'bytes': len(response.content),
+            'encode_ms': round(elapsed / iterations * 1000, 3),
+        }
+    return results
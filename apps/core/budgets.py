@@ -0,0 +1,31 @@
+"""
+Declarative per-action query budgets.
+
+Views declare the most queries an action may issue, independent of page
+size or row counts::
+
+    class ItemViewSet(...):
+        query_budgets = {'list': 4, 'retrieve': 2}
+
+Plain API views key their budgets by HTTP method instead of action. The
+budgets are asserted for every API route in the test suite and checked at
+runtime for sampled requests by ``ServerTimingMiddleware``.
+"""
+
+
+def get_view_action(request):
+    """(view class, action) for a resolved request, or (None, None)"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None, None
+    view_class = getattr(match.func, 'cls', None) or getattr(match.func, 'view_class', None)
+    if view_class is None:
+        return None, None
+    actions = getattr(match.func, 'actions', None) or {}
+    method = request.method.lower()
+    return view_class, actions.get(method, method)
+
+
+def get_query_budget(view_class, action):
+    """Declared budget for an action, or None if the view declares none"""
+    return getattr(view_class, 'query_budgets', {}).get(action)
@@ -0,0 +1,48 @@
+"""
+Response body compression (see ``CompressionMiddleware``).
+
+Brotli is used when the ``brotli`` package is installed and the client
+accepts it, gzip otherwise. Levels come from ``COMPRESSION_GZIP_LEVEL`` and
+``COMPRESSION_BROTLI_LEVEL``.
+"""
+import gzip
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip is always available
+    brotli = None
+
+
+def available_encodings():
+    """Supported encodings, most preferred first"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def accepted_encodings(header):
+    """Encodings an ``Accept-Encoding`` header allows (``q=0`` excludes one)"""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        quality = params.strip().removeprefix('q=')
+        if not coding or quality in ('0', '0.0', '0.00', '0.000'):
+            continue
+        accepted.add(coding)
+    return accepted
+
+
+def choose_encoding(header):
+    accepted = accepted_encodings(header)
+    for encoding in available_encodings():
+        if encoding in accepted or '*' in accepted:
+            return encoding
+    return None
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=settings.COMPRESSION_BROTLI_LEVEL)
+    # mtime=0 keeps identical bodies byte-identical
+    return gzip.compress(content, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
@@ -0,0 +1,119 @@
+"""
+Read-replica routing.
+
+Reads go to the primary unless the current request has opted into replica
+reads (see ``ReplicaReadMixin``). The choice lives in a context variable set
+per request, so ORM code does not need ``.using()`` anywhere. A replica is
+skipped while its replication lag exceeds ``REPLICA_MAX_LAG`` seconds, and
+requests pinned to the primary after the user's own write
+(``ReplicaRoutingMiddleware``) never read from a replica.
+"""
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = 'default'
+
+_read_target = ContextVar('db_read_target', default='primary')
+_pinned = ContextVar('db_pinned_to_primary', default=False)
+
+# alias -> (checked at, lag in seconds)
+_lag_cache = {}
+
+
+@contextmanager
+def read_from(target, pinned=False):
+    """Route reads in this context to 'primary' or 'replica'"""
+    target_token = _read_target.set(target)
+    pinned_token = _pinned.set(pinned)
+    try:
+        yield
+    finally:
+        _read_target.reset(target_token)
+        _pinned.reset(pinned_token)
+
+
+def use_replica():
+    """Send the rest of this context's reads to a replica, unless pinned"""
+    if not _pinned.get():
+        _read_target.set('replica')
+
+
+def is_pinned():
+    return _pinned.get()
+
+
+def replica_lag(alias):
+    """Replication lag of ``alias`` in seconds (inf if it cannot be checked)"""
+    connection = connections[alias]
+    try:
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT CASE WHEN pg_is_in_recovery() "
+                    "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+                    "ELSE 0 END"
+                )
+                return float(cursor.fetchone()[0])
+        if connection.vendor == 'sqlite':
+            # Local stand-in: the replica is a file copy of the primary (see
+            # sync_local_replica), so it lags by however long the primary has
+            # been modified since the copy was taken.
+            primary = os.path.getmtime(connections[PRIMARY].settings_dict['NAME'])
+            replica = os.path.getmtime(connection.settings_dict['NAME'])
+            return max(0.0, primary - replica)
+    except Exception as e:
+        logger.warning("Replica lag check failed for %s: %s", alias, e)
+        return float('inf')
+    return 0.0
+
+
+def get_replica_lag(alias):
+    """``replica_lag`` cached for ``REPLICA_LAG_CHECK_INTERVAL`` seconds"""
+    now = time.monotonic()
+    checked_at, lag = _lag_cache.get(alias, (None, None))
+    if checked_at is None or now - checked_at > settings.REPLICA_LAG_CHECK_INTERVAL:
+        lag = replica_lag(alias)
+        _lag_cache[alias] = (now, lag)
+    return lag
+
+
+def healthy_replicas():
+    return [
+        alias for alias in settings.DATABASE_REPLICAS
+        if get_replica_lag(alias) <= settings.REPLICA_MAX_LAG
+    ]
+
+
+class ReplicaRouter:
+    """Send opted-in reads to a healthy replica and everything else to the primary"""
+
+    def db_for_read(self, model, **hints):
+        if _read_target.get() != 'replica' or _pinned.get():
+            return PRIMARY
+        # Reads inside a write transaction must see its own changes
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        replicas = healthy_replicas()
+        return random.choice(replicas) if replicas else PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema through replication
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,263 @@
+"""
+Change events for the dashboard stream (``/api/v1/events/``).
+
+Writes publish small events once they commit: ``stock`` when an item's
+stock changes, ``low_stock`` when it crosses its reorder level and
+``income`` when a grocery's income for a day grows. Every worker keeps the
+latest ``SSE_BUFFER_SIZE`` events in a ``Hub`` that open streams read
+from, so a client resuming with ``Last-Event-ID`` is replayed what it
+missed, or told to ``reset`` (reload) if that has left the buffer.
+
+Without ``REDIS_URL`` events are added to the publishing process's hub
+directly, which only reaches streams served by the same process. With it
+they are appended to a capped Redis stream, and one task per worker reads
+the stream into the local hub, however many clients are connected.
+
+An idle connection costs a suspended generator and a future: a new event
+only wakes the streams of its grocery and the unscoped ones, and the
+frame is encoded once for all of them.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = 'events:stream'
+# Waiters for every grocery's events
+ALL = object()
+
+
+def parse_id(value):
+    """``'<ms>-<seq>'`` (a Redis stream id) as a comparable tuple, or None"""
+    try:
+        ms, seq = value.split('-')
+        return int(ms), int(seq)
+    except (AttributeError, ValueError):
+        return None
+
+
+class Event:
+    __slots__ = ('key', 'grocery_id', 'frame')
+
+    def __init__(self, event_id, grocery_id, type, data):
+        self.key = parse_id(event_id)
+        self.grocery_id = grocery_id
+        self.frame = f'id: {event_id}\nevent: {type}\ndata: {data}\n\n'.encode()
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class Hub:
+    """The worker's recent events and the streams waiting for more"""
+
+    def __init__(self, size, floor=(0, 0)):
+        self.size = size
+        self.events = deque()
+        # Key of the newest event no longer buffered; older cursors need a reset
+        self.floor = floor
+        self.waiters = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def last_key(self):
+        with self.lock:
+            return self.events[-1].key if self.events else self.floor
+
+    def add(self, event_id, grocery_id, type, data):
+        """Buffer an event, numbering it if ``event_id`` is None, and wake its streams"""
+        with self.lock:
+            last = self.events[-1].key if self.events else self.floor
+            if event_id is None:
+                key = max((int(time.time() * 1000), 0), (last[0], last[1] + 1))
+                event_id = f'{key[0]}-{key[1]}'
+            event = Event(event_id, grocery_id, type, data)
+            if event.key <= last:
+                # Already buffered (the stream was read again)
+                return
+            self.events.append(event)
+            while len(self.events) > self.size:
+                self.floor = self.events.popleft().key
+            woken = self.waiters.pop(grocery_id, set()) | self.waiters.pop(ALL, set())
+        for future in woken:
+            future.get_loop().call_soon_threadsafe(_wake, future)
+
+    def poll(self, key, grocery_id, loop):
+        """
+        Events after ``key`` for ``grocery_id`` (None for all) and None, or
+        no events and a future resolved by the next one. None if events
+        after ``key`` have already left the buffer.
+        """
+        with self.lock:
+            if key < self.floor:
+                return None
+            frames = []
+            for event in reversed(self.events):
+                if event.key <= key:
+                    break
+                if grocery_id is None or event.grocery_id == grocery_id:
+                    frames.append(event)
+            if frames:
+                frames.reverse()
+                return frames, None
+            future = loop.create_future()
+            self.waiters[ALL if grocery_id is None else grocery_id].add(future)
+            return [], future
+
+    def discard(self, future, grocery_id):
+        with self.lock:
+            self.waiters[ALL if grocery_id is None else grocery_id].discard(future)
+
+
+_hub = None
+_hub_lock = threading.Lock()
+# (event loop, task, primed future) reading the Redis stream into the hub
+_reader = None
+_redis = None
+
+
+def get_hub():
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            # Without Redis nothing from before this process can be replayed
+            floor = (0, 0) if settings.REDIS_URL else (int(time.time() * 1000), 0)
+            _hub = Hub(settings.SSE_BUFFER_SIZE, floor)
+        return _hub
+
+
+def clear():
+    global _hub, _reader
+    with _hub_lock:
+        _hub = None
+        if _reader is not None:
+            _reader[1].cancel()
+        _reader = None
+
+
+def _send(grocery_id, type, data):
+    data = json.dumps(data, cls=DjangoJSONEncoder)
+    if settings.REDIS_URL:
+        global _redis
+        import redis
+        try:
+            if _redis is None:
+                _redis = redis.Redis.from_url(settings.REDIS_URL)
+            _redis.xadd(STREAM_KEY, {'grocery': grocery_id, 'type': type, 'data': data},
+                        maxlen=settings.SSE_BUFFER_SIZE, approximate=True)
+        except redis.RedisError as e:
+            logger.warning("Event %s for grocery %s not published: %s", type, grocery_id, e)
+        return
+    get_hub().add(None, grocery_id, type, data)
+
+
+def publish(grocery_id, type, data):
+    """Send the event once the current transaction commits"""
+    transaction.on_commit(lambda: _send(grocery_id, type, data))
+
+
+def stock_changed(item_id, grocery_id, quantity, reorder_level, was_low=None):
+    """An item's new stock, and whether it became (or stopped being) low"""
+    publish(grocery_id, 'stock', {
+        'item': item_id, 'grocery': grocery_id, 'quantity_in_stock': quantity, 'reorder_level': reorder_level,
+    })
+    # Matches Item.is_low_stock; a new item only reports being low
+    low = quantity <= reorder_level
+    if low != bool(was_low):
+        publish(grocery_id, 'low_stock', {'item': item_id, 'grocery': grocery_id, 'low': low})
+
+
+def income_recorded(grocery_id, date, amount):
+    """``amount`` was added to the grocery's income for ``date``"""
+    publish(grocery_id, 'income', {'grocery': grocery_id, 'date': date, 'amount': amount})
+
+
+async def _read_stream(hub, primed):
+    import redis
+    import redis.asyncio
+
+    client = redis.asyncio.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    last_id = None
+    try:
+        while True:
+            try:
+                if last_id is None:
+                    # Fill the buffer first, so clients can resume on a fresh worker
+                    entries = await client.xrevrange(STREAM_KEY, count=hub.size)
+                    for entry_id, fields in reversed(entries):
+                        hub.add(entry_id, int(fields['grocery']), fields['type'], fields['data'])
+                    if len(entries) == hub.size:
+                        with hub.lock:
+                            hub.floor = max(hub.floor, parse_id(entries[-1][0]))
+                    last_id = entries[0][0] if entries else '0-0'
+                    _wake(primed)
+                response = await client.xread({STREAM_KEY: last_id}, count=1000, block=5000)
+            except redis.RedisError as e:
+                logger.warning("Event stream unavailable: %s", e)
+                _wake(primed)
+                await asyncio.sleep(1)
+                continue
+            for _, entries in response or ():
+                for entry_id, fields in entries:
+                    hub.add(entry_id, int(fields['grocery']), fields['type'], fields['data'])
+                    last_id = entry_id
+    finally:
+        await client.aclose()
+
+
+def _start_reader(hub):
+    """The future resolved once this worker's reader has filled the hub"""
+    global _reader
+    loop = asyncio.get_running_loop()
+    with _hub_lock:
+        if _reader is None or _reader[0] is not loop or _reader[1].done():
+            primed = loop.create_future()
+            _reader = (loop, loop.create_task(_read_stream(hub, primed)), primed)
+        return _reader[2]
+
+
+async def stream(grocery_id, last_event_id=None):
+    """
+    The SSE body for ``grocery_id`` (None for every grocery), starting after
+    ``last_event_id`` if given.
+    """
+    hub = get_hub()
+    if settings.REDIS_URL:
+        await asyncio.shield(_start_reader(hub))
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.SSE_MAX_DURATION
+    key = parse_id(last_event_id) if last_event_id else hub.last_key()
+    if key is None:
+        key = (0, 0)
+
+    yield f'retry: {settings.SSE_RETRY_MS}\n\n'.encode()
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            # Clients reconnect with Last-Event-ID, spreading streams over workers
+            return
+        result = hub.poll(key, grocery_id, loop)
+        if result is None:
+            key = hub.last_key()
+            yield b'event: reset\ndata: {}\n\n'
+            continue
+        events, future = result
+        if events:
+            key = events[-1].key
+            yield b''.join(event.frame for event in events)
+            continue
+        try:
+            done, _ = await asyncio.wait({future}, timeout=min(settings.SSE_HEARTBEAT, remaining))
+        finally:
+            hub.discard(future, grocery_id)
+        if not done:
+            yield b': keepalive\n\n'
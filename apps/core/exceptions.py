@@ -0,0 +1,19 @@
+class NPlusOneDetected(Exception):
+    """Raised when a request repeats the same query shape too many times"""
+
+    def __init__(self, path, repeated):
+        self.path = path
+        self.repeated = repeated
+        shapes = '; '.join(f'{count}x {shape[:200]}' for shape, count in repeated)
+        super().__init__(f"Suspected N+1 queries in {path}: {shapes}")
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a view action issues more queries than its declared budget"""
+
+    def __init__(self, view_name, action, budget, count):
+        self.view_name = view_name
+        self.action = action
+        self.budget = budget
+        self.count = count
+        super().__init__(f"{view_name}.{action} issued {count} queries, budget is {budget}")
@@ -0,0 +1,117 @@
+"""
+Sparse fieldsets (``?fields=``) and expansion (``?expand=``).
+
+``prune_fields`` trims a serializer to the requested fields and swaps
+expanded relations for the nested serializers a serializer declares in
+``Meta.expandable_fields``. ``restrict_queryset`` then reads the remaining
+fields' sources to join (``select_related``) and load (``only``) exactly
+the columns they use.
+
+Fields whose source is a property or method of the model rather than a
+column can declare the columns they read in ``Meta.field_sources``;
+without one, every column of that model is loaded.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.serializers import BaseSerializer
+
+
+def parse_list(value):
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+def prune_fields(serializer, fields=None, expand=()):
+    """Keep only ``fields`` (all if None) and expand the ``expand`` relations"""
+    meta = getattr(serializer, 'Meta', None)
+    expandable = getattr(meta, 'expandable_fields', {})
+    expanded = [name for name in expand if name in expandable]
+    for name in expanded:
+        serializer.fields[name] = expandable[name](read_only=True)
+    if fields is not None:
+        keep = set(fields) | set(expanded)
+        for name in list(serializer.fields):
+            if name not in keep:
+                serializer.fields.pop(name)
+    return serializer
+
+
+class _Columns:
+    """The select_related paths and only() columns a serializer reads"""
+    def __init__(self, queryset):
+        self.annotations = set(queryset.query.annotations)
+        self.related = set()
+        self.columns = {queryset.model._meta.pk.name}
+        # False once a root field reads something that is not a column
+        self.restricted = True
+
+    def add_serializer(self, serializer, model, prefix=''):
+        field_sources = getattr(getattr(serializer, 'Meta', None), 'field_sources', {})
+        for name, field in serializer.fields.items():
+            if isinstance(field, BaseSerializer) and field.source_attrs:
+                # An expanded or nested relation
+                if self.add_path(field.source_attrs, model, prefix, traverse=True):
+                    related_model = model
+                    for attr in field.source_attrs:
+                        related_model = related_model._meta.get_field(attr).related_model
+                    self.add_serializer(
+                        getattr(field, 'child', field), related_model,
+                        prefix + '__'.join(field.source_attrs) + '__',
+                    )
+                continue
+            if name in field_sources:
+                sources = [source.split('.') for source in field_sources[name]]
+            else:
+                sources = [field.source_attrs]
+            for attrs in sources:
+                self.add_path(attrs, model, prefix)
+
+    def add_path(self, attrs, model, prefix, traverse=False):
+        """Record what reading ``attrs`` off ``model`` needs; True if it is a relation"""
+        if not attrs:
+            # source='*' (method fields): anything on the object may be read
+            self.load_all(model, prefix)
+            return False
+        for index, attr in enumerate(attrs):
+            try:
+                field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                if not prefix and index == 0 and attr in self.annotations:
+                    return False
+                # A property or method of the model
+                self.load_all(model, prefix)
+                return False
+            last = index == len(attrs) - 1
+            if field.is_relation and (field.many_to_one or field.one_to_one):
+                if last and not traverse and field.concrete:
+                    self.columns.add(prefix + attr)
+                    return False
+                self.related.add(prefix + attr)
+                if field.concrete:
+                    self.columns.add(prefix + attr)
+                prefix, model = prefix + attr + '__', field.related_model
+                self.columns.add(prefix + model._meta.pk.name)
+                continue
+            if field.is_relation:
+                # Reverse or many-to-many relations are fetched separately
+                if not prefix:
+                    self.restricted = False
+                return False
+            self.columns.add(prefix + attr)
+            return False
+        return True
+
+    def load_all(self, model, prefix):
+        if not prefix:
+            self.restricted = False
+        self.columns.update(prefix + field.name for field in model._meta.concrete_fields)
+
+
+def restrict_queryset(queryset, serializer, extra_fields=()):
+    """Join and load only what ``serializer``'s fields read"""
+    columns = _Columns(queryset)
+    columns.add_serializer(serializer, queryset.model)
+    queryset = queryset.select_related(None)
+    if columns.related:
+        queryset = queryset.select_related(*sorted(columns.related))
+    if columns.restricted:
+        queryset = queryset.only(*sorted(columns.columns | set(extra_fields)))
+    return queryset
@@ -0,0 +1,160 @@
+"""
+Per-request performance counters.
+
+The active ``RequestProfile`` lives in a context variable so the database
+wrapper, the Neo4j connection, serializers, renderers and compression can
+record into it without threading the request through. Nothing is recorded
+outside a sampled request.
+
+Serialization covers ``serializer.data`` - where method fields and nested
+serializers run their queries, which therefore count towards both ``db``
+and ``serialize`` - and the renderer's encoding. Compression is reported
+on its own.
+"""
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current_profile = ContextVar('request_profile', default=None)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*(?:\?|%s)\s*,?)+\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def query_shape(sql):
+    """Normalize SQL so queries differing only in parameters compare equal"""
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_count = 0
+        self.db_time = 0.0
+        self.neo4j_count = 0
+        self.neo4j_time = 0.0
+        self.serialize_time = 0.0
+        self.compress_time = 0.0
+        # Set while timing serialization, so nested serializers count once
+        self.serializing = False
+        self.query_shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper (see ``connection.execute_wrapper``)"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.db_count += 1
+            self.query_shapes[query_shape(sql)] += 1
+
+    def repeated_queries(self, threshold):
+        """Query shapes executed at least ``threshold`` times"""
+        return [(shape, count) for shape, count in self.query_shapes.most_common() if count >= threshold]
+
+    def server_timing(self):
+        total = time.perf_counter() - self.started
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.db_count} queries"',
+            f'neo4j;dur={self.neo4j_time * 1000:.1f};desc="{self.neo4j_count} calls"',
+            f'serialize;dur={self.serialize_time * 1000:.1f}',
+            f'compress;dur={self.compress_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+
+def current_profile():
+    return _current_profile.get()
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper on every connection, recording into the active profile"""
+    profile = _current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile(execute, sql, params, many, context)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """``connection_created`` receiver; the profile follows the request context
+    into whichever thread runs its queries, including async ORM calls"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def profile_request():
+    profile = RequestProfile()
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+
+
+@contextmanager
+def record_neo4j():
+    """Time a Neo4j round trip against the active profile"""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.neo4j_time += time.perf_counter() - start
+        profile.neo4j_count += 1
+
+
+@contextmanager
+def record_serialization():
+    """Time serializer/renderer work against the active profile"""
+    profile = _current_profile.get()
+    if profile is None or profile.serializing:
+        yield
+        return
+    profile.serializing = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.serialize_time += time.perf_counter() - start
+        profile.serializing = False
+
+
+@contextmanager
+def record_compression():
+    """Time response compression against the active profile"""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.compress_time += time.perf_counter() - start
+
+
+def instrument_serializers():
+    """Time ``serializer.data`` (``Serializer`` and ``ListSerializer`` both defer to it)"""
+    from rest_framework.serializers import BaseSerializer
+
+    untimed = BaseSerializer.data.fget
+    if getattr(untimed, 'timed', False):
+        return
+
+    def data(self):
+        with record_serialization():
+            return untimed(self)
+    data.timed = True
+    BaseSerializer.data = property(data)
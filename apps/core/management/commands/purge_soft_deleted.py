@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from apps.core.archival import purge_soft_deleted
+from apps.groceries.models import Grocery, ArchivedGrocery
+from apps.income.models import DailyIncome, DailyIncomeTombstone
+from apps.items.models import Item, ArchivedItem, StockTransfer
+from apps.sales.models import Receipt
+
+
+class Command(BaseCommand):
+    help = (
+        "Move items and groceries soft deleted longer than the retention period "
+        "into the archive tables, in small batches, and drop delta sync "
+        "tombstones of the same age."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.SOFT_DELETE_RETENTION_DAYS,
+                            help='Purge rows deleted more than this many days ago')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to sleep between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be purged')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        items = Item.all_objects.deleted_before(cutoff)
+        # Groceries still referenced by income, receipts, transfers or items are kept
+        groceries = Grocery.all_objects.deleted_before(cutoff).exclude(
+            Exists(DailyIncome.objects.filter(grocery=OuterRef('pk')))
+        ).exclude(
+            Exists(Receipt.objects.filter(grocery=OuterRef('pk')))
+        ).exclude(
+            Exists(StockTransfer.objects.filter(Q(source=OuterRef('pk')) | Q(destination=OuterRef('pk'))))
+        ).exclude(
+            Exists(Item.all_objects.filter(grocery=OuterRef('pk')).exclude(
+                is_deleted=True, deleted_at__lt=cutoff
+            ))
+        )
+        tombstones = DailyIncomeTombstone.objects.filter(deleted_at__lt=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write(
+                f"Would purge {items.count()} items, {groceries.count()} groceries and "
+                f"{tombstones.count()} income tombstones deleted before {cutoff:%Y-%m-%d}"
+            )
+            return
+
+        from neo4j_integration.queries import GroceryGraphQueries
+
+        purged_items = purge_soft_deleted(
+            items, ArchivedItem, options['batch_size'], options['pause'],
+            on_batch=lambda ids: self.cleanup_graph(GroceryGraphQueries.delete_item_nodes, ids),
+        )
+        purged_groceries = purge_soft_deleted(
+            groceries, ArchivedGrocery, options['batch_size'], options['pause'],
+            on_batch=lambda ids: self.cleanup_graph(GroceryGraphQueries.delete_grocery_nodes, ids),
+        )
+        # Cursors this old are refused, so nothing reads these any more
+        purged_tombstones, _ = tombstones.delete()
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {purged_items} items and {purged_groceries} groceries, "
+            f"dropped {purged_tombstones} income tombstones"
+        ))
+
+    def cleanup_graph(self, delete_nodes, ids):
+        # Nodes are normally removed on soft delete; this catches any left over
+        try:
+            delete_nodes(ids)
+        except Exception as e:
+            self.stderr.write(f"Neo4j cleanup error: {e}")
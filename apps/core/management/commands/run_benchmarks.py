@@ -0,0 +1,95 @@
+import json
+import platform
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.core.benchmarks import UNTHROTTLED_BUCKETS, compare, run_benchmarks
+from apps.groceries.models import Grocery
+from apps.income.models import DailyIncome
+from apps.items.models import Item
+from .seed_benchmark_data import BENCHMARK_ADMIN_EMAIL
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the main API endpoints against the current database and write "
+        "p50/p95 latency, query counts and peak memory to a JSON baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='benchmark-results.json')
+        parser.add_argument('--baseline', help='Previous results to compare against')
+        parser.add_argument('--threshold', type=float, default=20.0, help='Allowed p95 growth in percent')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--user', default=BENCHMARK_ADMIN_EMAIL, help='Email of the user to run as')
+        parser.add_argument('--only', nargs='*', help='Scenario name prefixes, e.g. items income.analytics')
+        parser.add_argument('--graph', choices=['local', 'neo4j'], default='local',
+                            help='Graph backend; local is an in-process stand-in')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} not found; run seed_benchmark_data first")
+
+        # Server-Timing sampling would add overhead to every measured request,
+        # and throttled responses would be timed instead of the endpoints
+        with override_settings(
+            NEO4J_BACKEND=options['graph'],
+            SERVER_TIMING={'ENABLED': False},
+            THROTTLE_BUCKETS=UNTHROTTLED_BUCKETS,
+            ALLOWED_HOSTS=['testserver'],
+        ):
+            results = run_benchmarks(
+                user,
+                iterations=options['iterations'],
+                warmup=options['warmup'],
+                only=options['only'],
+            )
+
+        failed = {name: result for name, result in results.items() if result['errors']}
+        for name, result in failed.items():
+            self.stderr.write(f"{name}: {result['errors']} responses failed, first with status {result['status']}")
+        if failed:
+            raise CommandError(f"{len(failed)} scenarios failed; no results written")
+
+        payload = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'user_type': user.user_type,
+                'rows': {
+                    'groceries': Grocery.objects.count(),
+                    'items': Item.objects.count(),
+                    'daily_incomes': DailyIncome.objects.count(),
+                },
+            },
+            'results': results,
+        }
+        Path(options['output']).write_text(json.dumps(payload, indent=2))
+
+        self.stdout.write(f"{'scenario':32} {'status':>6} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8} {'peak KB':>9}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:32} {result['status']:>6} {result['p50_ms']:>9} {result['p95_ms']:>9} "
+                f"{result['queries']:>8} {result['peak_memory_kb']:>9}"
+            )
+        self.stdout.write(f"Results written to {options['output']}")
+
+        if options['baseline']:
+            baseline = json.loads(Path(options['baseline']).read_text())['results']
+            regressions = compare(baseline, results, options['threshold'])
+            for regression in regressions:
+                self.stderr.write(regression)
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"{len(regressions)} regressions against {options['baseline']}")
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS("No regressions against baseline"))
@@ -0,0 +1,77 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from apps.accounts.models import User
+from apps.accounts.serializers import CustomTokenObtainPairSerializer
+from apps.core.benchmarks import UNTHROTTLED_BUCKETS, run_async_concurrent, run_sync_concurrent, scenario_context
+from .seed_benchmark_data import BENCHMARK_ADMIN_EMAIL
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare concurrent throughput of the sync and async grocery analytics "
+        "endpoints against the local graph stand-in with simulated latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--concurrency', type=int, default=50,
+                            help='Requests in flight on the async path')
+        parser.add_argument('--sync-workers', type=int, default=1,
+                            help='Threads serving the sync path (1 = one sync gunicorn worker)')
+        parser.add_argument('--latency', type=float, default=0.05,
+                            help='Simulated graph round trip in seconds')
+        parser.add_argument('--user', default=BENCHMARK_ADMIN_EMAIL, help='Email of the user to run as')
+        parser.add_argument('--output', help='Write the results as JSON')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} not found; run seed_benchmark_data first")
+
+        grocery = scenario_context()['grocery']
+        if grocery is None:
+            raise CommandError("No groceries found; run seed_benchmark_data first")
+
+        token = CustomTokenObtainPairSerializer.get_token(user).access_token
+        headers = {'Authorization': f'Bearer {token}'}
+
+        with override_settings(
+            NEO4J_BACKEND='local',
+            NEO4J_LOCAL_LATENCY=options['latency'],
+            SERVER_TIMING={'ENABLED': False},
+            THROTTLE_BUCKETS=UNTHROTTLED_BUCKETS,
+            ALLOWED_HOSTS=['testserver'],
+        ):
+            results = {
+                'sync': run_sync_concurrent(
+                    f'/api/v1/groceries/{grocery}/analytics/', headers,
+                    options['requests'], options['sync_workers'],
+                ),
+                'async': run_async_concurrent(
+                    f'/api/v1/groceries/{grocery}/analytics/async/', headers,
+                    options['requests'], options['concurrency'],
+                ),
+            }
+
+        self.stdout.write(f"{'path':8} {'requests':>8} {'errors':>6} {'seconds':>8} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:8} {result['requests']:>8} {result['errors']:>6} {result['elapsed_s']:>8} "
+                f"{result['throughput_rps']:>8} {result['p50_ms']:>9} {result['p95_ms']:>9}"
+            )
+        failed = [name for name, result in results.items() if result['errors']]
+        if failed:
+            # Fast error responses would inflate the throughput
+            raise CommandError(f"Requests failed on the {' and '.join(failed)} path; throughput not compared")
+        speedup = results['async']['throughput_rps'] / results['sync']['throughput_rps']
+        self.stdout.write(f"Async throughput is {speedup:.1f}x sync")
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps({'options': {
+                key: options[key] for key in ('requests', 'concurrency', 'sync_workers', 'latency')
+            }, 'results': results}, indent=2))
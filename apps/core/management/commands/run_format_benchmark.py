@@ -0,0 +1,59 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.core.benchmarks import FORMAT_SCENARIOS, UNTHROTTLED_BUCKETS, is_success, run_format_benchmark
+from .seed_benchmark_data import BENCHMARK_ADMIN_EMAIL
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare bytes on the wire and encoding CPU cost of JSON and MessagePack, "
+        "plain and compressed, on the item and income list pages."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--user', default=BENCHMARK_ADMIN_EMAIL, help='Email of the user to run as')
+        parser.add_argument('--output', help='Write the results as JSON')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} not found; run seed_benchmark_data first")
+
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(user)
+        with override_settings(NEO4J_BACKEND='local', SERVER_TIMING={'ENABLED': False},
+                               THROTTLE_BUCKETS=UNTHROTTLED_BUCKETS, ALLOWED_HOSTS=['testserver']):
+            results = {
+                name: run_format_benchmark(client, path, options['iterations'])
+                for name, path in FORMAT_SCENARIOS
+            }
+
+        failed = [
+            f"{name} ({format_name}: {result['status']})"
+            for name, formats in results.items() for format_name, result in formats.items()
+            if not is_success(result['status'])
+        ]
+        if failed:
+            raise CommandError(f"Requests failed: {', '.join(failed)}")
+
+        self.stdout.write(f"{'scenario':14} {'format':14} {'status':>6} {'bytes':>9} {'vs json':>8} {'encode ms':>10}")
+        for name, formats in results.items():
+            baseline = formats['json']['bytes']
+            for format_name, result in formats.items():
+                self.stdout.write(
+                    f"{name:14} {format_name:14} {result['status']:>6} {result['bytes']:>9} "
+                    f"{result['bytes'] / baseline:>7.0%} {result['encode_ms']:>10}"
+                )
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps({
+                'options': {'iterations': options['iterations']}, 'results': results,
+            }, indent=2))
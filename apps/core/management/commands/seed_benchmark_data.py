@@ -0,0 +1,163 @@
+import random
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from apps.accounts.models import User, SupplierProfile
+from apps.groceries.models import Grocery
+from apps.income.models import DailyIncome
+from apps.items.models import Item, ItemType, StockTransfer
+from apps.sales.models import Receipt
+
+BENCHMARK_ADMIN_EMAIL = 'bench-admin@example.com'
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+
+def batched(iterable, size):
+    batch = []
+    for obj in iterable:
+        batch.append(obj)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a reproducible synthetic dataset for benchmarks: groceries, "
+        "suppliers, item types, items and daily income, inserted with bulk_create."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--groceries', type=int, default=20)
+        parser.add_argument('--suppliers-per-grocery', type=int, default=5)
+        parser.add_argument('--item-types', type=int, default=50)
+        parser.add_argument('--items', type=int, default=100_000, help='Total items across all groceries')
+        parser.add_argument('--income-days', type=int, default=730, help='Days of DailyIncome per grocery')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--clear', action='store_true', help='Delete previously seeded benchmark data first')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+
+        if options['clear']:
+            self.clear(batch_size)
+
+        # Tags this run's names, so seeding again without --clear adds a
+        # second dataset instead of hitting unique constraints
+        run = uuid.uuid4().hex[:8]
+
+        # Hash once; every seeded account shares the benchmark password
+        password = make_password(BENCHMARK_PASSWORD)
+        admin, _ = User.objects.get_or_create(
+            email=BENCHMARK_ADMIN_EMAIL,
+            defaults={'username': 'bench-admin', 'user_type': 'admin', 'password': password},
+        )
+
+        with transaction.atomic():
+            groceries = Grocery.objects.bulk_create([
+                Grocery(name=f'Bench Grocery {run}-{n}', location=f'Bench City {n % 7}', created_by=admin)
+                for n in range(options['groceries'])
+            ], batch_size=batch_size)
+            self.stdout.write(f"{len(groceries)} groceries")
+
+            suppliers = User.objects.bulk_create([
+                User(
+                    email=f'bench-supplier-{run}-{g}-{n}@example.com',
+                    username=f'bench-supplier-{run}-{g}-{n}',
+                    user_type='supplier',
+                    password=password,
+                )
+                for g in range(len(groceries))
+                for n in range(options['suppliers_per_grocery'])
+            ], batch_size=batch_size)
+            SupplierProfile.objects.bulk_create([
+                SupplierProfile(user=user, assigned_grocery=groceries[i // options['suppliers_per_grocery']])
+                for i, user in enumerate(suppliers)
+            ], batch_size=batch_size)
+            self.stdout.write(f"{len(suppliers)} suppliers")
+
+            item_types = ItemType.objects.bulk_create([
+                ItemType(name=f'Bench Type {run}-{n}', description='Synthetic benchmark item type')
+                for n in range(options['item_types'])
+            ], batch_size=batch_size)
+            self.stdout.write(f"{len(item_types)} item types")
+
+        locations = [choice for choice, _ in Item.LOCATION_CHOICES]
+        items = (
+            Item(
+                name=f'Bench Item {n}',
+                item_type=item_types[rng.randrange(len(item_types))],
+                location=locations[rng.randrange(len(locations))],
+                price=Decimal(rng.randrange(50, 50_000)) / 100,
+                grocery=groceries[n % len(groceries)],
+                added_by=admin,
+                sku=f'BENCH-{n:09d}',
+                quantity_in_stock=rng.randrange(0, 500),
+                reorder_level=rng.randrange(5, 50),
+            )
+            for n in range(options['items'])
+        )
+        created = 0
+        for batch in batched(items, batch_size):
+            with transaction.atomic():
+                Item.objects.bulk_create(batch)
+            created += len(batch)
+            self.stdout.write(f"\r{created} items", ending='')
+        self.stdout.write('')
+
+        today = date.today()
+        incomes = (
+            DailyIncome(
+                grocery=grocery,
+                date=today - timedelta(days=day),
+                amount=Decimal(rng.randrange(50_000, 2_000_000)) / 100,
+                recorded_by=admin,
+            )
+            for grocery in groceries
+            for day in range(options['income_days'])
+        )
+        created = 0
+        for batch in batched(incomes, batch_size):
+            with transaction.atomic():
+                DailyIncome.objects.bulk_create(batch)
+            created += len(batch)
+        self.stdout.write(f"{created} daily income records")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded benchmark data; log in as {BENCHMARK_ADMIN_EMAIL} / {BENCHMARK_PASSWORD}"
+        ))
+
+    def clear(self, batch_size):
+        """Delete seeded rows through the ORM, dependents first"""
+        groceries = Grocery.all_objects.filter(name__startswith='Bench Grocery ')
+        # Receipts and transfers protect their groceries; their lines cascade
+        Receipt.objects.filter(grocery__in=groceries).delete()
+        StockTransfer.objects.filter(Q(source__in=groceries) | Q(destination__in=groceries)).delete()
+        DailyIncome.objects.filter(grocery__in=groceries).delete()
+
+        # Seeded items never reached the graph; marking them deleted first
+        # lets the post_delete graph sync skip them
+        items = Item.all_objects.filter(grocery__in=groceries)
+        items.soft_delete()
+        while True:
+            ids = list(items.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                Item.all_objects.filter(pk__in=ids).delete()
+
+        # Snapshots and sales shards cascade from the groceries
+        groceries.delete()
+        ItemType.objects.filter(name__startswith='Bench Type ').delete()
+        User.objects.filter(email__startswith='bench-supplier-').delete()
+        self.stdout.write("Cleared previous benchmark data")
@@ -0,0 +1,38 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the SQLite primary into the local SQLite replica(s), standing in "
+        "for replication when testing replica routing locally."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--replica', action='append', help='Replica alias (default: all)')
+
+    def handle(self, *args, **options):
+        primary = connections['default'].settings_dict
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError("sync_local_replica only supports a SQLite primary")
+
+        aliases = options['replica'] or settings.DATABASE_REPLICAS
+        if not aliases:
+            raise CommandError("No replicas configured (set USE_SQLITE_REPLICA=True)")
+
+        for alias in aliases:
+            replica = settings.DATABASES[alias]
+            if replica['ENGINE'] != 'django.db.backends.sqlite3':
+                raise CommandError(f"Replica '{alias}' is not a SQLite database")
+            connections[alias].close()
+            source = sqlite3.connect(primary['NAME'])
+            target = sqlite3.connect(replica['NAME'])
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
+            self.stdout.write(self.style.SUCCESS(f"Synced {alias} from default"))
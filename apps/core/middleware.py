@@ -0,0 +1,203 @@
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from .budgets import get_query_budget, get_view_action
+from .compression import choose_encoding, compress
+from .db_routers import read_from
+from .exceptions import NPlusOneDetected, QueryBudgetExceeded
+from .instrumentation import profile_request, record_compression
+
+logger = logging.getLogger(__name__)
+
+
+class ServerTimingMiddleware:
+    """
+    Record DB, Neo4j, serialization and compression time for a sample of requests.
+
+    The totals are emitted as a ``Server-Timing`` header, and query shapes
+    repeated more than ``N_PLUS_ONE_THRESHOLD`` times are logged or raised
+    according to ``N_PLUS_ONE_ACTION`` (off / log / raise). Views that
+    declare ``query_budgets`` are checked the same way per
+    ``QUERY_BUDGET_ACTION``. Unsampled requests pass straight through.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        with profile_request() as profile:
+            response = self.get_response(request)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        with profile_request() as profile:
+            response = await self.get_response(request)
+        return self.finish(request, response, profile)
+
+    def sampled(self):
+        options = settings.SERVER_TIMING
+        return options['ENABLED'] and random.random() < options['SAMPLE_RATE']
+
+    def finish(self, request, response, profile):
+        options = settings.SERVER_TIMING
+        response['Server-Timing'] = profile.server_timing()
+        self.check_repeated_queries(request, profile, options)
+        self.check_query_budget(request, profile, options)
+        return response
+
+    def check_repeated_queries(self, request, profile, options):
+        action = options['N_PLUS_ONE_ACTION']
+        if action == 'off':
+            return
+        repeated = profile.repeated_queries(options['N_PLUS_ONE_THRESHOLD'])
+        if not repeated:
+            return
+        if action == 'raise':
+            raise NPlusOneDetected(request.path, repeated)
+        logger.warning(str(NPlusOneDetected(request.path, repeated)))
+
+    def check_query_budget(self, request, profile, options):
+        action = options['QUERY_BUDGET_ACTION']
+        if action == 'off':
+            return
+        view_class, view_action = get_view_action(request)
+        budget = get_query_budget(view_class, view_action)
+        if budget is None or profile.db_count <= budget:
+            return
+        error = QueryBudgetExceeded(view_class.__name__, view_action, budget, profile.db_count)
+        if action == 'raise':
+            raise error
+        logger.warning(str(error))
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Per-request replica routing state and read-your-writes stickiness.
+
+    Every request starts reading from the primary; views opt into replicas
+    (``ReplicaReadMixin``). After a successful write the client is pinned to
+    the primary for ``READ_YOUR_WRITES_SECONDS`` through a signed cookie and
+    an ``X-Read-Your-Writes`` header carrying the pin's expiry, which clients
+    that do not keep cookies can send back.
+    """
+    cookie_name = 'primary_pin'
+    header_name = 'X-Read-Your-Writes'
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Always scoped, so routing chosen by one request never leaks into the next
+        with read_from('primary', pinned=self.is_pinned(request)):
+            response = self.get_response(request)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        with read_from('primary', pinned=self.is_pinned(request)):
+            response = await self.get_response(request)
+        return self.finish(request, response)
+
+    def finish(self, request, response):
+        if (settings.DATABASE_REPLICAS and response.status_code < 400
+                and request.method not in ('GET', 'HEAD', 'OPTIONS')):
+            self.pin(response)
+        return response
+
+    def is_pinned(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return False
+        window = settings.READ_YOUR_WRITES_SECONDS
+        if request.get_signed_cookie(self.cookie_name, default=None, salt=self.cookie_name, max_age=window):
+            return True
+        try:
+            return float(request.headers.get(self.header_name, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def pin(self, response):
+        window = settings.READ_YOUR_WRITES_SECONDS
+        response.set_signed_cookie(
+            self.cookie_name, '1', salt=self.cookie_name, max_age=window,
+            httponly=True, samesite='Lax',
+        )
+        response[self.header_name] = f'{time.time() + window:.0f}'
+
+
+class CompressionMiddleware:
+    """
+    Compress API responses for clients that accept it.
+
+    Bodies of ``COMPRESSION_CONTENT_TYPES`` (JSON, MessagePack and the OpenAPI
+    schema by default) of at least ``COMPRESSION_MIN_SIZE`` bytes are sent
+    brotli- or gzip-encoded. Responses that already carry a
+    ``Content-Encoding`` - compressed files, or responses replayed from a
+    cache that stored the compressed variant - pass through untouched, so
+    nothing is compressed twice. Compression time is reported as ``compress``
+    in Server-Timing.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.finish(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.finish(request, await self.get_response(request))
+
+    def finish(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '').partition(';')[0].strip()
+        if not content_type.startswith(settings.COMPRESSION_CONTENT_TYPES):
+            return response
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        # The body depends on Accept-Encoding whether or not this client gets it compressed
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+
+        with record_compression():
+            compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # The representation changed, so a strong validator must become weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,354 @@
+import hashlib
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import BooleanField, Count, Max, Value
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import permissions, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.response import Response
+
+from . import sync
+from .db_routers import use_replica
+from .fieldsets import parse_list, prune_fields, restrict_queryset
+from .principal import get_principal
+from .values import values_serializer_for
+
+
+class ConditionalGetMixin:
+    """
+    Conditional GET support (ETag / Last-Modified / 304) for viewsets.
+
+    The list validator is built from max(updated_at), the row count and a
+    fingerprint of the query string, so an unchanged collection is answered
+    with 304 before anything is serialized. Detail views validate against the
+    object's own updated_at (see ``get_detail_validator``).
+
+    Representations that embed related rows (a grocery's name on an item)
+    list those relations in ``validator_related``; their max(updated_at) is
+    folded into both validators, so renaming the grocery changes the ETag.
+    """
+    conditional_actions = ('list', 'retrieve')
+    last_modified_field = 'updated_at'
+    validator_related = ()
+
+    def list(self, request, *args, **kwargs):
+        if 'list' not in self.conditional_actions:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        state = queryset.order_by().aggregate(
+            last_modified=Max(self.last_modified_field),
+            count=Count('pk'),
+            **{
+                f'{relation}_modified': Max(f'{relation}__{self.last_modified_field}')
+                for relation in self.validator_related
+            },
+        )
+        related = [state[f'{relation}_modified'] for relation in self.validator_related]
+        last_modified = _latest(state['last_modified'], *related)
+        etag = self._make_etag(
+            'list',
+            state['count'],
+            state['last_modified'],
+            *related,
+            sorted(request.query_params.lists()),
+        )
+        # Deleted rows do not move max(updated_at), so only the ETag (which
+        # includes the count) is trusted for collections.
+        if self._etag_matches(request, etag):
+            return self._not_modified(etag, last_modified)
+
+        response = super().list(request, *args, **kwargs)
+        return self._set_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        if 'retrieve' not in self.conditional_actions:
+            return super().retrieve(request, *args, **kwargs)
+
+        instance = self.get_object()
+        validator = self.get_detail_validator(instance)
+        last_modified = _latest(*(part for part in validator if isinstance(part, datetime)))
+        etag = self._make_etag('detail', *validator)
+
+        if self._etag_matches(request, etag) or self._not_modified_since(request, last_modified):
+            return self._not_modified(etag, last_modified)
+
+        serializer = self.get_serializer(instance)
+        response = Response(serializer.data)
+        return self._set_validators(response, etag, last_modified)
+
+    def get_detail_validator(self, instance):
+        """Values that change whenever the detail representation changes"""
+        related = (getattr(instance, relation) for relation in self.validator_related)
+        return (
+            instance.pk,
+            getattr(instance, self.last_modified_field, None),
+            *(getattr(row, self.last_modified_field, None) for row in related),
+        )
+
+    def _make_etag(self, *parts):
+        # JSON and MessagePack copies of a resource are different representations
+        renderer = getattr(self.request, 'accepted_renderer', None)
+        fingerprint = repr((type(self).__name__, self.request.user.pk, getattr(renderer, 'format', None)) + parts)
+        return quote_etag(hashlib.md5(fingerprint.encode()).hexdigest())
+
+    def _etag_matches(self, request, etag):
+        if_none_match = request.headers.get('If-None-Match')
+        if not if_none_match:
+            return False
+        etags = parse_etags(if_none_match)
+        if '*' in etags:
+            return True
+        bare = etag.removeprefix('W/')
+        return any(candidate.removeprefix('W/') == bare for candidate in etags)
+
+    def _not_modified_since(self, request, last_modified):
+        if last_modified is None or request.headers.get('If-None-Match'):
+            return False
+        since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        return since is not None and int(last_modified.timestamp()) <= since
+
+    def _not_modified(self, etag, last_modified):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        return self._set_validators(response, etag, last_modified)
+
+    def _set_validators(self, response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
+
+def _latest(*timestamps):
+    timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+    return max(timestamps) if timestamps else None
+
+
+class ReplicaReadMixin:
+    """
+    Serve ``replica_actions`` from a read replica.
+
+    Routing switches after authentication, so auth lookups still hit the
+    primary, and only for safe methods. Clients pinned after their own write
+    keep reading from the primary (see ``ReplicaRoutingMiddleware``).
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in permissions.SAFE_METHODS and self.action in self.replica_actions:
+            use_replica()
+
+
+class GroceryScopedMixin:
+    """
+    Supplier scoping from the request's memoized principal.
+
+    ``scope_queryset`` narrows a queryset to the supplier's grocery through
+    ``grocery_lookup`` and ``check_grocery_access`` rejects writes to any
+    other grocery, both from ids alone.
+    """
+    grocery_lookup = 'grocery_id'
+
+    @property
+    def principal(self):
+        return get_principal(self.request)
+
+    def scope_queryset(self, queryset):
+        return self.principal.scope(queryset, self.grocery_lookup)
+
+    def check_grocery_access(self, grocery_id, message="Cannot access other grocery stores"):
+        if not self.principal.can_access_grocery(grocery_id):
+            raise PermissionDenied(message)
+
+
+class SparseFieldsetMixin:
+    """
+    ``?fields=`` and ``?expand=`` on ``sparse_actions``.
+
+    ``fields`` keeps only the listed fields of the response; ``expand``
+    replaces a related id with the nested object (see the serializer's
+    ``Meta.expandable_fields``). The queryset joins and loads only what the
+    remaining fields read, so asking for plain columns is a single-table
+    query. Without either parameter nothing changes.
+    """
+    sparse_actions = ('list', 'retrieve')
+
+    def get_sparse_params(self):
+        """``(fields or None, expand)`` for this request, or None"""
+        request = self.request
+        if request is None or self.action not in self.sparse_actions:
+            return None
+        if request.method not in permissions.SAFE_METHODS:
+            return None
+        fields = parse_list(request.query_params.get('fields'))
+        expand = parse_list(request.query_params.get('expand'))
+        if not fields and not expand:
+            return None
+        return fields or None, expand
+
+    def get_sparse_serializer_class(self):
+        """Fields are picked from the full representation, not a lighter list serializer"""
+        return self.serializer_class
+
+    def get_serializer(self, *args, **kwargs):
+        params = self.get_sparse_params()
+        if params is None:
+            return super().get_serializer(*args, **kwargs)
+        kwargs.setdefault('context', self.get_serializer_context())
+        serializer = self.get_sparse_serializer_class()(*args, **kwargs)
+        prune_fields(getattr(serializer, 'child', serializer), *params)
+        return serializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.get_sparse_params()
+        if params is None:
+            return queryset
+        serializer = prune_fields(
+            self.get_sparse_serializer_class()(context=self.get_serializer_context()), *params
+        )
+        # Conditional GET validators read the last-modified column
+        extra_fields = [self.last_modified_field] if hasattr(self, 'last_modified_field') else []
+        return restrict_queryset(queryset, serializer, extra_fields)
+
+
+class ValuesListMixin:
+    """
+    Serve ``values_actions`` from ``values_list()`` rows.
+
+    When the action's serializer can be read from plain columns (see
+    ``apps.core.values``), the page is fetched as tuples and converted with
+    precomputed getters instead of building and serializing model
+    instances. The response is the same; other serializers, and sparse or
+    expanded requests, take the regular path.
+    """
+    values_actions = ('list',)
+
+    def get_values_serializer(self, queryset):
+        if self.action not in self.values_actions:
+            return None
+        sparse_params = getattr(self, 'get_sparse_params', None)
+        if sparse_params is not None and sparse_params() is not None:
+            return None
+        serializer = values_serializer_for(self.get_serializer_class())
+        if serializer is None or not serializer.supports(queryset):
+            return None
+        return serializer
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_values_serializer(queryset)
+        if serializer is None:
+            return super().list(request, *args, **kwargs)
+
+        rows = serializer.rows(queryset)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.to_representation(page))
+        return Response(serializer.to_representation(rows))
+
+
+class ChangesMixin:
+    """
+    Delta sync: ``changes/?since=<cursor>`` for a ``GroceryScopedMixin`` viewset.
+
+    Answers with the rows written since the cursor (``results``), the ids of
+    rows deleted since (``deleted``), the ``cursor`` to send next and
+    ``has_more`` while further pages are ready. Without ``since`` a full
+    sync of the active rows starts. Changes are read in ``(updated_at, id)``
+    order, deleted rows included, so an up-to-date device costs a single
+    index probe. Rows hard deleted by the model are reported from
+    ``get_tombstones`` (``original_id`` / ``deleted_at`` / ``grocery_id``).
+    """
+    changes_serializer_class = None
+
+    def get_changes_queryset(self):
+        """Rows to sync, deleted ones included"""
+        return self.scope_queryset(self.queryset.all())
+
+    def get_tombstones(self):
+        """Records of hard-deleted rows, or None"""
+        return None
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """Rows changed since ``since`` (see ``apps.core.sync``)"""
+        scope = sync.scope_of(self.principal)
+        cursor = None
+        if request.query_params.get('since'):
+            try:
+                cursor = sync.Cursor.parse(request.query_params['since'])
+                sync.check_cursor(cursor, scope)
+            except sync.InvalidCursor:
+                return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+            except sync.ExpiredCursor as e:
+                return Response({'error': f'{e}; sync again without since'}, status=status.HTTP_410_GONE)
+
+        horizon = sync.horizon()
+        limit = settings.SYNC_PAGE_SIZE
+        changes = self.read_changes(cursor, horizon, limit + 1)
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        if has_more:
+            next_cursor = sync.Cursor(changes[-1][0], changes[-1][1], scope)
+        elif cursor is not None and cursor.updated_at >= horizon:
+            # The horizon can trail a cursor if SYNC_COMMIT_LAG grew
+            next_cursor = cursor
+        else:
+            next_cursor = sync.Cursor(horizon, 0, scope)
+
+        serializer_class = self.changes_serializer_class or self.serializer_class
+        serializer = serializer_class(
+            [row for _, _, row in changes if row is not None], many=True,
+            context=self.get_serializer_context(),
+        )
+        return Response({
+            'cursor': str(next_cursor),
+            'has_more': has_more,
+            'results': serializer.data,
+            'deleted': [pk for _, pk, row in changes if row is None],
+        })
+
+    def read_changes(self, cursor, horizon, limit):
+        """Up to ``limit`` ``(updated_at, id, row or None if deleted)``, oldest first"""
+        queryset = self.get_changes_queryset().filter(updated_at__lt=horizon)
+        soft_deletes = any(field.name == 'is_deleted' for field in queryset.model._meta.concrete_fields)
+        tombstones = None
+        if cursor is None:
+            # A device starting from scratch has nothing to delete
+            if soft_deletes:
+                queryset = queryset.filter(is_deleted=False)
+        else:
+            queryset = queryset.filter(cursor.window())
+            tombstones = self.get_tombstones()
+
+        if tombstones is None:
+            rows = queryset.order_by('updated_at', 'id')[:limit]
+            return [
+                (row.updated_at, row.pk, None if soft_deletes and row.is_deleted else row)
+                for row in rows
+            ]
+
+        # Ids first, so nothing but the index is read when nothing changed
+        tombstones = tombstones.filter(deleted_at__lt=horizon).filter(cursor.window('deleted_at', 'original_id'))
+        keys = list(
+            queryset.order_by().values_list('updated_at', 'id', Value(False, output_field=BooleanField()))
+            .union(
+                tombstones.order_by().values_list('deleted_at', 'original_id', Value(True, output_field=BooleanField())),
+                all=True,
+            )
+            .order_by('updated_at', 'id')[:limit]
+        )
+        live = self.get_changes_queryset().in_bulk([pk for _, pk, deleted in keys if not deleted])
+        return [
+            (updated_at, pk, None if deleted else live[pk])
+            for updated_at, pk, deleted in keys
+            # Deleted since the ids were read; its tombstone comes next time
+            if deleted or pk in live
+        ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
 from django.utils import timezone
 
 class TimeStampedModel(models.Model):
@@ -9,7 +10,29 @@ class TimeStampedModel(models.Model):
     class Meta:
         abstract = True
 
-class SoftDeleteManager(models.Manager):
+class SoftDeleteQuerySet(models.QuerySet):
+    """Set-based soft delete and restore, one UPDATE per call"""
+    def _stamp(self, values):
+        if any(field.name == 'updated_at' for field in self.model._meta.concrete_fields):
+            values['updated_at'] = timezone.now()
+        return values
+    
+    def soft_delete(self, deleted_at=None):
+        """Mark every active row as deleted at the same instant"""
+        deleted_at = deleted_at or timezone.now()
+        return self.filter(is_deleted=False).update(
+            **self._stamp({'is_deleted': True, 'deleted_at': deleted_at})
+        )
+    
+    def restore(self):
+        return self.filter(is_deleted=True).update(
+            **self._stamp({'is_deleted': False, 'deleted_at': None})
+        )
+    
+    def deleted_before(self, cutoff):
+        return self.filter(is_deleted=True, deleted_at__lt=cutoff)
+
+class SoftDeleteManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
     """Manager for soft delete functionality"""
     def get_queryset(self):
         return super().get_queryset().filter(is_deleted=False)
@@ -20,17 +43,100 @@ class SoftDeleteModel(models.Model):
     deleted_at = models.DateTimeField(null=True, blank=True)
     
     objects = SoftDeleteManager()
-    all_objects = models.Manager()
+    all_objects = SoftDeleteQuerySet.as_manager()
     
     class Meta:
         abstract = True
     
     def soft_delete(self):
-        self.is_deleted = True
-        self.deleted_at = timezone.now()
-        self.save()
+        """Soft delete this row and whatever cascades from it"""
+        from .signals import soft_deleted
+        
+        deleted_at = timezone.now()
+        with transaction.atomic():
+            type(self).all_objects.filter(pk=self.pk).soft_delete(deleted_at)
+            self.soft_delete_related(deleted_at)
+        self.is_deleted, self.deleted_at = True, deleted_at
+        soft_deleted.send(sender=type(self), instance=self, deleted_at=deleted_at)
     
     def restore(self):
-        self.is_deleted = False
-        self.deleted_at = None
-        self.save()
+        """Restore this row and the rows its own soft delete cascaded to"""
+        from .signals import restored
+        
+        deleted_at = self.deleted_at
+        with transaction.atomic():
+            type(self).all_objects.filter(pk=self.pk).restore()
+            self.restore_related(deleted_at)
+        self.is_deleted, self.deleted_at = False, None
+        restored.send(sender=type(self), instance=self, deleted_at=deleted_at)
+    
+    def soft_delete_related(self, deleted_at):
+        """Hook for set-based cascades; rows share ``deleted_at`` with this one"""
+    
+    def restore_related(self, deleted_at):
+        """Hook to restore the rows cascaded at ``deleted_at``"""
+
+class ArchiveModel(models.Model):
+    """
+    Abstract cold-storage copy of a purged soft-deleted row.
+
+    ``archived_fields`` are copied into real columns for lookups; the whole
+    row is kept in ``data``.
+    """
+    original_id = models.BigIntegerField(unique=True)
+    deleted_at = models.DateTimeField(null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    
+    archived_fields = ()
+    
+    class Meta:
+        abstract = True
+    
+    @classmethod
+    def from_row(cls, row):
+        """Build an archive row from a ``values()`` dict of the original"""
+        return cls(
+            original_id=row['id'],
+            deleted_at=row['deleted_at'],
+            data=row,
+            **{field: row[field] for field in cls.archived_fields},
+        )
+
+class FieldTrackerMixin:
+    """Remember the values loaded from the database so changes can be detected"""
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values)
+            if value is not models.DEFERRED
+        }
+        return instance
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+    
+    def get_changed_fields(self):
+        """Attnames whose value differs from the loaded one (all if never loaded)"""
+        loaded = getattr(self, '_loaded_values', None)
+        fields = [f.attname for f in self._meta.concrete_fields if not f.primary_key]
+        if loaded is None:
+            return fields
+        return [f for f in fields if f in loaded and loaded[f] != getattr(self, f)]
+    
+    def has_changed(self, *fields):
+        """True if any of the given attnames differ from the loaded values"""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return True
+        return any(
+            field in loaded and loaded[field] != getattr(self, field)
+            for field in fields
+        )
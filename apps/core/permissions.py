@@ -1,4 +1,5 @@
 from rest_framework import permissions
+from .principal import get_principal
 
 class IsAdminUser(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -10,29 +11,16 @@ class IsSupplierUser(permissions.BasePermission):
 
 class IsSupplierOfGrocery(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        if request.user.user_type != 'supplier':
-            return False
-        
+        principal = get_principal(request)
         # Check if supplier is assigned to this grocery
-        try:
-            supplier_profile = request.user.supplier_profile
-            return supplier_profile.assigned_grocery == obj.grocery
-        except:
-            return False
+        return principal.is_supplier and principal.can_access_grocery(obj.grocery_id)
 
 class CanModifyGroceryItems(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        if request.user.user_type == 'admin':
+        principal = get_principal(request)
+        if principal.is_admin:
             return True
-        
-        if request.user.user_type == 'supplier':
-            try:
-                supplier_profile = request.user.supplier_profile
-                return supplier_profile.assigned_grocery == obj.grocery
-            except:
-                return False
-        
-        return False
+        return principal.is_supplier and principal.can_access_grocery(obj.grocery_id)
 
 
 class IsGroceryOwner(permissions.BasePermission):
@@ -0,0 +1,63 @@
+"""
+The requesting principal: user type and assigned grocery, resolved once.
+
+Views, serializers and permissions all need to know which grocery a
+supplier may touch. ``get_principal`` memoizes that on the request, so the
+supplier profile is read at most once per request (and not at all for
+users authenticated from token claims), and access checks compare ids
+instead of loading grocery rows.
+"""
+from django.core.exceptions import ObjectDoesNotExist
+
+
+class Principal:
+    def __init__(self, user_id=None, user_type=None, assigned_grocery_id=None):
+        self.user_id = user_id
+        self.user_type = user_type
+        self.assigned_grocery_id = assigned_grocery_id
+
+    @classmethod
+    def for_user(cls, user):
+        if not user or not user.is_authenticated:
+            return cls()
+        assigned_grocery_id = None
+        if user.user_type == 'supplier':
+            try:
+                assigned_grocery_id = user.supplier_profile.assigned_grocery_id
+            except ObjectDoesNotExist:
+                pass
+        return cls(user.pk, user.user_type, assigned_grocery_id)
+
+    def __repr__(self):
+        return f"<Principal {self.user_type}:{self.user_id} grocery={self.assigned_grocery_id}>"
+
+    @property
+    def is_admin(self):
+        return self.user_type == 'admin'
+
+    @property
+    def is_supplier(self):
+        return self.user_type == 'supplier'
+
+    def can_access_grocery(self, grocery_id):
+        """Suppliers are limited to their assigned grocery; others are not scoped"""
+        if not self.is_supplier:
+            return True
+        return self.assigned_grocery_id is not None and self.assigned_grocery_id == grocery_id
+
+    def scope(self, queryset, lookup='grocery_id'):
+        """Narrow a supplier's queryset to their grocery (nothing if unassigned)"""
+        if not self.is_supplier:
+            return queryset
+        if self.assigned_grocery_id is None:
+            return queryset.none()
+        return queryset.filter(**{lookup: self.assigned_grocery_id})
+
+
+def get_principal(request):
+    """The principal for ``request`` (a DRF or Django request), memoized on it"""
+    request = getattr(request, '_request', request)
+    principal = getattr(request, '_principal', None)
+    if principal is None or principal.user_id != getattr(request.user, 'pk', None):
+        principal = request._principal = Principal.for_user(request.user)
+    return principal
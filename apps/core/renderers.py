@@ -0,0 +1,105 @@
+import orjson
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+except ImportError:  # Optional; MessagePack is only offered when installed
+    msgpack = None
+
+from .instrumentation import record_serialization
+
+
+def vary_on_accept(renderer_context):
+    """The format is negotiated from Accept, so caches must key on it"""
+    response = (renderer_context or {}).get('response')
+    if response is not None:
+        patch_vary_headers(response, ('Accept',))
+
+
+def _floats_match(data):
+    """
+    Whether orjson spells every float in ``data`` as json.dumps does.
+
+    They agree on finite floats from 1e-4 up to 1e16; outside that range the
+    exponent is written differently, and orjson turns NaN and infinity into
+    null where the strict encoder raises.
+    """
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not (value == 0 or 1e-4 <= abs(value) < 1e16):
+                return False
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return True
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSON renderer encoding with orjson.
+
+    The output is byte-for-byte what ``JSONRenderer`` produces: datetimes
+    and dates go through DRF's encoder (which trims microseconds to
+    milliseconds and writes UTC as ``Z``), as do Decimals, lazy strings and
+    querysets. Anything orjson cannot encode (non-string keys, integers
+    beyond 64 bits), floats it would spell differently (exponents, NaN and
+    infinity), indented and ASCII-only output fall back to ``JSONRenderer``.
+    """
+    options = orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        vary_on_accept(renderer_context)
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type or '', renderer_context or {})
+        if self.compact and not self.ensure_ascii and not indent and _floats_match(data):
+            encode = self.encoder_class().default
+
+            def default(obj):
+                value = encode(obj)
+                if not _floats_match(value):
+                    raise TypeError
+                return value
+
+            try:
+                ret = orjson.dumps(data, default=default, option=self.options)
+            except orjson.JSONEncodeError:
+                pass
+            else:
+                # Like JSONRenderer, escape the separators that break JavaScript
+                return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class TimedJSONRenderer(ORJSONRenderer):
+    """JSON renderer whose encoding time is reported in Server-Timing"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with record_serialization():
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    MessagePack, for clients that sync large lists (``Accept: application/msgpack``
+    or ``?format=msgpack``).
+
+    Values JSON has no type for are encoded as in JSON: datetimes as ISO 8601
+    strings, Decimals as floats.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        vary_on_accept(renderer_context)
+        if data is None:
+            return b''
+        with record_serialization():
+            return msgpack.packb(data, default=JSONEncoder().default, use_bin_type=True, datetime=False)
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent by SoftDeleteModel.soft_delete / restore with ``instance`` and
+# ``deleted_at`` (for restore, the timestamp the row was deleted at).
+soft_deleted = Signal()
+restored = Signal()
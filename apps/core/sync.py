@@ -0,0 +1,79 @@
+"""
+Delta sync cursors.
+
+A device syncs a collection by paging through its rows in ``(updated_at,
+id)`` order and keeping the cursor of the last page. The cursor records
+the position reached and the supplier scope it was read under; a row that
+is written again moves past the cursor, so the next request picks it up.
+
+``updated_at`` is stamped when a row is written, not when its transaction
+commits, so a row stamped before a cursor could still commit after it was
+handed out. Pages therefore stop at a horizon ``SYNC_COMMIT_LAG`` seconds
+in the past: by the time the horizon passes a timestamp, every write
+stamped with it has committed, and the cursor only ever advances over
+committed rows.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class ExpiredCursor(Exception):
+    """The cursor can no longer be continued; the device must sync from scratch"""
+
+
+class Cursor:
+    def __init__(self, updated_at, last_id, scope):
+        self.updated_at = updated_at
+        self.last_id = last_id
+        self.scope = scope
+
+    def __str__(self):
+        micros = (self.updated_at - EPOCH) // timedelta(microseconds=1)
+        return f'{micros}.{self.last_id}.{self.scope}'
+
+    def __repr__(self):
+        return f'<Cursor {self}>'
+
+    @classmethod
+    def parse(cls, value):
+        try:
+            micros, last_id, scope = value.split('.')
+            return cls(EPOCH + timedelta(microseconds=int(micros)), int(last_id), scope)
+        except (ValueError, OverflowError):
+            raise InvalidCursor(value)
+
+    def window(self, timestamp_field='updated_at', id_field='id'):
+        """Rows after this cursor"""
+        return Q(**{f'{timestamp_field}__gte': self.updated_at}) & ~Q(**{
+            timestamp_field: self.updated_at, f'{id_field}__lte': self.last_id,
+        })
+
+
+def scope_of(principal):
+    """Cursors are only valid for the supplier grocery they were read in"""
+    if principal.is_supplier:
+        return str(principal.assigned_grocery_id or 0)
+    return 'all'
+
+
+def horizon():
+    """The latest ``updated_at`` whose writes have all committed"""
+    return timezone.now() - timedelta(seconds=settings.SYNC_COMMIT_LAG)
+
+
+def check_cursor(cursor, scope):
+    """Raise ``ExpiredCursor`` unless ``cursor`` can continue in ``scope``"""
+    if cursor.scope != scope:
+        raise ExpiredCursor("The cursor was issued for another grocery")
+    # Deletions older than the retention period may have been purged
+    if cursor.updated_at < timezone.now() - timedelta(days=settings.SOFT_DELETE_RETENTION_DAYS):
+        raise ExpiredCursor("The cursor is older than the deletion retention period")
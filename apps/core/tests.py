@@ -1,3 +1,1261 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import time
+from io import StringIO
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import skipIf
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.routers import APIRootView
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User, SupplierProfile
+from apps.accounts.serializers import CustomTokenObtainPairSerializer
+from apps.core import db_routers, events, sync, throttling, values
+from apps.core.archival import purge_soft_deleted
+from apps.core.budgets import get_query_budget
+from apps.core.db_routers import ReplicaRouter, read_from
+from apps.core.instrumentation import query_shape
+from apps.core.exceptions import NPlusOneDetected
+from apps.core.middleware import CompressionMiddleware, ServerTimingMiddleware
+from apps.core.renderers import ORJSONRenderer, msgpack
+from apps.groceries.models import ArchivedGrocery, Grocery
+from apps.income.models import DailyIncome
+from apps.income.views import DailyIncomeViewSet
+from apps.items import autocomplete, pos
+from apps.items.models import ArchivedItem, Item, ItemType, StockMovement, StockTransfer, StockTransferLine
+from apps.items.serializers import ItemListSerializer, ItemSerializer
+from apps.items.snapshots import take_inventory_snapshot
+from apps.items.views import ItemViewSet
+from apps.reports.models import ReportJob
+from apps.sales.ingest import ingest_receipts, rollup_sales_income
+from apps.sales.models import Receipt, ReceiptLine
+
+PASSWORD = 'budget-password'
+
+# Routes outside the API that are not subject to query budgets
+EXEMPT_PREFIXES = ('admin/', 'api/schema/')
+
+
+def api_routes(resolver=None, prefix=''):
+    """Yield (path regex, view class, {method: action}) for every API route"""
+    resolver = resolver or get_resolver()
+    for pattern in resolver.url_patterns:
+        route = prefix + str(pattern.pattern)
+        if route.startswith(EXEMPT_PREFIXES):
+            continue
+        if isinstance(pattern, URLResolver):
+            yield from api_routes(pattern, route)
+        elif isinstance(pattern, URLPattern):
+            if 'format' in pattern.pattern.regex.groupindex or 'format' in route:
+                continue
+            view_class = getattr(pattern.callback, 'cls', None) or getattr(pattern.callback, 'view_class', None)
+            if view_class is None or issubclass(view_class, APIRootView):
+                continue
+            actions = getattr(pattern.callback, 'actions', None) or {
+                method: method for method in view_class.http_method_names
+                if hasattr(view_class, method) and method not in ('options', 'head')
+            }
+            yield route, view_class, actions
+
+
+def since(scope='all'):
+    """A delta sync cursor from a day ago"""
+    return str(sync.Cursor(timezone.now() - timedelta(days=1), 0, scope))
+
+
+# (view class name, action) -> callable(test) returning (user, method, path, data)
+ROUTE_REQUESTS = {
+    ('UserViewSet', 'list'): lambda t: ('admin', 'get', '/api/v1/auth/users/', None),
+    ('UserViewSet', 'retrieve'): lambda t: ('admin', 'get', f'/api/v1/auth/users/{t.supplier.pk}/', None),
+    ('UserViewSet', 'me'): lambda t: ('supplier', 'get', '/api/v1/auth/users/me/', None),
+    ('UserViewSet', 'create'): lambda t: ('admin', 'post', '/api/v1/auth/users/', {
+        'email': 'created@example.com', 'username': 'created', 'user_type': 'supplier'}),
+    ('UserViewSet', 'update'): lambda t: ('admin', 'put', f'/api/v1/auth/users/{t.spare_user.pk}/', {
+        'email': t.spare_user.email, 'username': 'renamed', 'user_type': 'supplier'}),
+    ('UserViewSet', 'partial_update'): lambda t: ('admin', 'patch', f'/api/v1/auth/users/{t.spare_user.pk}/', {
+        'first_name': 'Patched'}),
+    ('UserViewSet', 'destroy'): lambda t: ('admin', 'delete', f'/api/v1/auth/users/{t.spare_user.pk}/', None),
+    ('UserViewSet', 'create_supplier'): lambda t: ('admin', 'post', '/api/v1/auth/users/create_supplier/', {
+        'email': 'new-supplier@example.com', 'username': 'new-supplier', 'user_type': 'supplier',
+        'password': PASSWORD, 'password_confirm': PASSWORD, 'grocery_id': t.grocery.pk}),
+    ('UserViewSet', 'assign_grocery'): lambda t: ('admin', 'post', f'/api/v1/auth/users/{t.spare_user.pk}/assign_grocery/', {
+        'grocery_id': t.other_grocery.pk}),
+    ('UserViewSet', 'revoke_tokens'): lambda t: ('admin', 'post', f'/api/v1/auth/users/{t.spare_user.pk}/revoke_tokens/', None),
+    ('UserViewSet', 'bulk_create_suppliers'): lambda t: ('admin', 'post', '/api/v1/auth/users/bulk_create_suppliers/', {
+        'suppliers': [
+            {'email': f'bulk-{n}@example.com', 'username': f'bulk-{n}', 'password': PASSWORD, 'grocery_id': t.grocery.pk}
+            for n in range(3)
+        ]}),
+    ('UserViewSet', 'bulk_assign_groceries'): lambda t: ('admin', 'post', '/api/v1/auth/users/bulk_assign_groceries/', {
+        'assignments': [{'user_id': t.spare_user.pk, 'grocery_id': t.other_grocery.pk}]}),
+    ('CustomTokenObtainPairView', 'post'): lambda t: (None, 'post', '/api/v1/auth/login/', {
+        'email': t.supplier.email, 'password': PASSWORD}),
+    ('CustomTokenRefreshView', 'post'): lambda t: (None, 'post', '/api/v1/auth/refresh/', {
+        'refresh': str(CustomTokenObtainPairSerializer.get_token(t.supplier))}),
+
+    ('GroceryViewSet', 'list'): lambda t: ('admin', 'get', '/api/v1/groceries/', None),
+    ('GroceryViewSet', 'retrieve'): lambda t: ('admin', 'get', f'/api/v1/groceries/{t.grocery.pk}/', None),
+    ('GroceryViewSet', 'create'): lambda t: ('admin', 'post', '/api/v1/groceries/', {
+        'name': 'Created Grocery', 'location': 'Somewhere'}),
+    ('GroceryViewSet', 'update'): lambda t: ('admin', 'put', f'/api/v1/groceries/{t.other_grocery.pk}/', {
+        'name': 'Renamed Grocery', 'location': 'Elsewhere'}),
+    ('GroceryViewSet', 'partial_update'): lambda t: ('admin', 'patch', f'/api/v1/groceries/{t.other_grocery.pk}/', {
+        'location': 'Patched'}),
+    ('GroceryViewSet', 'destroy'): lambda t: ('admin', 'delete', f'/api/v1/groceries/{t.empty_grocery.pk}/', None),
+    ('GroceryViewSet', 'restore'): lambda t: ('admin', 'post', f'/api/v1/groceries/{t.deleted_grocery.pk}/restore/', None),
+    ('GroceryViewSet', 'analytics'): lambda t: ('admin', 'get', f'/api/v1/groceries/{t.grocery.pk}/analytics/', None),
+    ('GroceryViewSet', 'my_grocery'): lambda t: ('supplier', 'get', '/api/v1/groceries/my_grocery/', None),
+    ('GroceryViewSet', 'suppliers'): lambda t: ('admin', 'get', f'/api/v1/groceries/{t.grocery.pk}/suppliers/', None),
+    ('GroceryViewSet', 'items'): lambda t: ('admin', 'get', f'/api/v1/groceries/{t.grocery.pk}/items/', None),
+    ('GroceryViewSet', 'changes'): lambda t: ('admin', 'get', '/api/v1/groceries/changes/', {'since': since()}),
+    ('GroceryAnalyticsView', 'get'): lambda t: ('supplier', 'get', f'/api/v1/groceries/{t.grocery.pk}/analytics/async/', None),
+    ('EventStreamView', 'get'): lambda t: ('supplier', 'get', '/api/v1/events/', None),
+
+    ('ItemTypeViewSet', 'list'): lambda t: ('admin', 'get', '/api/v1/items/types/', None),
+    ('ItemTypeViewSet', 'retrieve'): lambda t: ('admin', 'get', f'/api/v1/items/types/{t.item_type.pk}/', None),
+    ('ItemTypeViewSet', 'create'): lambda t: ('admin', 'post', '/api/v1/items/types/', {'name': 'Created Type'}),
+    ('ItemTypeViewSet', 'update'): lambda t: ('admin', 'put', f'/api/v1/items/types/{t.empty_type.pk}/', {
+        'name': 'Renamed Type', 'description': 'Renamed'}),
+    ('ItemTypeViewSet', 'partial_update'): lambda t: ('admin', 'patch', f'/api/v1/items/types/{t.empty_type.pk}/', {
+        'description': 'Patched'}),
+    ('ItemTypeViewSet', 'destroy'): lambda t: ('admin', 'delete', f'/api/v1/items/types/{t.empty_type.pk}/', None),
+    ('ItemTypeViewSet', 'items'): lambda t: ('admin', 'get', f'/api/v1/items/types/{t.item_type.pk}/items/', None),
+
+    ('ItemViewSet', 'list'): lambda t: ('admin', 'get', '/api/v1/items/', None),
+    ('ItemViewSet', 'retrieve'): lambda t: ('admin', 'get', f'/api/v1/items/{t.item.pk}/', None),
+    ('ItemViewSet', 'create'): lambda t: ('supplier', 'post', '/api/v1/items/', {
+        'name': 'Created Item', 'item_type': t.item_type.pk, 'location': 'freezer', 'price': '2.50',
+        'grocery': t.grocery.pk, 'sku': 'CREATED-1', 'quantity_in_stock': 5}),
+    ('ItemViewSet', 'update'): lambda t: ('supplier', 'put', f'/api/v1/items/{t.item.pk}/', {
+        'name': t.item.name, 'item_type': t.item_type.pk, 'location': 'display', 'price': '3.00',
+        'sku': t.item.sku, 'quantity_in_stock': 7, 'reorder_level': 3}),
+    ('ItemViewSet', 'partial_update'): lambda t: ('supplier', 'patch', f'/api/v1/items/{t.item.pk}/', {
+        'price': '4.00'}),
+    ('ItemViewSet', 'destroy'): lambda t: ('supplier', 'delete', f'/api/v1/items/{t.item.pk}/', None),
+    ('ItemViewSet', 'restore'): lambda t: ('admin', 'post', f'/api/v1/items/{t.deleted_item.pk}/restore/', None),
+    ('ItemViewSet', 'update_stock'): lambda t: ('supplier', 'post', f'/api/v1/items/{t.item.pk}/update_stock/', {
+        'quantity': 42}),
+    ('ItemViewSet', 'my_grocery_items'): lambda t: ('supplier', 'get', '/api/v1/items/my_grocery_items/', None),
+    ('ItemViewSet', 'low_stock_items'): lambda t: ('admin', 'get', '/api/v1/items/low_stock_items/', None),
+    ('ItemViewSet', 'inventory_summary'): lambda t: ('admin', 'get', '/api/v1/items/inventory_summary/', None),
+    ('ItemViewSet', 'by_sku'): lambda t: ('supplier', 'get', f'/api/v1/items/sku/{t.item.sku}/', None),
+    ('ItemViewSet', 'sku_lookup'): lambda t: ('admin', 'post', '/api/v1/items/sku_lookup/', {
+        'grocery': t.grocery.pk, 'skus': [t.item.sku, 'UNKNOWN']}),
+    ('ItemViewSet', 'price_basket'): lambda t: ('supplier', 'post', '/api/v1/items/price_basket/', {
+        'lines': [{'sku': t.item.sku, 'quantity': 2}, {'sku': 'UNKNOWN'}]}),
+    ('ItemViewSet', 'autocomplete'): lambda t: ('supplier', 'get', f'/api/v1/items/autocomplete/?q={t.item.name[:3]}', None),
+    ('ItemViewSet', 'inventory_cube'): lambda t: ('supplier', 'get', '/api/v1/items/inventory_cube/', None),
+    ('ItemViewSet', 'changes'): lambda t: ('supplier', 'get', '/api/v1/items/changes/', None),
+    ('ItemViewSet', 'reorder_suggestions'): lambda t: ('supplier', 'get', '/api/v1/items/reorder_suggestions/', None),
+    ('ItemViewSet', 'inventory_trends'): lambda t: ('admin', 'get', '/api/v1/items/inventory_trends/?group_by=grocery', None),
+
+    ('StockTransferViewSet', 'list'): lambda t: ('supplier', 'get', '/api/v1/items/transfers/', None),
+    ('StockTransferViewSet', 'retrieve'): lambda t: ('supplier', 'get', f'/api/v1/items/transfers/{t.stock_transfer.pk}/', None),
+    ('StockTransferViewSet', 'create'): lambda t: ('supplier', 'post', '/api/v1/items/transfers/', {
+        'destination': t.other_grocery.pk, 'lines': [{'item': t.item.pk, 'quantity': 2}]}),
+
+    ('DailyIncomeViewSet', 'list'): lambda t: ('supplier', 'get', '/api/v1/income/', None),
+    ('DailyIncomeViewSet', 'retrieve'): lambda t: ('admin', 'get', f'/api/v1/income/{t.income.pk}/', None),
+    ('DailyIncomeViewSet', 'create'): lambda t: ('supplier', 'post', '/api/v1/income/', {
+        'grocery': t.grocery.pk, 'date': (date.today() - timedelta(days=900)).isoformat(), 'amount': '10.00'}),
+    ('DailyIncomeViewSet', 'update'): lambda t: ('admin', 'put', f'/api/v1/income/{t.income.pk}/', {
+        'grocery': t.grocery.pk, 'date': t.income.date.isoformat(), 'amount': '11.00', 'notes': 'Updated'}),
+    ('DailyIncomeViewSet', 'partial_update'): lambda t: ('admin', 'patch', f'/api/v1/income/{t.income.pk}/', {
+        'notes': 'Patched'}),
+    ('DailyIncomeViewSet', 'destroy'): lambda t: ('admin', 'delete', f'/api/v1/income/{t.spare_income.pk}/', None),
+    ('DailyIncomeViewSet', 'analytics'): lambda t: ('admin', 'get', '/api/v1/income/analytics/', None),
+    ('DailyIncomeViewSet', 'monthly_report'): lambda t: ('admin', 'get', '/api/v1/income/monthly_report/', None),
+    ('DailyIncomeViewSet', 'weekly_trends'): lambda t: ('admin', 'get', '/api/v1/income/weekly_trends/', None),
+    ('DailyIncomeViewSet', 'my_income_summary'): lambda t: ('supplier', 'get', '/api/v1/income/my_income_summary/', None),
+    ('DailyIncomeViewSet', 'changes'): lambda t: ('supplier', 'get', '/api/v1/income/changes/', {
+        'since': since(str(t.grocery.pk))}),
+
+    ('ReportJobViewSet', 'list'): lambda t: ('admin', 'get', '/api/v1/reports/', None),
+    ('ReportJobViewSet', 'retrieve'): lambda t: ('supplier', 'get', f'/api/v1/reports/{t.report_job.pk}/', None),
+    ('ReportJobViewSet', 'create'): lambda t: ('supplier', 'post', '/api/v1/reports/', {
+        'report_type': 'items.inventory_summary'}),
+    ('ReportJobViewSet', 'download'): lambda t: ('supplier', 'get', f'/api/v1/reports/{t.report_job.pk}/download/', None),
+    ('ReportJobWaitView', 'get'): lambda t: ('supplier', 'get', f'/api/v1/reports/{t.report_job.pk}/wait/', None),
+
+    ('ReceiptViewSet', 'list'): lambda t: ('supplier', 'get', '/api/v1/sales/', None),
+    ('ReceiptViewSet', 'retrieve'): lambda t: ('supplier', 'get', f'/api/v1/sales/{t.receipt.pk}/', None),
+    ('ReceiptViewSet', 'create'): lambda t: ('supplier', 'post', '/api/v1/sales/', {'receipts': [
+        {'receipt_id': 'budget-1', 'till_id': 'till-1', 'lines': [
+            {'sku': t.item.sku, 'quantity': 1}, {'item': t.item.pk, 'quantity': 2, 'unit_price': '1.00'}]},
+        {'receipt_id': t.receipt.receipt_id, 'lines': [{'sku': t.item.sku, 'quantity': 1}]},
+        {'receipt_id': 'budget-2', 'lines': [{'sku': 'UNKNOWN', 'quantity': 1}]},
+    ]}),
+}
+
+
+@override_settings(
+    NEO4J_BACKEND='local',
+    SERVER_TIMING={**settings.SERVER_TIMING, 'N_PLUS_ONE_ACTION': 'raise', 'QUERY_BUDGET_ACTION': 'off'},
+    # Delta sync returns rows written just now
+    SYNC_COMMIT_LAG=0,
+)
+class QueryBudgetTests(TestCase):
+    """Every API route stays within its declared query budget as rows grow"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password=PASSWORD, user_type='admin')
+        cls.supplier = User.objects.create_user(
+            email='supplier@example.com', username='supplier', password=PASSWORD, user_type='supplier')
+        cls.spare_user = User.objects.create_user(
+            email='spare@example.com', username='spare', password=PASSWORD, user_type='supplier')
+
+        cls.grocery, cls.other_grocery, cls.empty_grocery, cls.deleted_grocery = Grocery.objects.bulk_create([
+            Grocery(name=f'Grocery {n}', location=f'Location {n}', created_by=cls.admin) for n in range(4)
+        ])
+        cls.deleted_grocery.soft_delete()
+        profile = cls.supplier.supplier_profile
+        profile.assigned_grocery = cls.grocery
+        profile.save()
+        # Reassignment revoked the supplier's tokens
+        cls.supplier.refresh_from_db()
+
+        cls.item_type, cls.empty_type = ItemType.objects.bulk_create([
+            ItemType(name='Dairy'), ItemType(name='Unused'),
+        ])
+        cls.item, _, cls.deleted_item = cls.add_items(3, prefix='Fixture')
+        cls.deleted_item.soft_delete()
+        Item.objects.filter(pk=cls.item.pk).update(quantity_in_stock=100)
+
+        cls.income, cls.spare_income = cls.add_incomes(2, offset=0)
+        take_inventory_snapshot(date.today() - timedelta(days=1))
+
+        cls.report_job = ReportJob.objects.create(
+            report_type='income.weekly_trends', params={'weeks': 4}, scope=f'grocery:{cls.grocery.pk}',
+            fingerprint='fixture', status=ReportJob.SUCCEEDED, result={'weekly_trends': []},
+            requested_by=cls.supplier, expires_at=timezone.now() + timedelta(hours=1),
+        )
+        cls.receipt = cls.add_receipts(1, prefix='fixture')[0]
+        cls.stock_transfer = cls.add_transfers(1)[0]
+
+    @classmethod
+    def add_items(cls, count, prefix='Item'):
+        return Item.objects.bulk_create([
+            Item(
+                name=f'{prefix} {n}', item_type=cls.item_type, location='freezer',
+                price=Decimal('1.50'), grocery=cls.grocery if n % 2 == 0 else cls.other_grocery,
+                added_by=cls.admin, sku=f'{prefix}-{n}', quantity_in_stock=n % 12, reorder_level=5,
+            )
+            for n in range(count)
+        ])
+
+    @classmethod
+    def add_incomes(cls, count, offset):
+        today = date.today()
+        return DailyIncome.objects.bulk_create([
+            DailyIncome(
+                grocery=cls.grocery, date=today - timedelta(days=offset + n),
+                amount=Decimal('100.00') + n, recorded_by=cls.admin,
+            )
+            for n in range(count)
+        ])
+
+    @classmethod
+    def add_receipts(cls, count, prefix):
+        now = timezone.now()
+        receipts = Receipt.objects.bulk_create([
+            Receipt(
+                grocery=cls.grocery, receipt_id=f'{prefix}-{n}', till_id='till-1', sold_at=now,
+                date=now.date(), total=Decimal('3.00'), line_count=2, recorded_by=cls.supplier,
+            )
+            for n in range(count)
+        ])
+        ReceiptLine.objects.bulk_create([
+            ReceiptLine(receipt=receipt, item=cls.item, sku=cls.item.sku, quantity=1,
+                        unit_price=Decimal('1.50'), line_total=Decimal('1.50'))
+            for receipt in receipts for _ in range(2)
+        ])
+        return receipts
+
+    @classmethod
+    def add_transfers(cls, count):
+        stock_transfers = StockTransfer.objects.bulk_create([
+            StockTransfer(source=cls.grocery, destination=cls.other_grocery, created_by=cls.supplier,
+                          line_count=1, total_quantity=1)
+            for _ in range(count)
+        ])
+        StockTransferLine.objects.bulk_create([
+            StockTransferLine(transfer=stock_transfer, source_item=cls.item, quantity=1)
+            for stock_transfer in stock_transfers for _ in range(3)
+        ])
+        return stock_transfers
+
+    def setUp(self):
+        # Token versions are cached across tests; the database is not
+        cache.clear()
+
+    def grow_dataset(self):
+        """Add enough rows to span several pages everywhere"""
+        self.add_items(45, prefix='Grown')
+        self.add_incomes(45, offset=10)
+        Grocery.objects.bulk_create([
+            Grocery(name=f'Grown Grocery {n}', location='Grown', created_by=self.admin) for n in range(25)
+        ])
+        ItemType.objects.bulk_create([ItemType(name=f'Grown Type {n}') for n in range(25)])
+        for n in range(25):
+            User.objects.create(email=f'grown-{n}@example.com', username=f'grown-{n}', user_type='supplier')
+        SupplierProfile.objects.filter(user__username__startswith='grown-').update(
+            assigned_grocery=self.grocery
+        )
+        for n in range(2, 30):
+            take_inventory_snapshot(date.today() - timedelta(days=n))
+        ReportJob.objects.bulk_create([
+            ReportJob(report_type='income.analytics', scope=self.report_job.scope, fingerprint=f'grown-{n}',
+                      status=ReportJob.SUCCEEDED, requested_by=self.admin if n % 2 else self.supplier)
+            for n in range(25)
+        ])
+        self.add_receipts(25, prefix='grown')
+        self.add_transfers(25)
+        StockMovement.objects.bulk_create([
+            StockMovement(item=item, quantity=-n, reason=StockMovement.SALE)
+            for item in Item.objects.all() for n in range(1, 4)
+        ])
+
+    def client_for(self, role):
+        client = APIClient()
+        if role is not None:
+            user = self.admin if role == 'admin' else self.supplier
+            token = CustomTokenObtainPairSerializer.get_token(user).access_token
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+            # Warm the token version cache, as on any long-running worker
+            client.get('/api/v1/auth/users/me/')
+        return client
+
+    def measure(self, key):
+        role, method, path, data = ROUTE_REQUESTS[key](self)
+        client = self.client_for(role)
+        # Budgets cover the uncached path
+        pos.clear()
+        autocomplete.clear()
+        throttling.clear()
+        events.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(client, method)(path, data, format='json')
+        self.assertLess(
+            response.status_code, 400,
+            f"{key} returned {response.status_code}: {getattr(response, 'data', '')}"
+        )
+        return len(queries), queries
+
+    def assert_within_budget(self, key, count, queries):
+        budget = get_query_budget(self.view_classes[key], key[1])
+        sql = '\n'.join(query['sql'] for query in queries)
+        self.assertLessEqual(count, budget, f"{key[0]}.{key[1]} issued {count} queries:\n{sql}")
+
+    @property
+    def view_classes(self):
+        return {
+            (view_class.__name__, action): view_class
+            for _, view_class, actions in api_routes()
+            for action in actions.values()
+        }
+
+    def test_every_route_declares_a_budget(self):
+        for route, view_class, actions in api_routes():
+            for action in actions.values():
+                with self.subTest(route=route, action=action):
+                    self.assertIsNotNone(
+                        get_query_budget(view_class, action),
+                        f"{view_class.__name__} declares no query budget for {action}"
+                    )
+                    self.assertIn((view_class.__name__, action), ROUTE_REQUESTS)
+
+    def test_reads_stay_within_budget_as_rows_grow(self):
+        reads = [key for key in ROUTE_REQUESTS if ROUTE_REQUESTS[key](self)[1] == 'get']
+
+        small = {key: self.measure(key) for key in reads}
+        self.grow_dataset()
+        large = {key: self.measure(key) for key in reads}
+
+        for key in reads:
+            with self.subTest(view=key[0], action=key[1]):
+                self.assert_within_budget(key, *small[key])
+                self.assert_within_budget(key, *large[key])
+                self.assertEqual(
+                    small[key][0], large[key][0],
+                    f"{key[0]}.{key[1]} query count grows with rows: {small[key][0]} -> {large[key][0]}"
+                )
+
+    def test_writes_stay_within_budget(self):
+        writes = [key for key in ROUTE_REQUESTS if ROUTE_REQUESTS[key](self)[1] != 'get']
+        # Deletes last so the objects they remove are still there for the others
+        writes.sort(key=lambda key: ROUTE_REQUESTS[key](self)[1] == 'delete')
+
+        for key in writes:
+            with self.subTest(view=key[0], action=key[1]):
+                self.assert_within_budget(key, *self.measure(key))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_MAX_LAG=5.0, NEO4J_BACKEND='local')
+class ReplicaRoutingTests(SimpleTestCase):
+    """Replica reads are opt-in, skip lagging replicas and respect pinning"""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        db_routers._lag_cache.clear()
+        patcher = patch.object(db_routers, 'replica_lag', return_value=0.0)
+        self.replica_lag = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_use_primary_by_default(self):
+        self.assertEqual(self.router.db_for_read(Item), 'default')
+
+    def test_replica_reads_when_opted_in(self):
+        with read_from('replica'):
+            self.assertEqual(self.router.db_for_read(Item), 'replica')
+            self.assertEqual(self.router.db_for_write(Item), 'default')
+
+    def test_pinned_requests_read_from_primary(self):
+        with read_from('primary', pinned=True):
+            db_routers.use_replica()
+            self.assertEqual(self.router.db_for_read(Item), 'default')
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        self.replica_lag.return_value = 30.0
+        with read_from('replica'):
+            self.assertEqual(self.router.db_for_read(Item), 'default')
+
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], NEO4J_BACKEND='local')
+class ReadYourWritesTests(TestCase):
+    def test_write_pins_client_to_primary(self):
+        admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password=PASSWORD, user_type='admin')
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        response = client.post('/api/v1/items/types/', {'name': 'Pinned'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('primary_pin', response.cookies)
+        self.assertGreater(float(response['X-Read-Your-Writes']), time.time())
+
+        # There is no 'replica' connection in tests, so this only succeeds
+        # if the pinned read stays on the primary
+        response = client.get('/api/v1/items/types/')
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(
+    NEO4J_BACKEND='local',
+    # Budgets assume token-claims auth, which needs no profile query
+    SERVER_TIMING={**settings.SERVER_TIMING, 'QUERY_BUDGET_ACTION': 'off'},
+)
+class PrincipalScopingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password=PASSWORD, user_type='admin')
+        cls.supplier = User.objects.create_user(
+            email='supplier@example.com', username='supplier', password=PASSWORD, user_type='supplier')
+        cls.grocery, cls.other_grocery = Grocery.objects.bulk_create([
+            Grocery(name=f'Grocery {n}', location='Somewhere', created_by=admin) for n in range(2)
+        ])
+        SupplierProfile.objects.filter(user=cls.supplier).update(assigned_grocery=cls.grocery)
+        cls.item_type = ItemType.objects.create(name='Dairy')
+        cls.other_item = Item.objects.create(
+            name='Elsewhere', item_type=cls.item_type, location='freezer', price=Decimal('1.00'),
+            grocery=cls.other_grocery)
+
+    def client_for_fresh_supplier(self):
+        # A user loaded from the database (session-style), not from token claims
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=self.supplier.pk))
+        return client
+
+    def test_scope_is_resolved_once_per_request(self):
+        client = self.client_for_fresh_supplier()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post('/api/v1/items/', {
+                'name': 'Scoped', 'item_type': self.item_type.pk, 'location': 'freezer',
+                'price': '2.00', 'grocery': self.grocery.pk}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        profile_queries = [q for q in queries if 'accounts_supplierprofile' in q['sql']]
+        self.assertEqual(len(profile_queries), 1)
+
+    def test_other_grocery_is_forbidden(self):
+        client = self.client_for_fresh_supplier()
+
+        response = client.patch(f'/api/v1/items/{self.other_item.pk}/', {'price': '3.00'}, format='json')
+        self.assertEqual(response.status_code, 404)
+        response = client.post('/api/v1/income/', {
+            'grocery': self.other_grocery.pk, 'date': date.today().isoformat(), 'amount': '5.00'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('grocery', response.data)
+
+
+@override_settings(NEO4J_BACKEND='local')
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password=PASSWORD, user_type='admin')
+        cls.grocery = Grocery.objects.create(name='Grocery', location='Somewhere', created_by=cls.admin)
+        cls.item_type = ItemType.objects.create(name='Dairy')
+        cls.item = Item.objects.create(
+            name='Milk', item_type=cls.item_type, location='freezer', price=Decimal('1.20'),
+            grocery=cls.grocery, added_by=cls.admin)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def revalidate(self, path, etag, params=None):
+        return self.client.get(path, params or {}, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_list_is_not_modified(self):
+        etag = self.client.get('/api/v1/items/')['ETag']
+        response = self.revalidate('/api/v1/items/', etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_changed_row_is_served_again(self):
+        etag = self.client.get('/api/v1/items/')['ETag']
+        detail_etag = self.client.get(f'/api/v1/items/{self.item.pk}/')['ETag']
+        time.sleep(0.001)
+        self.item.price = Decimal('1.30')
+        self.item.save()
+
+        self.assertEqual(self.revalidate('/api/v1/items/', etag).status_code, 200)
+        self.assertEqual(self.revalidate(f'/api/v1/items/{self.item.pk}/', detail_etag).status_code, 200)
+
+    def test_filters_get_their_own_etag(self):
+        etag = self.client.get('/api/v1/items/')['ETag']
+        filtered = self.revalidate('/api/v1/items/', etag, {'location': 'freezer'})
+        self.assertEqual(filtered.status_code, 200)
+        self.assertNotEqual(filtered['ETag'], etag)
+
+    def test_renaming_a_related_row_changes_the_etag(self):
+        etags = {path: self.client.get(path)['ETag'] for path in ('/api/v1/items/', f'/api/v1/items/{self.item.pk}/')}
+        time.sleep(0.001)
+        self.grocery.name = 'Renamed Grocery'
+        self.grocery.save()
+
+        for path, etag in etags.items():
+            with self.subTest(path=path):
+                response = self.revalidate(path, etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Renamed Grocery', response.content.decode())
+
+        last_modified = self.client.get(f'/api/v1/items/{self.item.pk}/')['Last-Modified']
+        time.sleep(1)
+        self.item_type.name = 'Chilled'
+        self.item_type.save()
+        response = self.client.get(f'/api/v1/items/{self.item.pk}/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+
+def timings(response):
+    """Server-Timing durations by metric name"""
+    metrics = {}
+    for metric in response['Server-Timing'].split(', '):
+        name, _, params = metric.partition(';')
+        metrics[name] = float(params.partition('dur=')[2].partition(';')[0])
+    return metrics
+
+
+@override_settings(
+    NEO4J_BACKEND='local',
+    SERVER_TIMING={**settings.SERVER_TIMING, 'ENABLED': True, 'SAMPLE_RATE': 1.0,
+                   'N_PLUS_ONE_ACTION': 'off', 'QUERY_BUDGET_ACTION': 'off'},
+)
+class ServerTimingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password=PASSWORD, user_type='admin')
+        cls.grocery = Grocery.objects.create(name='Grocery', location='Somewhere', created_by=cls.admin)
+        item_type = ItemType.objects.create(name='Dairy')
+        cls.items = Item.objects.bulk_create([
+            Item(name=f'Item {n}', item_type=item_type, location='freezer', price=Decimal('1.00'),
+                 grocery=cls.grocery)
+            for n in range(3)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def repeat_queries(self, request):
+        for item in self.items:
+            list(Item.objects.filter(pk=item.pk))
+        return HttpResponse()
+
+    def test_serializer_data_counts_as_serialization(self):
+        to_representation = ItemSerializer.to_representation
+
+        def slow(serializer, instance):
+            time.sleep(0.05)
+            return to_representation(serializer, instance)
+
+        with patch.object(ItemSerializer, 'to_representation', slow):
+            response = self.client.get(f'/api/v1/items/{self.items[0].pk}/')
+        self.assertGreaterEqual(timings(response)['serialize'], 50)
+
+    def test_compression_is_reported_separately(self):
+        with override_settings(COMPRESSION_MIN_SIZE=0):
+            response = self.client.get('/api/v1/items/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(set(timings(response)), {'db', 'neo4j', 'serialize', 'compress', 'total'})
+
+    def test_repeated_query_shapes_are_detected(self):
+        self.assertEqual(query_shape("SELECT * FROM t WHERE id IN (1, 2) AND name = 'x'"),
+                         query_shape("SELECT * FROM t WHERE id IN (3) AND name = 'y'"))
+        middleware = ServerTimingMiddleware(self.repeat_queries)
+        request = RequestFactory().get('/repeated/')
+
+        options = {**settings.SERVER_TIMING, 'N_PLUS_ONE_THRESHOLD': 3}
+        with override_settings(SERVER_TIMING={**options, 'N_PLUS_ONE_ACTION': 'raise'}):
+            with self.assertRaises(NPlusOneDetected) as raised:
+                middleware(request)
+        self.assertEqual(raised.exception.repeated[0][1], 3)
+
+        with override_settings(SERVER_TIMING={**options, 'N_PLUS_ONE_ACTION': 'log'}), \
+                self.assertLogs('apps.core.middleware', 'WARNING'):
+            middleware(request)
+
+        with override_settings(SERVER_TIMING={**options, 'N_PLUS_ONE_THRESHOLD': 4, 'N_PLUS_ONE_ACTION': 'raise'}):
+            self.assertIn('db;dur=', middleware(request)['Server-Timing'])
+
+    def test_only_sampled_requests_are_profiled(self):
+        middleware = ServerTimingMiddleware(lambda request: HttpResponse())
+        request = RequestFactory().get('/')
+        for enabled, rate, roll, profiled in ((True, 0.5, 0.4, True), (True, 0.5, 0.6, False),
+                                              (False, 1.0, 0.0, False)):
+            with self.subTest(enabled=enabled, rate=rate, roll=roll), \
+                    override_settings(SERVER_TIMING={**settings.SERVER_TIMING, 'ENABLED': enabled,
+                                                     'SAMPLE_RATE': rate}), \
+                    patch('apps.core.middleware.random.random', return_value=roll):
+                self.assertEqual(middleware(request).has_header('Server-Timing'), profiled)
+
+
+@override_settings(
+    NEO4J_BACKEND='local',
+    SERVER_TIMING={**settings.SERVER_TIMING, 'QUERY_BUDGET_ACTION': 'off'},
+)
+class SparseFieldsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password=PASSWORD, user_type='admin',
+            first_name='Ada', last_name='Admin')
+        cls.grocery = Grocery.objects.create(name='Grocery', location='Somewhere', created_by=cls.admin)
+        item_type = ItemType.objects.create(name='Dairy')
+        cls.item = Item.objects.create(
+            name='Milk', item_type=item_type, location='freezer', price=Decimal('1.20'),
+            grocery=cls.grocery, added_by=cls.admin, quantity_in_stock=4)
+        cls.income = DailyIncome.objects.create(
+            grocery=cls.grocery, date=date.today(), amount=Decimal('10.00'), recorded_by=cls.admin)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_plain_fields_are_a_single_table_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/items/', {'fields': 'id,name,price,quantity_in_stock'})
+
+        self.assertEqual(list(response.data['results'][0]), ['id', 'name', 'price', 'quantity_in_stock'])
+        page_query = queries[-1]['sql']
+        self.assertNotIn('JOIN', page_query)
+        self.assertNotIn('"reorder_level"', page_query)
+
+    def test_expand_nests_related_objects(self):
+        response = self.client.get(f'/api/v1/items/{self.item.pk}/', {
+            'fields': 'id,stock_status', 'expand': 'grocery,added_by'})
+
+        self.assertEqual(set(response.data), {'id', 'stock_status', 'grocery', 'added_by'})
+        self.assertEqual(response.data['grocery'], {'id': self.grocery.pk, 'name': 'Grocery', 'location': 'Somewhere'})
+        self.assertEqual(response.data['added_by']['full_name'], 'Ada Admin')
+        self.assertEqual(response.data['stock_status'], 'Low Stock')
+
+    def test_derived_fields_load_their_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/income/', {'fields': 'id,formatted_amount'})
+
+        self.assertEqual(response.data['results'][0], {'id': self.income.pk, 'formatted_amount': '$10.00'})
+        self.assertNotIn('accounts_user', queries[-1]['sql'])
+
+    def test_every_viewset_accepts_sparse_requests(self):
+        for path in ('/api/v1/auth/users/', '/api/v1/groceries/', f'/api/v1/groceries/{self.grocery.pk}/',
+                     '/api/v1/items/types/', '/api/v1/reports/', '/api/v1/sales/', '/api/v1/items/transfers/'):
+            with self.subTest(path=path):
+                response = self.client.get(path, {'fields': 'id', 'expand': 'created_by'})
+                self.assertEqual(response.status_code, 200)
+
+
+@override_settings(
+    NEO4J_BACKEND='local',
+    SERVER_TIMING={**settings.SERVER_TIMING, 'QUERY_BUDGET_ACTION': 'off'},
+)
+class ValuesListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password=PASSWORD, user_type='admin')
+        grocery = Grocery.objects.create(name='Épicerie', location='Somewhere', created_by=cls.admin)
+        item_type = ItemType.objects.create(name='Dairy')
+        for index, quantity in enumerate((0, 5, 500)):
+            Item.objects.create(
+                name=f'Crème {index}\u2028', item_type=item_type, location='freezer',
+                price=Decimal('1234.5'), grocery=grocery, quantity_in_stock=quantity)
+        DailyIncome.objects.create(
+            grocery=grocery, date=date.today(), amount=Decimal('10'), notes='Café', recorded_by=cls.admin)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_responses_match_the_serializer(self):
+        for path, viewset in (('/api/v1/items/', ItemViewSet), ('/api/v1/income/', DailyIncomeViewSet),
+                              ('/api/v1/items/?ordering=price&search=Cr', ItemViewSet)):
+            with self.subTest(path=path):
+                with patch('apps.core.mixins.values_serializer_for') as values_serializer_for:
+                    values_serializer_for.side_effect = values.values_serializer_for
+                    fast = self.client.get(path)
+                self.assertTrue(values_serializer_for.called)
+                with patch.object(viewset, 'values_actions', ()), \
+                        patch.object(viewset, 'renderer_classes', [JSONRenderer]):
+                    regular = self.client.get(path)
+                self.assertEqual(fast.content, regular.content)
+
+    def test_unsupported_serializers_are_detected(self):
+        self.assertIsNotNone(values.values_serializer_for(ItemListSerializer))
+        # Method fields and a callable source
+        self.assertIsNone(values.values_serializer_for(ItemSerializer))
+
+    def test_renderer_output_matches_json_renderer(self):
+        data = {
+            'created_at': timezone.now().replace(microsecond=123456),
+            'date': date(2025, 1, 31),
+            'amount': Decimal('10.50'),
+            'text': 'Crème\u2028\u2029',
+            'nested': [{'id': 1, 'ratio': 0.25, 'empty': None, 'flag': True}],
+        }
+        floats = {'tiny': 1.5e-7, 'huge': [1e16, -2.5e300], 'edges': (0.0001, 9999999999999998.0, -0.0)}
+        for payload in (data, {1: 'int keys'}, {'big': 2 ** 70}, floats, {'amount': Decimal('1E+20')}):
+            with self.subTest(payload=payload):
+                self.assertEqual(ORJSONRenderer().render(payload), JSONRenderer().render(payload))
+
+    def test_renderer_refuses_non_finite_floats(self):
+        for value in (float('nan'), float('inf'), -float('inf')):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                ORJSONRenderer().render({'nested': [{'ratio': value}]})
+
+
+@override_settings(
+    NEO4J_BACKEND='local',
+    SERVER_TIMING={**settings.SERVER_TIMING, 'QUERY_BUDGET_ACTION': 'off'},
+    COMPRESSION_MIN_SIZE=200,
+)
+class CompressionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password=PASSWORD, user_type='admin')
+        grocery = Grocery.objects.create(name='Grocery', location='Somewhere', created_by=cls.admin)
+        item_type = ItemType.objects.create(name='Dairy')
+        Item.objects.bulk_create([
+            Item(name=f'Item {index}', item_type=item_type, location='freezer', price=Decimal('1.50'),
+                 grocery=grocery, quantity_in_stock=index)
+            for index in range(10)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_json_is_gzipped_for_clients_that_accept_it(self):
+        plain = self.client.get('/api/v1/items/')
+        response = self.client.get('/api/v1/items/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        # The weakened validator still answers conditional requests
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        revalidated = self.client.get('/api/v1/items/', HTTP_ACCEPT_ENCODING='gzip',
+                                      HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_schema_is_compressed(self):
+        schema = HttpResponse(b'openapi: 3.0.3\n' * 100, content_type='application/vnd.oai.openapi; charset=utf-8')
+        middleware = CompressionMiddleware(lambda request: schema)
+
+        response = middleware(RequestFactory().get('/api/schema/', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_small_and_refused_responses_are_left_alone(self):
+        with override_settings(COMPRESSION_MIN_SIZE=10 ** 6):
+            response = self.client.get('/api/v1/items/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+        response = self.client.get('/api/v1/items/', HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_encoded_responses_are_not_compressed_twice(self):
+        body = gzip.compress(b'{"cached": true}' * 100)
+        response = HttpResponse(body, content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+        middleware = CompressionMiddleware(lambda request: response)
+
+        request = RequestFactory().get('/api/v1/items/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(middleware(request).content, body)
+
+    @skipIf(msgpack is None, 'msgpack is not installed')
+    def test_msgpack_is_negotiated(self):
+        response = self.client.get('/api/v1/items/', HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content)['count'], 10)
+        self.assertIn('Accept', response['Vary'])
+
+    @skipIf(msgpack is None, 'msgpack is not installed')
+    def test_formats_do_not_share_validators(self):
+        json_etag = self.client.get('/api/v1/items/')['ETag']
+        response = self.client.get('/api/v1/items/', HTTP_ACCEPT='application/msgpack', HTTP_IF_NONE_MATCH=json_etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertNotEqual(response['ETag'], json_etag)
+        revalidated = self.client.get('/api/v1/items/', HTTP_ACCEPT='application/msgpack',
+                                      HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertIn('Accept', revalidated['Vary'])
+
+
+def buckets(capacity, rate=0.001):
+    return {
+        user_type: {'capacity': capacity, 'rate': rate}
+        for user_type in ('admin', 'supplier', 'grocery', 'anon')
+    }
+
+
+@override_settings(NEO4J_BACKEND='local', REDIS_URL='')
+class ThrottleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password=PASSWORD, user_type='admin')
+        cls.grocery = Grocery.objects.create(name='Grocery', location='Somewhere', created_by=cls.admin)
+        cls.suppliers = []
+        for n in range(2):
+            supplier = User.objects.create_user(
+                email=f'supplier{n}@example.com', username=f'supplier{n}', password=PASSWORD,
+                user_type='supplier')
+            SupplierProfile.objects.filter(user=supplier).update(assigned_grocery=cls.grocery)
+            cls.suppliers.append(User.objects.get(pk=supplier.pk))
+
+    def setUp(self):
+        throttling.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_requests_are_charged_their_cost(self):
+        with override_settings(THROTTLE_BUCKETS=buckets(50)):
+            first = self.client.get('/api/v1/items/inventory_summary/')
+            self.assertEqual(first.status_code, 200)
+            self.assertEqual(first['X-RateLimit-Cost'], '20')
+            self.assertEqual(first['X-RateLimit-Limit'], '50')
+            self.assertEqual(first['X-RateLimit-Remaining'], '30')
+
+            self.client.get('/api/v1/items/inventory_summary/')
+            refused = self.client.get('/api/v1/items/inventory_summary/')
+            self.assertEqual(refused.status_code, 429)
+            self.assertEqual(refused['X-RateLimit-Remaining'], '10')
+            # 10 tokens short at 0.001 per second
+            self.assertEqual(int(refused['Retry-After']), 10000)
+
+            # Cheaper requests still fit in what is left
+            cheap = self.client.get('/api/v1/items/')
+            self.assertEqual(cheap.status_code, 200)
+            self.assertEqual(cheap['X-RateLimit-Remaining'], '9')
+
+    def test_refilled_local_buckets_are_pruned(self):
+        bucket = [('user:1', 10, 1.0)]
+        with patch('apps.core.throttling.time.monotonic', return_value=1000.0):
+            throttling.charge(bucket, 4)
+            throttling.charge([('user:2', 10, 1.0)], 1)
+        self.assertEqual(set(throttling._buckets), {'user:1', 'user:2'})
+
+        # user:1 is full again 4 seconds later, but only a sweep drops it
+        with patch('apps.core.throttling.time.monotonic', return_value=1005.0):
+            throttling.charge([('user:3', 10, 1.0)], 1)
+        self.assertIn('user:1', throttling._buckets)
+        with patch('apps.core.throttling.time.monotonic', return_value=1000.0 + throttling.PRUNE_INTERVAL):
+            allowed, _, balances = throttling.charge(bucket, 10)
+        self.assertEqual(set(throttling._buckets), {'user:1'})
+        self.assertTrue(allowed)
+        self.assertEqual(balances, [0])
+
+    def test_costs_above_capacity_need_a_full_bucket(self):
+        with override_settings(THROTTLE_BUCKETS=buckets(10)):
+            self.assertEqual(self.client.get('/api/v1/items/inventory_summary/').status_code, 200)
+            self.assertEqual(self.client.get('/api/v1/items/inventory_summary/').status_code, 429)
+
+    def test_suppliers_share_their_grocery_bucket(self):
+        limits = {**buckets(1000), 'grocery': {'capacity': 30, 'rate': 0.001}}
+        with override_settings(THROTTLE_BUCKETS=limits):
+            first, second = APIClient(), APIClient()
+            first.force_authenticate(self.suppliers[0])
+            second.force_authenticate(self.suppliers[1])
+
+            self.assertEqual(first.get('/api/v1/items/inventory_summary/').status_code, 200)
+            refused = second.get('/api/v1/items/inventory_summary/')
+            self.assertEqual(refused.status_code, 429)
+            self.assertEqual(refused['X-RateLimit-Limit'], '30')
+            # Refused requests are not charged
+            self.assertEqual(second.get('/api/v1/items/').status_code, 200)
+
+    def test_async_views_are_charged(self):
+        path = f'/api/v1/groceries/{self.grocery.pk}/analytics/async/'
+        token = str(CustomTokenObtainPairSerializer.get_token(self.admin).access_token)
+        with override_settings(THROTTLE_BUCKETS=buckets(30)):
+            first = self.client.get(path, HTTP_AUTHORIZATION=f'Bearer {token}')
+            self.assertEqual(first['X-RateLimit-Cost'], '20')
+            refused = self.client.get(path, HTTP_AUTHORIZATION=f'Bearer {token}')
+            self.assertEqual(refused.status_code, 429)
+            self.assertIn('Retry-After', refused)
+
+    def test_unreachable_redis_falls_back_to_local_buckets(self):
+        import redis
+
+        with override_settings(THROTTLE_BUCKETS=buckets(50), REDIS_URL='redis://localhost:1/0'), \
+                patch.object(throttling, '_get_script', side_effect=redis.ConnectionError('refused')), \
+                self.assertLogs('apps.core.throttling', 'WARNING'):
+            response = self.client.get('/api/v1/items/inventory_summary/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-RateLimit-Remaining'], '30')
+
+
+@override_settings(
+    NEO4J_BACKEND='local',
+    SERVER_TIMING={**settings.SERVER_TIMING, 'QUERY_BUDGET_ACTION': 'off'},
+    SYNC_COMMIT_LAG=0,
+)
+class DeltaSyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password=PASSWORD, user_type='admin')
+        cls.supplier = User.objects.create_user(
+            email='supplier@example.com', username='supplier', password=PASSWORD, user_type='supplier')
+        cls.grocery, cls.other_grocery = Grocery.objects.bulk_create([
+            Grocery(name=f'Grocery {n}', location='Somewhere', created_by=cls.admin) for n in range(2)
+        ])
+        SupplierProfile.objects.filter(user=cls.supplier).update(assigned_grocery=cls.grocery)
+        cls.supplier = User.objects.get(pk=cls.supplier.pk)
+        item_type = ItemType.objects.create(name='Dairy')
+        cls.items = [
+            Item.objects.create(name=f'Item {n}', item_type=item_type, location='freezer', price=Decimal('1.50'),
+                                grocery=grocery, quantity_in_stock=n)
+            for n, grocery in enumerate([cls.grocery, cls.grocery, cls.other_grocery])
+        ]
+        cls.incomes = DailyIncome.objects.bulk_create([
+            DailyIncome(grocery=cls.grocery, date=date.today() - timedelta(days=n), amount=Decimal('10'),
+                        recorded_by=cls.admin)
+            for n in range(2)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.supplier)
+
+    def sync(self, path, cursor=None):
+        response = self.client.get(path, {'since': cursor} if cursor else {})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_only_changes_since_the_cursor_are_returned(self):
+        page = self.sync('/api/v1/items/changes/')
+        # Suppliers sync their own grocery
+        self.assertEqual([row['id'] for row in page['results']], [item.pk for item in self.items[:2]])
+        self.assertFalse(page['has_more'])
+
+        with CaptureQueriesContext(connection) as queries:
+            unchanged = self.sync('/api/v1/items/changes/', page['cursor'])
+        self.assertEqual((unchanged['results'], unchanged['deleted']), ([], []))
+        self.assertEqual(len(queries), 1)
+
+        updated, deleted = self.items[:2]
+        updated.quantity_in_stock = 40
+        updated.save()
+        deleted.soft_delete()
+        self.items[2].soft_delete()
+        changes = self.sync('/api/v1/items/changes/', unchanged['cursor'])
+        self.assertEqual([(row['id'], row['quantity_in_stock']) for row in changes['results']], [(updated.pk, 40)])
+        self.assertEqual(changes['deleted'], [deleted.pk])
+
+    def test_recent_writes_wait_for_the_commit_lag(self):
+        with override_settings(SYNC_COMMIT_LAG=60):
+            page = self.sync('/api/v1/items/changes/')
+        self.assertEqual(page['results'], [])
+
+        caught_up = self.sync('/api/v1/items/changes/', page['cursor'])
+        self.assertEqual(len(caught_up['results']), 2)
+
+    def test_pages_continue_from_the_last_row(self):
+        self.client.force_authenticate(self.admin)
+        with override_settings(SYNC_PAGE_SIZE=2):
+            first = self.sync('/api/v1/items/changes/')
+            second = self.sync('/api/v1/items/changes/', first['cursor'])
+        self.assertTrue(first['has_more'])
+        self.assertFalse(second['has_more'])
+        self.assertEqual(
+            [row['id'] for row in first['results'] + second['results']], [item.pk for item in self.items]
+        )
+
+    def test_deleted_income_is_reported_from_tombstones(self):
+        cursor = self.sync('/api/v1/income/changes/')['cursor']
+        kept, deleted = self.incomes
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.delete(f'/api/v1/income/{deleted.pk}/').status_code, 204)
+        kept.notes = 'Counted twice'
+        kept.save()
+
+        self.client.force_authenticate(self.supplier)
+        changes = self.sync('/api/v1/income/changes/', cursor)
+        self.assertEqual([row['notes'] for row in changes['results']], ['Counted twice'])
+        self.assertEqual(changes['deleted'], [deleted.pk])
+
+    def test_unusable_cursors_are_refused(self):
+        response = self.client.get('/api/v1/groceries/changes/', {'since': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+        # Issued to an admin, so not scoped to the supplier's grocery
+        response = self.client.get('/api/v1/groceries/changes/', {'since': since()})
+        self.assertEqual(response.status_code, 410)
+
+        stale = sync.Cursor(timezone.now() - timedelta(days=settings.SOFT_DELETE_RETENTION_DAYS + 1), 0,
+                            str(self.grocery.pk))
+        response = self.client.get('/api/v1/groceries/changes/', {'since': str(stale)})
+        self.assertEqual(response.status_code, 410)
+
+
+@override_settings(NEO4J_BACKEND='local', REDIS_URL='', SSE_HEARTBEAT=0.05)
+class EventStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password=PASSWORD, user_type='admin')
+        cls.supplier = User.objects.create_user(
+            email='supplier@example.com', username='supplier', password=PASSWORD, user_type='supplier')
+        cls.grocery, cls.other_grocery = Grocery.objects.bulk_create([
+            Grocery(name=f'Grocery {n}', location='Somewhere', created_by=cls.admin) for n in range(2)
+        ])
+        SupplierProfile.objects.filter(user=cls.supplier).update(assigned_grocery=cls.grocery)
+        cls.supplier = User.objects.get(pk=cls.supplier.pk)
+        item_type = ItemType.objects.create(name='Dairy')
+        cls.item, cls.other_item = Item.objects.bulk_create([
+            Item(name='Milk', item_type=item_type, location='freezer', price=Decimal('1.50'),
+                 grocery=grocery, quantity_in_stock=20, reorder_level=5)
+            for grocery in (cls.grocery, cls.other_grocery)
+        ])
+
+    def setUp(self):
+        events.clear()
+        throttling.clear()
+
+    async def open(self, user, path='/api/v1/events/', **headers):
+        token = await sync_to_async(lambda: CustomTokenObtainPairSerializer.get_token(user).access_token)()
+        response = await self.async_client.get(path, headers={'Authorization': f'Bearer {token}', **headers})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        frames = aiter(response.streaming_content)
+        # The retry hint; the stream's position is fixed from here
+        self.assertTrue((await anext(frames)).startswith(b'retry:'))
+        return frames
+
+    async def read(self, frames, count):
+        """The next ``count`` events as ``(id, type, data)``, skipping heartbeats"""
+        received = []
+        while len(received) < count:
+            chunk = await asyncio.wait_for(anext(frames), 1)
+            for block in chunk.decode().split('\n\n'):
+                fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+                if 'event' in fields:
+                    received.append((fields.get('id'), fields['event'], json.loads(fields['data'])))
+        return received
+
+    def set_stock(self, item, quantity):
+        with self.captureOnCommitCallbacks(execute=True):
+            item.refresh_from_db()
+            item.quantity_in_stock = quantity
+            item.save()
+
+    async def test_stock_changes_reach_the_grocery_stream(self):
+        frames = await self.open(self.supplier)
+        await sync_to_async(self.set_stock)(self.other_item, 1)
+        await sync_to_async(self.set_stock)(self.item, 3)
+
+        (_, stock, changed), (_, low_stock, crossed) = await self.read(frames, 2)
+        # Suppliers only see their grocery's events
+        self.assertEqual((stock, changed['item'], changed['quantity_in_stock']), ('stock', self.item.pk, 3))
+        self.assertEqual((low_stock, crossed), ('low_stock', {'item': self.item.pk, 'grocery': self.grocery.pk,
+                                                              'low': True}))
+
+    async def test_streams_resume_after_the_last_event_id(self):
+        frames = await self.open(self.admin)
+        for quantity in (18, 16):
+            await sync_to_async(self.set_stock)(self.item, quantity)
+        (first_id, _, _), _ = await self.read(frames, 2)
+
+        path = f'/api/v1/events/?grocery={self.grocery.pk}'
+        resumed = await self.open(self.admin, path, **{'Last-Event-ID': first_id})
+        await sync_to_async(self.set_stock)(self.other_item, 10)
+        await sync_to_async(self.set_stock)(self.item, 14)
+        received = await self.read(resumed, 2)
+        self.assertEqual([data['quantity_in_stock'] for _, _, data in received], [16, 14])
+
+    async def test_resuming_past_the_buffer_resets(self):
+        frames = await self.open(self.supplier, **{'Last-Event-ID': '1-0'})
+        (event_id, event, _), = await self.read(frames, 1)
+        self.assertEqual((event_id, event), (None, 'reset'))
+
+        await sync_to_async(self.set_stock)(self.item, 15)
+        self.assertEqual((await self.read(frames, 1))[0][2]['quantity_in_stock'], 15)
+
+    def test_sales_publish_stock_and_income(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_receipts(self.grocery.pk, [
+                {'receipt_id': 'r1', 'lines': [{'item': self.item.pk, 'quantity': 16}]},
+            ], self.supplier)
+        with self.captureOnCommitCallbacks(execute=True):
+            rollup_sales_income()
+
+        frames = [event.frame.decode() for event in events.get_hub().events]
+        self.assertEqual([frame.split('\n')[1] for frame in frames],
+                         ['event: stock', 'event: low_stock', 'event: income'])
+        self.assertIn('"quantity_in_stock": 4', frames[0])
+        self.assertIn('"amount": "24.00"', frames[2])
+
+
+@override_settings(NEO4J_BACKEND='local')
+class SoftDeleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password=PASSWORD, user_type='admin')
+        cls.grocery, cls.other = Grocery.objects.bulk_create([
+            Grocery(name=name, location='Somewhere', created_by=cls.admin) for name in ('Grocery', 'Other')
+        ])
+        item_type = ItemType.objects.create(name='Dairy')
+        cls.items = Item.objects.bulk_create([
+            Item(name=f'Item {n}', item_type=item_type, location='freezer', price=Decimal('1.00'),
+                 grocery=grocery, sku=f'SKU-{n}', quantity_in_stock=1)
+            for n, grocery in enumerate([cls.grocery] * 3 + [cls.other] * 2)
+        ])
+
+    def purge(self, **options):
+        call_command('purge_soft_deleted', days=0, stdout=StringIO(), stderr=StringIO(), **options)
+
+    def test_purge_keeps_groceries_with_transfer_history(self):
+        transfer = StockTransfer.objects.create(
+            source=self.grocery, destination=self.other, line_count=0, total_quantity=0)
+        self.grocery.soft_delete()
+
+        self.purge()
+
+        self.assertTrue(Grocery.all_objects.filter(pk=self.grocery.pk).exists())
+        self.assertTrue(StockTransfer.objects.filter(pk=transfer.pk).exists())
+        self.assertEqual(list(self.other.transfers_in.all()), [transfer])
+
+    def test_grocery_soft_delete_cascades_in_one_update(self):
+        earlier = self.items[0]
+        earlier.soft_delete()
+
+        with CaptureQueriesContext(connection) as captured:
+            self.grocery.soft_delete()
+
+        item_updates = [q['sql'] for q in captured if q['sql'].startswith('UPDATE "items_item"')]
+        self.assertEqual(len(item_updates), 1)
+        deleted_at = Grocery.all_objects.get(pk=self.grocery.pk).deleted_at
+        self.assertEqual(
+            set(Item.all_objects.filter(deleted_at=deleted_at).values_list('pk', flat=True)),
+            {self.items[1].pk, self.items[2].pk},
+        )
+        # Rows deleted before keep their own timestamp
+        self.assertLess(Item.all_objects.get(pk=earlier.pk).deleted_at, deleted_at)
+        self.assertFalse(Item.all_objects.filter(grocery=self.other, is_deleted=True).exists())
+
+    def test_restore_brings_back_only_rows_deleted_with_the_grocery(self):
+        self.items[0].soft_delete()
+        self.grocery.soft_delete()
+
+        Grocery.all_objects.get(pk=self.grocery.pk).restore()
+
+        self.assertTrue(Grocery.objects.filter(pk=self.grocery.pk).exists())
+        self.assertEqual(
+            set(Item.objects.filter(grocery=self.grocery).values_list('pk', flat=True)),
+            {self.items[1].pk, self.items[2].pk},
+        )
+        self.assertTrue(Item.all_objects.get(pk=self.items[0].pk).is_deleted)
+
+    def test_queryset_soft_delete_and_restore_skip_rows_already_there(self):
+        self.items[0].soft_delete()
+
+        self.assertEqual(Item.all_objects.filter(grocery=self.grocery).soft_delete(), 2)
+        self.assertEqual(Item.all_objects.filter(grocery=self.grocery).restore(), 3)
+        self.assertEqual(Item.all_objects.filter(grocery=self.grocery).restore(), 0)
+
+    def test_purge_archives_rows_batch_by_batch(self):
+        Item.all_objects.soft_delete()
+        batches = []
+
+        purged = purge_soft_deleted(Item.all_objects.deleted_before(timezone.now()), ArchivedItem,
+                                    batch_size=2, on_batch=batches.append)
+
+        self.assertEqual(purged, 5)
+        self.assertEqual([len(ids) for ids in batches], [2, 2, 1])
+        self.assertFalse(Item.all_objects.exists())
+        archived = ArchivedItem.objects.get(original_id=self.items[0].pk)
+        self.assertEqual((archived.grocery_id, archived.name, archived.sku), (self.grocery.pk, 'Item 0', 'SKU-0'))
+        self.assertEqual(archived.data['quantity_in_stock'], 1)
+
+    def test_purge_keeps_groceries_that_are_still_referenced(self):
+        kept_by_income = Grocery.objects.create(name='Income', location='Somewhere', created_by=self.admin)
+        DailyIncome.objects.create(grocery=kept_by_income, date=date.today(), amount=Decimal('5'),
+                                   recorded_by=self.admin)
+        kept_by_receipt = Grocery.objects.create(name='Receipt', location='Somewhere', created_by=self.admin)
+        Receipt.objects.create(grocery=kept_by_receipt, receipt_id='r1', sold_at=timezone.now(),
+                               date=date.today(), total=Decimal('1'), line_count=0)
+        self.items[3].soft_delete()
+        for grocery in (self.grocery, self.other, kept_by_income, kept_by_receipt):
+            grocery.soft_delete()
+        # Deleted too recently to be purged, so it keeps its grocery
+        Item.all_objects.filter(pk=self.items[4].pk).update(deleted_at=timezone.now() + timedelta(days=1))
+
+        self.purge()
+
+        self.assertEqual(list(ArchivedGrocery.objects.values_list('original_id', flat=True)), [self.grocery.pk])
+        self.assertEqual(
+            set(Grocery.all_objects.values_list('pk', flat=True)),
+            {self.other.pk, kept_by_income.pk, kept_by_receipt.pk},
+        )
+        self.assertEqual(list(Item.all_objects.values_list('pk', flat=True)), [self.items[4].pk])
+        self.assertEqual(ArchivedItem.objects.count(), 4)
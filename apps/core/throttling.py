@@ -0,0 +1,180 @@
+"""
+Cost-based request throttling.
+
+Views declare what each action costs, keyed like ``query_budgets``::
+
+    class ItemViewSet(...):
+        throttle_costs = {'inventory_summary': 20}
+
+Anything undeclared costs 1. A request is charged its cost against token
+buckets - the user's (sized by user type in ``THROTTLE_BUCKETS``), a
+supplier's grocery's, shared by everyone working in it, and the client
+address for anonymous requests - and is refused with 429 and Retry-After
+unless every bucket can pay. Buckets refill continuously at their rate.
+
+Buckets live in Redis when ``REDIS_URL`` is set, refilled and charged
+atomically by a script so every worker sees the same balance; otherwise,
+or while Redis is unreachable, each worker keeps its own and drops the
+buckets that have refilled every ``PRUNE_INTERVAL`` seconds, as Redis
+expires them.
+"""
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+from .principal import get_principal
+
+logger = logging.getLogger(__name__)
+
+BUCKET_KEY = 'throttle:{}'
+
+# KEYS: buckets; ARGV: cost, then capacity and rate of each bucket.
+# Returns whether the request was allowed, the seconds until it would be
+# and each bucket's balance afterwards (as strings; Lua numbers truncate).
+CHARGE_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local cost = tonumber(ARGV[1])
+local balances, allowed, wait = {}, 1, 0
+for i, key in ipairs(KEYS) do
+    local capacity, rate = tonumber(ARGV[2 * i]), tonumber(ARGV[2 * i + 1])
+    local state = redis.call('HMGET', key, 'tokens', 'at')
+    local tokens = tonumber(state[1]) or capacity
+    local elapsed = math.max(0, now - (tonumber(state[2]) or now))
+    tokens = math.min(capacity, tokens + elapsed * rate)
+    local charge = math.min(cost, capacity)
+    if tokens < charge then
+        allowed = 0
+        wait = math.max(wait, (charge - tokens) / rate)
+    end
+    balances[i] = tokens
+end
+for i, key in ipairs(KEYS) do
+    local capacity, rate = tonumber(ARGV[2 * i]), tonumber(ARGV[2 * i + 1])
+    if allowed == 1 then
+        balances[i] = balances[i] - math.min(cost, capacity)
+    end
+    redis.call('HSET', key, 'tokens', tostring(balances[i]), 'at', tostring(now))
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+    balances[i] = tostring(balances[i])
+end
+return {allowed, tostring(wait), unpack(balances)}
+"""
+
+# Seconds between sweeps of the local buckets
+PRUNE_INTERVAL = 60
+
+# key -> (tokens, monotonic time of the last charge, time it is full again)
+_buckets = {}
+_next_prune = 0.0
+_lock = threading.Lock()
+_script = None
+
+
+def clear():
+    global _next_prune
+    with _lock:
+        _buckets.clear()
+        _next_prune = 0.0
+
+
+def _prune(now):
+    """Drop refilled buckets; a missing bucket starts full, so nothing changes"""
+    for key in [key for key, (_, _, full_at) in _buckets.items() if full_at <= now]:
+        del _buckets[key]
+
+
+def _charge_locally(buckets, cost):
+    global _next_prune
+    now = time.monotonic()
+    with _lock:
+        if now >= _next_prune:
+            _prune(now)
+            _next_prune = now + PRUNE_INTERVAL
+        balances, wait = [], 0
+        for key, capacity, rate in buckets:
+            tokens, at, _ = _buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - at) * rate)
+            charge = min(cost, capacity)
+            if tokens < charge:
+                wait = max(wait, (charge - tokens) / rate)
+            balances.append(tokens)
+        allowed = not wait
+        for index, (key, capacity, rate) in enumerate(buckets):
+            if allowed:
+                balances[index] -= min(cost, capacity)
+            _buckets[key] = (balances[index], now, now + (capacity - balances[index]) / rate)
+    return allowed, wait, balances
+
+
+def _get_script():
+    global _script
+    if _script is None:
+        import redis
+        _script = redis.Redis.from_url(settings.REDIS_URL).register_script(CHARGE_SCRIPT)
+    return _script
+
+
+def charge(buckets, cost):
+    """
+    Charge ``cost`` against every ``(key, capacity, rate)`` bucket, or none of
+    them if one cannot pay; ``(allowed, seconds to wait, balances)``.
+    """
+    if settings.REDIS_URL:
+        import redis
+        args = [cost]
+        for _, capacity, rate in buckets:
+            args += [capacity, rate]
+        try:
+            result = _get_script()(keys=[BUCKET_KEY.format(key) for key, _, _ in buckets], args=args)
+        except redis.RedisError as e:
+            logger.warning("Throttle buckets unavailable, charging locally: %s", e)
+        else:
+            return bool(result[0]), float(result[1]), [float(balance) for balance in result[2:]]
+    return _charge_locally(buckets, cost)
+
+
+def get_throttle_cost(view_class, action):
+    return getattr(view_class, 'throttle_costs', {}).get(action, 1)
+
+
+class CostBasedThrottle(BaseThrottle):
+    """
+    Charges each request its view's declared cost and reports the remaining
+    budget in ``X-RateLimit-*`` headers.
+    """
+
+    def get_buckets(self, request):
+        limits = settings.THROTTLE_BUCKETS
+        principal = get_principal(request)
+        if principal.user_id is None:
+            bucket = limits['anon']
+            return [(f'anon:{self.get_ident(request)}', bucket['capacity'], bucket['rate'])]
+        bucket = limits.get(principal.user_type, limits['anon'])
+        buckets = [(f'user:{principal.user_id}', bucket['capacity'], bucket['rate'])]
+        if principal.is_supplier and principal.assigned_grocery_id is not None:
+            bucket = limits['grocery']
+            buckets.append((f'grocery:{principal.assigned_grocery_id}', bucket['capacity'], bucket['rate']))
+        return buckets
+
+    def allow_request(self, request, view):
+        action = getattr(view, 'action', None) or request.method.lower()
+        cost = get_throttle_cost(type(view), action)
+        buckets = self.get_buckets(request)
+        allowed, self.wait_seconds, balances = charge(buckets, cost)
+        # Report the bucket closest to running out; finalize_response copies
+        # view.headers onto the response, 429 included
+        balance, (_, capacity, _) = min(zip(balances, buckets), key=lambda pair: pair[0])
+        view.headers.update({
+            'X-RateLimit-Limit': str(int(capacity)),
+            'X-RateLimit-Remaining': str(max(0, math.floor(balance))),
+            'X-RateLimit-Cost': str(cost),
+        })
+        return allowed
+
+    def wait(self):
+        return math.ceil(self.wait_seconds) or 1
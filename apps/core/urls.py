@@ -0,0 +1,7 @@
+from django.urls import path
+
+from .views import EventStreamView
+
+urlpatterns = [
+    path('', EventStreamView.as_view(), name='event-stream'),
+]
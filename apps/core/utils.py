@@ -0,0 +1,42 @@
+from django.db import connections, router
+
+
+def additive_upsert(model, rows, unique_fields, add_fields, update_fields=()):
+    """
+    Insert ``rows`` (dicts keyed by field attname) in one statement.
+
+    A row conflicting on ``unique_fields`` adds its ``add_fields`` onto the
+    existing row and overwrites its ``update_fields`` instead, so concurrent
+    writers accumulate into a row without reading it first. Uses
+    ``INSERT ... ON CONFLICT DO UPDATE`` (PostgreSQL, SQLite 3.24+).
+    """
+    if not rows:
+        return 0
+    connection = connections[router.db_for_write(model)]
+    qn = connection.ops.quote_name
+    opts = model._meta
+    table = qn(opts.db_table)
+    fields = [opts.get_field(name) for name in rows[0]]
+
+    columns = ', '.join(qn(field.column) for field in fields)
+    placeholders = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    conflict = ', '.join(qn(opts.get_field(name).column) for name in unique_fields)
+    assignments = [
+        f"{qn(opts.get_field(name).column)} = {table}.{qn(opts.get_field(name).column)} "
+        f"+ EXCLUDED.{qn(opts.get_field(name).column)}"
+        for name in add_fields
+    ] + [
+        f"{qn(opts.get_field(name).column)} = EXCLUDED.{qn(opts.get_field(name).column)}"
+        for name in update_fields
+    ]
+    sql = (
+        f"INSERT INTO {table} ({columns}) VALUES {', '.join([placeholders] * len(rows))} "
+        f"ON CONFLICT ({conflict}) DO UPDATE SET {', '.join(assignments)}"
+    )
+    params = [
+        field.get_db_prep_save(row[field.attname], connection)
+        for row in rows for field in fields
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
@@ -0,0 +1,168 @@
+"""
+Read-only serialization from ``values_list()`` rows.
+
+``values_serializer_for`` turns a model serializer class into a
+``ValuesSerializer`` that reads the same fields from plain tuples: each
+field's source becomes a ``values_list()`` lookup (``item_type.name`` ->
+``item_type__name``), and its ``to_representation`` is kept, so the output
+is exactly what the serializer would produce - without model instances,
+``get_attribute`` traversal or per-field dispatch.
+
+Properties listed in the serializer's ``Meta.field_sources`` are read off
+the row itself: rows are then tuples of a class that carries the model's
+properties and exposes the columns they declare as attributes. Serializers with anything else (method fields, nested
+serializers, many-to-many, callables, paths through nullable relations)
+are not supported and ``values_serializer_for`` returns None.
+"""
+from functools import lru_cache
+from operator import itemgetter
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from rest_framework import serializers
+
+# Fields whose to_representation returns a value of these columns unchanged
+PASSTHROUGH = (
+    (serializers.CharField, (models.CharField, models.TextField)),
+    (serializers.IntegerField, (models.IntegerField, models.AutoField)),
+    (serializers.BooleanField, (models.BooleanField,)),
+)
+
+
+class Unsupported(Exception):
+    pass
+
+
+class ValuesSerializer:
+    """Precomputed getters over the columns of ``lookups``"""
+
+    def __init__(self, lookups, getters, annotations=(), row_class=None):
+        self.lookups = lookups
+        self.getters = getters
+        self.row_class = row_class
+        # Lookups that are not model fields; the queryset must annotate them
+        self.annotations = frozenset(annotations)
+
+    def supports(self, queryset):
+        return self.annotations <= set(queryset.query.annotations)
+
+    def rows(self, queryset):
+        return queryset.values_list(*self.lookups)
+
+    def to_representation(self, rows):
+        getters = self.getters
+        if self.row_class is not None:
+            rows = map(self.row_class, rows)
+        return [{name: get(row) for name, get in getters} for row in rows]
+
+
+def _column_getter(index, field, model_field):
+    get = itemgetter(index)
+    for serializer_field, model_fields in PASSTHROUGH:
+        if type(field) is serializer_field and isinstance(model_field, model_fields):
+            return get
+    if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+        # values_list() already returns the id
+        return get
+    represent = field.to_representation
+
+    def getter(row):
+        value = row[index]
+        return None if value is None else represent(value)
+    return getter
+
+
+def _property_getter(prop, field):
+    fget = prop.fget
+    # CharField.to_representation is str()
+    represent = str if type(field) is serializers.CharField else field.to_representation
+
+    def getter(row):
+        value = fget(row)
+        return None if value is None else represent(value)
+    return getter
+
+
+def _resolve(model, attrs):
+    """``(lookup, model field)`` for a source path, following non-null relations"""
+    for position, attr in enumerate(attrs):
+        field = model._meta.get_field(attr)
+        last = position == len(attrs) - 1
+        if field.is_relation:
+            if not (field.many_to_one or field.one_to_one) or not field.concrete:
+                raise Unsupported(attr)
+            if last:
+                return attr, field
+            if field.null:
+                # DRF skips the field when the relation is empty
+                raise Unsupported(attr)
+            model = field.related_model
+            continue
+        if not last:
+            raise Unsupported(attr)
+        return '__'.join(attrs), field
+    raise Unsupported('*')
+
+
+def build(serializer_class):
+    serializer = serializer_class()
+    meta = getattr(serializer_class, 'Meta', None)
+    model = meta.model
+    field_sources = getattr(meta, 'field_sources', {})
+    properties = {
+        name: attr
+        for klass in reversed(model.__mro__)
+        for name, attr in vars(klass).items()
+        if isinstance(attr, property)
+    }
+
+    lookups, getters, annotations = [], [], []
+    # Attributes of the row class: the columns properties read
+    row_attrs = {}
+
+    def column(lookup):
+        if lookup not in lookups:
+            lookups.append(lookup)
+        return lookups.index(lookup)
+
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField,
+                              serializers.ManyRelatedField, serializers.HiddenField)):
+            raise Unsupported(name)
+        attrs = field.source_attrs
+        if len(attrs) == 1 and attrs[0] in properties and name in field_sources:
+            sources = field_sources[name]
+            if any('.' in source for source in sources):
+                raise Unsupported(name)
+            for source in sources:
+                row_attrs[source] = property(itemgetter(column(_resolve(model, [source])[0])))
+            getters.append((name, _property_getter(properties[attrs[0]], field)))
+            continue
+        try:
+            lookup, model_field = _resolve(model, attrs)
+        except FieldDoesNotExist:
+            if len(attrs) != 1 or attrs[0] in properties or hasattr(model, attrs[0]):
+                raise Unsupported(name)
+            # An annotation of the view's queryset
+            lookup, model_field = attrs[0], None
+            annotations.append(lookup)
+        getters.append((name, _column_getter(column(lookup), field, model_field)))
+    row_class = None
+    if row_attrs:
+        row_class = type(f'{model.__name__}Row', (tuple,), {
+            '__slots__': (), **properties, **row_attrs,
+        })
+    return ValuesSerializer(tuple(lookups), tuple(getters), annotations, row_class)
+
+
+@lru_cache(maxsize=None)
+def values_serializer_for(serializer_class):
+    """The ``ValuesSerializer`` for ``serializer_class``, or None if unsupported"""
+    if not issubclass(serializer_class, serializers.ModelSerializer):
+        return None
+    try:
+        return build(serializer_class)
+    except Unsupported:
+        return None
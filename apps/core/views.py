@@ -0,0 +1,95 @@
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import events
+from .principal import get_principal
+
+
+class AsyncAPIView(View):
+    """
+    Base for async JSON endpoints that spend most of their time awaiting I/O.
+
+    DRF views are sync only, so this authenticates with the API's usual
+    authentication classes (in a worker thread, as they may touch the cache
+    or database) and reports errors in the same shape as DRF does. Handlers
+    are ``async def`` and find the authenticated user on ``request.user``.
+    Requests are charged by the API's throttles like any other.
+    """
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.user = await sync_to_async(self.authenticate)(request)
+        except exceptions.APIException as exc:
+            return self.error_response(exc)
+
+        if not request.user.is_authenticated:
+            return self.error_response(exceptions.NotAuthenticated())
+
+        # Throttles add their headers here, as on DRF views
+        self.headers = {}
+        wait = await sync_to_async(self.check_throttles)(request)
+        if wait is not None:
+            response = self.error_response(exceptions.Throttled(wait))
+            response['Retry-After'] = str(wait)
+        else:
+            response = await super().dispatch(request, *args, **kwargs)
+        for name, value in self.headers.items():
+            response[name] = value
+        return response
+
+    def authenticate(self, request):
+        drf_request = Request(request, authenticators=[auth() for auth in self.authentication_classes])
+        return drf_request.user
+
+    def check_throttles(self, request):
+        """Seconds until the request would be allowed, or None if it is"""
+        throttles = [throttle() for throttle in self.throttle_classes]
+        denied = [throttle for throttle in throttles if not throttle.allow_request(request, self)]
+        if denied:
+            return max(throttle.wait() or 0 for throttle in denied)
+        return None
+
+    def error_response(self, exc):
+        detail = exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail}
+        response = JsonResponse(detail, status=exc.status_code)
+        if exc.status_code == 401:
+            response['WWW-Authenticate'] = 'Bearer realm="api"'
+        return response
+
+
+class EventStreamView(AsyncAPIView):
+    """
+    Server-Sent Events for stock and income changes (see ``apps.core.events``).
+
+    Suppliers receive their grocery's events; other users every grocery's,
+    or one grocery's with ``?grocery=``. Clients resume with the
+    ``Last-Event-ID`` header (or ``?last_event_id=``, for EventSource
+    polyfills that cannot set headers).
+    """
+    query_budgets = {'get': 1}
+
+    async def get(self, request):
+        principal = await sync_to_async(get_principal)(request)
+        if principal.is_supplier:
+            grocery_id = principal.assigned_grocery_id
+            if grocery_id is None:
+                return JsonResponse({'error': 'No grocery assigned'}, status=403)
+        else:
+            try:
+                grocery_id = int(request.GET['grocery']) if request.GET.get('grocery') else None
+            except ValueError:
+                return JsonResponse({'error': 'grocery must be an integer'}, status=400)
+
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        response = StreamingHttpResponse(events.stream(grocery_id, last_event_id),
+                                         content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
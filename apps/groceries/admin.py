@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Grocery
+from .models import Grocery, ArchivedGrocery
 
 
 @admin.register(Grocery)
@@ -29,3 +29,10 @@ class GroceryAdmin(admin.ModelAdmin):
             "fields": ("created_at", "updated_at"),
         }),
     )
+
+
+@admin.register(ArchivedGrocery)
+class ArchivedGroceryAdmin(admin.ModelAdmin):
+    list_display = ("original_id", "name", "location", "deleted_at", "archived_at")
+    search_fields = ("name", "location")
+    readonly_fields = ("original_id", "name", "location", "deleted_at", "archived_at", "data")
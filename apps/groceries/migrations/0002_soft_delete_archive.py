@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:50
+
+import django.core.serializers.json
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groceries', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedGrocery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True)),
+                ('deleted_at', models.DateTimeField(null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('name', models.CharField(max_length=255)),
+                ('location', models.CharField(max_length=500)),
+            ],
+            options={
+                'verbose_name_plural': 'Archived groceries',
+                'ordering': ['-archived_at'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='grocery',
+            name='groceries_g_locatio_8384e1_idx',
+        ),
+        migrations.AddIndex(
+            model_name='grocery',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['location'], name='grocery_active_location_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='grocery',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at'], name='grocery_deleted_at_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groceries', '0002_soft_delete_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='grocery',
+            index=models.Index(fields=['updated_at', 'id'], name='grocery_changes_idx'),
+        ),
+    ]
@@ -1,7 +1,8 @@
 from django.db import models
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from apps.core.models import TimeStampedModel, SoftDeleteModel
+from apps.core.models import TimeStampedModel, SoftDeleteModel, ArchiveModel
+from apps.core.signals import soft_deleted, restored
 from apps.accounts.models import User
 
 class Grocery(TimeStampedModel, SoftDeleteModel):
@@ -19,12 +20,37 @@ class Grocery(TimeStampedModel, SoftDeleteModel):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['name']),
-            models.Index(fields=['location']),
+            models.Index(
+                fields=['location'], name='grocery_active_location_idx',
+                condition=models.Q(is_deleted=False)
+            ),
+            models.Index(
+                fields=['deleted_at'], name='grocery_deleted_at_idx',
+                condition=models.Q(is_deleted=True)
+            ),
+            models.Index(fields=['updated_at', 'id'], name='grocery_changes_idx'),
         ]
     
     def __str__(self):
         return f"{self.name} - {self.location}"
     
+    def soft_delete_related(self, deleted_at):
+        """Soft delete all active items in one UPDATE"""
+        self.items.soft_delete(deleted_at)
+    
+    def restore_related(self, deleted_at):
+        """Restore the items deleted with this grocery, skipping names and SKUs now taken"""
+        from apps.items.models import Item
+        
+        if deleted_at is None:
+            return
+        active = Item.objects.filter(grocery_id=self.pk)
+        Item.all_objects.filter(
+            grocery_id=self.pk, deleted_at=deleted_at
+        ).exclude(name__in=active.values('name')).exclude(
+            sku__in=active.exclude(sku='').values('sku')
+        ).restore()
+    
     @property
     def supplier_count(self):
         """Count of suppliers assigned to this grocery"""
@@ -53,3 +79,45 @@ def sync_grocery_to_neo4j(sender, instance, created, **kwargs):
             instance.name,
             instance.location
         )
+
+
+@receiver(soft_deleted, sender=Grocery)
+def remove_grocery_from_neo4j(sender, instance, **kwargs):
+    """Remove the grocery and its item nodes when soft deleted"""
+    try:
+        from neo4j_integration.queries import GroceryGraphQueries
+        GroceryGraphQueries.delete_grocery_node(instance.id)
+    except Exception as e:
+        print(f"Neo4j delete error: {e}")
+
+
+@receiver(restored, sender=Grocery)
+def restore_grocery_in_neo4j(sender, instance, **kwargs):
+    """Recreate the grocery node and its restored items in one batch"""
+    from apps.items.models import Item
+    
+    try:
+        from neo4j_integration.queries import GroceryGraphQueries
+        GroceryGraphQueries.update_grocery_node(instance.id, instance.name, instance.location)
+        items = [
+            {'id': item['id'], 'name': item['name'], 'type': item['item_type__name'],
+             'price': float(item['price'])}
+            for item in Item.objects.filter(grocery_id=instance.pk)
+            .values('id', 'name', 'item_type__name', 'price')
+        ]
+        if items:
+            GroceryGraphQueries.create_item_nodes(instance.id, items)
+    except Exception as e:
+        print(f"Neo4j sync error: {e}")
+
+
+class ArchivedGrocery(ArchiveModel):
+    """Grocery purged after its soft-delete retention period"""
+    name = models.CharField(max_length=255)
+    location = models.CharField(max_length=500)
+    
+    archived_fields = ('name', 'location')
+    
+    class Meta:
+        verbose_name_plural = "Archived groceries"
+        ordering = ['-archived_at']
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from apps.accounts.serializers import UserSummarySerializer
 from .models import Grocery
 
 class GrocerySerializer(serializers.ModelSerializer):
@@ -11,6 +12,8 @@ class GrocerySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'location', 'created_by', 'created_by_name', 
                  'created_at', 'updated_at', 'total_items', 'total_suppliers']
         read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
+        expandable_fields = {'created_by': UserSummarySerializer}
+        field_sources = {'total_items': [], 'total_suppliers': []}
     
     def get_total_items(self, obj):
         return obj.item_count 
@@ -40,3 +43,9 @@ class GroceryListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Grocery
         fields = ['id', 'name', 'location', 'created_by_name', 'created_at']
+
+class GrocerySummarySerializer(serializers.ModelSerializer):
+    """Nested grocery for ?expand=grocery"""
+    class Meta:
+        model = Grocery
+        fields = ['id', 'name', 'location']
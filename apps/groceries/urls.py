@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import GroceryViewSet
+from .views import GroceryViewSet, GroceryAnalyticsView
 
 router = DefaultRouter()
 router.register(r'', GroceryViewSet)
 
 urlpatterns = [
+    path('<int:pk>/analytics/async/', GroceryAnalyticsView.as_view(), name='grocery-analytics-async'),
     path('', include(router.urls)),
 ]
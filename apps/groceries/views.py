@@ -1,3 +1,5 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -5,16 +7,32 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from .models import Grocery
 from .serializers import GrocerySerializer, GroceryCreateSerializer, GroceryListSerializer
+from apps.core.mixins import (
+    ChangesMixin, ConditionalGetMixin, GroceryScopedMixin, ReplicaReadMixin, SparseFieldsetMixin,
+)
 from apps.core.permissions import IsAdminUser
+from apps.core.views import AsyncAPIView
 
-class GroceryViewSet(viewsets.ModelViewSet):
-    queryset = Grocery.objects.all()
+class GroceryViewSet(GroceryScopedMixin, ChangesMixin, SparseFieldsetMixin, ReplicaReadMixin,
+                     ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Grocery.objects.select_related('created_by')
     serializer_class = GrocerySerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['location']
     search_fields = ['name', 'location']
     ordering_fields = ['name', 'created_at']
     ordering = ['-created_at']
+    replica_actions = ('list', 'retrieve', 'suppliers', 'items')
+    grocery_lookup = 'pk'
+    query_budgets = {
+        'list': 4, 'retrieve': 5, 'create': 3, 'update': 5, 'partial_update': 5,
+        'destroy': 5, 'analytics': 1, 'my_grocery': 3, 'suppliers': 2,
+        'items': 2, 'restore': 7, 'changes': 1,
+    }
+    throttle_costs = {'analytics': 20}
+    # The detail serializer counts items and suppliers per grocery
+    changes_serializer_class = GroceryListSerializer
+    validator_related = ('created_by',)
     
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -24,6 +42,9 @@ class GroceryViewSet(viewsets.ModelViewSet):
         
         return [permission() for permission in permission_classes]
     
+    def get_changes_queryset(self):
+        return self.scope_queryset(Grocery.all_objects.select_related('created_by'))
+    
     def get_serializer_class(self):
         if self.action == 'create':
             return GroceryCreateSerializer
@@ -31,12 +52,16 @@ class GroceryViewSet(viewsets.ModelViewSet):
             return GroceryListSerializer
         return GrocerySerializer
     
+    def get_detail_validator(self, instance):
+        # The detail payload includes live item/supplier counts
+        return (*super().get_detail_validator(instance), instance.item_count, instance.supplier_count)
+    
     def perform_create(self, serializer):
         grocery = serializer.save(created_by=self.request.user)
         # Neo4j sync is handled by signal
     
     def perform_destroy(self, instance):
-        """Soft delete the grocery"""
+        """Soft delete the grocery and its items"""
         instance.soft_delete()
     
     @action(detail=True, methods=['get'])
@@ -55,21 +80,16 @@ class GroceryViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def my_grocery(self, request):
         """Get grocery assigned to current supplier"""
-        if request.user.user_type != 'supplier':
+        if not self.principal.is_supplier:
             return Response({'error': 'Only suppliers can access this endpoint'}, 
                           status=status.HTTP_403_FORBIDDEN)
         
-        try:
-            supplier_profile = request.user.supplier_profile
-            if supplier_profile.assigned_grocery:
-                serializer = self.get_serializer(supplier_profile.assigned_grocery)
-                return Response(serializer.data)
-            else:
-                return Response({'error': 'No grocery assigned'}, 
-                              status=status.HTTP_404_NOT_FOUND)
-        except AttributeError:
-            return Response({'error': 'Supplier profile not found'}, 
+        grocery = self.scope_queryset(self.get_queryset()).first()
+        if grocery is None:
+            return Response({'error': 'No grocery assigned'}, 
                           status=status.HTTP_404_NOT_FOUND)
+        serializer = self.get_serializer(grocery)
+        return Response(serializer.data)
     
     @action(detail=True, methods=['get'])
     def suppliers(self, request, pk=None):
@@ -77,7 +97,7 @@ class GroceryViewSet(viewsets.ModelViewSet):
         grocery = self.get_object()
         from apps.accounts.serializers import UserListSerializer
         
-        suppliers = grocery.suppliers.filter(user__is_active=True).select_related('user')
+        suppliers = grocery.suppliers.filter(user__is_active=True).select_related('user', 'assigned_grocery')
         supplier_users = [sp.user for sp in suppliers]
         
         serializer = UserListSerializer(supplier_users, many=True)
@@ -89,7 +109,7 @@ class GroceryViewSet(viewsets.ModelViewSet):
         grocery = self.get_object()
         from apps.items.serializers import ItemSerializer
         
-        items = grocery.items.filter(is_deleted=False)
+        items = grocery.items.filter(is_deleted=False).select_related('item_type', 'grocery', 'added_by')
         serializer = ItemSerializer(items, many=True)
         return Response(serializer.data)
     
@@ -103,7 +123,36 @@ class GroceryViewSet(viewsets.ModelViewSet):
         try:
             grocery = Grocery.all_objects.get(pk=pk, is_deleted=True)
             grocery.restore()
-            return Response({'message': 'Grocery restored successfully'})
+            return Response({
+                'message': 'Grocery restored successfully',
+                'items_restored': grocery.items.count(),
+            })
         except Grocery.DoesNotExist:
             return Response({'error': 'Deleted grocery not found'}, 
                           status=status.HTTP_404_NOT_FOUND)
+
+
+
+class GroceryAnalyticsView(AsyncAPIView):
+    """
+    Async variant of ``GroceryViewSet.analytics``.
+
+    The Neo4j round trip is awaited on the async driver, so under ASGI a
+    single worker keeps serving other requests while graph queries are slow.
+    """
+    query_budgets = {'get': 1}
+    throttle_costs = {'get': 20}
+
+    async def get(self, request, pk):
+        if not await Grocery.objects.filter(pk=pk).aexists():
+            return JsonResponse({'detail': 'No Grocery matches the given query.'},
+                                status=status.HTTP_404_NOT_FOUND)
+        try:
+            from neo4j_integration.queries import AsyncGroceryGraphQueries
+            analytics = await AsyncGroceryGraphQueries.get_grocery_analytics(int(pk))
+            return JsonResponse(analytics, safe=False, encoder=DjangoJSONEncoder)
+        except Exception as e:
+            return JsonResponse(
+                {'error': 'Analytics service unavailable', 'detail': str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:52
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groceries', '0003_changes_index'),
+        ('income', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyIncomeTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField()),
+                ('grocery_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='dailyincome',
+            index=models.Index(fields=['updated_at', 'id'], name='income_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyincome',
+            index=models.Index(fields=['grocery', 'updated_at', 'id'], name='income_grocery_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyincometombstone',
+            index=models.Index(fields=['deleted_at', 'original_id'], name='income_tombstone_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyincometombstone',
+            index=models.Index(fields=['grocery_id', 'deleted_at', 'original_id'], name='income_grocery_tombstone_idx'),
+        ),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from apps.core.models import TimeStampedModel
 from datetime import date
 from apps.accounts.models import User
@@ -33,6 +36,8 @@ class DailyIncome(TimeStampedModel):
         indexes = [
             models.Index(fields=['grocery', 'date']),
             models.Index(fields=['date']),
+            models.Index(fields=['updated_at', 'id'], name='income_changes_idx'),
+            models.Index(fields=['grocery', 'updated_at', 'id'], name='income_grocery_changes_idx'),
         ]
     
     def clean(self):
@@ -54,3 +59,36 @@ class DailyIncome(TimeStampedModel):
     def formatted_amount(self):
         """Return formatted amount as string"""
         return f"${self.amount:,.2f}"
+
+
+class DailyIncomeTombstone(models.Model):
+    """
+    A deleted income record, for delta sync.
+
+    Income is deleted outright rather than soft deleted, so this is what
+    tells synced devices to drop it. Kept as long as soft-deleted rows are.
+    """
+    original_id = models.BigIntegerField()
+    grocery_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'original_id'], name='income_tombstone_idx'),
+            models.Index(fields=['grocery_id', 'deleted_at', 'original_id'], name='income_grocery_tombstone_idx'),
+        ]
+
+    def __str__(self):
+        return f"Deleted income {self.original_id}"
+
+
+@receiver(post_delete, sender=DailyIncome)
+def record_income_tombstone(sender, instance, **kwargs):
+    DailyIncomeTombstone.objects.create(original_id=instance.pk, grocery_id=instance.grocery_id)
+
+
+@receiver(post_save, sender=DailyIncome)
+def publish_income(sender, instance, created, **kwargs):
+    if created:
+        from apps.core import events
+        events.income_recorded(instance.grocery_id, instance.date, instance.amount)
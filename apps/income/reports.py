@@ -0,0 +1,108 @@
+"""
+Income report computations.
+
+Each function takes an already scoped ``DailyIncome`` queryset and returns
+a JSON-serializable dict, so the same code serves the API actions and the
+background report jobs.
+"""
+from datetime import date, timedelta
+
+from django.db import models
+from django.db.models import Avg, Count, Sum
+from django.db.models.functions import TruncWeek
+
+
+def income_analytics(queryset, start_date=None, end_date=None, grocery_id=None):
+    """Totals, average and extremes of daily income over an optional range"""
+    if start_date:
+        queryset = queryset.filter(date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(date__lte=end_date)
+    if grocery_id:
+        queryset = queryset.filter(grocery_id=grocery_id)
+
+    analytics = queryset.aggregate(
+        total_income=Sum('amount', default=0),
+        average_daily_income=Avg('amount', default=0),
+        total_records=Count('id'),
+        max_daily_income=models.Max('amount', default=0),
+        min_daily_income=models.Min('amount', default=0)
+    )
+    analytics['date_range'] = {
+        'start_date': start_date.isoformat() if start_date else None,
+        'end_date': end_date.isoformat() if end_date else None,
+    }
+    return analytics
+
+
+def monthly_report(queryset, year, month, include_grocery_breakdown=False):
+    """Per-day totals for one month, optionally broken down by grocery"""
+    queryset = queryset.filter(date__year=year, date__month=month)
+
+    daily_data = {}
+    total_amount = 0
+    for income in queryset:
+        day = income.date.day
+        amount = float(income.amount)
+        if day not in daily_data:
+            daily_data[day] = {
+                'amount': 0,
+                'records_count': 0
+            }
+        daily_data[day]['amount'] += amount
+        daily_data[day]['records_count'] += 1
+        total_amount += amount
+
+    grocery_breakdown = {}
+    if include_grocery_breakdown:
+        grocery_totals = queryset.values('grocery__name').annotate(
+            total=Sum('amount'),
+            count=Count('id')
+        ).order_by('-total')
+
+        for item in grocery_totals:
+            grocery_breakdown[item['grocery__name']] = {
+                'total': float(item['total']),
+                'records': item['count']
+            }
+
+    return {
+        'year': year,
+        'month': month,
+        'daily_breakdown': daily_data,
+        'grocery_breakdown': grocery_breakdown,
+        'summary': {
+            'total_income': total_amount,
+            'total_days_recorded': len(daily_data),
+            'average_daily': total_amount / len(daily_data) if daily_data else 0
+        }
+    }
+
+
+def weekly_trends(queryset, weeks_back=4):
+    """Weekly income totals for the last ``weeks_back`` weeks"""
+    end_date = date.today()
+    start_date = end_date - timedelta(weeks=weeks_back)
+
+    weekly_data = queryset.filter(
+        date__gte=start_date,
+        date__lte=end_date
+    ).annotate(
+        week=TruncWeek('date')
+    ).values('week').annotate(
+        total_income=Sum('amount'),
+        record_count=Count('id')
+    ).order_by('week')
+
+    trends = []
+    for week in weekly_data:
+        trends.append({
+            'week_start': week['week'].strftime('%Y-%m-%d'),
+            'total_income': float(week['total_income']),
+            'records_count': week['record_count']
+        })
+
+    return {
+        'period': f"{start_date} to {end_date}",
+        'weekly_trends': trends
+    }
@@ -87,6 +87,9 @@ from rest_framework import serializers
 from django.utils import timezone
 from .models import DailyIncome
 from apps.groceries.models import Grocery
+from apps.groceries.serializers import GrocerySummarySerializer
+from apps.accounts.serializers import UserSummarySerializer
+from apps.core.principal import get_principal
 
 
 class DailyIncomeSerializer(serializers.ModelSerializer):
@@ -103,6 +106,11 @@ class DailyIncomeSerializer(serializers.ModelSerializer):
             'recorded_by_name', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'recorded_by', 'created_at', 'updated_at']
+        expandable_fields = {
+            'grocery': GrocerySummarySerializer,
+            'recorded_by': UserSummarySerializer,
+        }
+        field_sources = {'formatted_amount': ['amount']}
 
 
 class DailyIncomeCreateSerializer(serializers.ModelSerializer):
@@ -124,20 +132,13 @@ class DailyIncomeCreateSerializer(serializers.ModelSerializer):
 
     def validate_grocery(self, value):
         """Validate grocery access for suppliers"""
-        user = self.context['request'].user
-
         if value.is_deleted:
             raise serializers.ValidationError("Cannot add income for deleted grocery")
 
-        if user.user_type == 'supplier':
-            try:
-                supplier_profile = user.supplier_profile
-                if supplier_profile.assigned_grocery != value:
-                    raise serializers.ValidationError(
-                        "Suppliers can only add income for their assigned grocery"
-                    )
-            except AttributeError:
-                raise serializers.ValidationError("Supplier profile not found")
+        if not get_principal(self.context['request']).can_access_grocery(value.pk):
+            raise serializers.ValidationError(
+                "Suppliers can only add income for their assigned grocery"
+            )
         return value
 
     def validate(self, attrs):
@@ -165,3 +166,4 @@ class DailyIncomeListSerializer(serializers.ModelSerializer):
     class Meta:
         model = DailyIncome
         fields = ['id', 'grocery_name', 'date', 'formatted_amount', 'notes']
+        field_sources = {'formatted_amount': ['amount']}
@@ -1,21 +1,30 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
+from django.db import models
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter, SearchFilter
 from django.db.models import Sum, Avg, Count, Q
 from django.db.models.functions import TruncMonth, TruncWeek
 from datetime import datetime, timedelta, date
-from .models import DailyIncome
+from . import reports
+from .models import DailyIncome, DailyIncomeTombstone
+from apps.groceries.models import Grocery
 from .serializers import (
     DailyIncomeSerializer, 
     DailyIncomeCreateSerializer, 
     DailyIncomeListSerializer
 )
+from apps.core.mixins import (
+    ChangesMixin, ConditionalGetMixin, GroceryScopedMixin, ReplicaReadMixin, SparseFieldsetMixin,
+    ValuesListMixin,
+)
 from apps.core.permissions import IsAdminUser
 
 
-class DailyIncomeViewSet(viewsets.ModelViewSet):
+class DailyIncomeViewSet(GroceryScopedMixin, ChangesMixin, SparseFieldsetMixin, ReplicaReadMixin,
+                         ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     Income management with proper permissions and analytics
     """
@@ -26,6 +35,17 @@ class DailyIncomeViewSet(viewsets.ModelViewSet):
     search_fields = ['grocery__name', 'notes']
     ordering_fields = ['date', 'amount', 'created_at']
     ordering = ['-date']
+    conditional_actions = ('list',)
+    validator_related = ('grocery', 'recorded_by')
+    replica_actions = (
+        'list', 'retrieve', 'analytics', 'monthly_report', 'weekly_trends', 'my_income_summary',
+    )
+    query_budgets = {
+        'list': 3, 'retrieve': 1, 'create': 4, 'update': 4, 'partial_update': 4,
+        'destroy': 3, 'analytics': 1, 'monthly_report': 2, 'weekly_trends': 1,
+        'my_income_summary': 2, 'changes': 2,
+    }
+    throttle_costs = {'analytics': 20, 'monthly_report': 20, 'weekly_trends': 20, 'my_income_summary': 20}
     
     def get_permissions(self):
         if self.action in ['update', 'partial_update', 'destroy']:
@@ -36,18 +56,10 @@ class DailyIncomeViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
     
     def get_queryset(self):
-        queryset = super().get_queryset()
-        
-        if self.request.user.user_type == 'supplier':
-            try:
-                supplier_profile = self.request.user.supplier_profile
-                if supplier_profile.assigned_grocery:
-                    return queryset.filter(grocery=supplier_profile.assigned_grocery)
-            except AttributeError:
-                pass
-            return queryset.none()
-        
-        return queryset
+        return self.scope_queryset(super().get_queryset())
+    
+    def get_tombstones(self):
+        return self.scope_queryset(DailyIncomeTombstone.objects.all())
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -58,45 +70,32 @@ class DailyIncomeViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         """Create income record with proper validation"""
-        user = self.request.user
-        
-        if user.user_type == 'supplier':
-            try:
-                supplier_profile = user.supplier_profile
-                grocery = serializer.validated_data['grocery']
-                if supplier_profile.assigned_grocery != grocery:
-                    raise PermissionError("Cannot add income for other grocery stores")
-            except AttributeError:
-                raise PermissionError("Supplier profile not found")
-        
-        serializer.save(recorded_by=user)
+        self.check_grocery_access(
+            serializer.validated_data['grocery'].pk, "Cannot add income for other grocery stores"
+        )
+        serializer.save(recorded_by=self.request.user)
     
     def perform_update(self, serializer):
         """Only admins can update income records"""
-        if self.request.user.user_type != 'admin':
-            raise PermissionError("Only admins can modify income records")
+        if not self.principal.is_admin:
+            raise PermissionDenied("Only admins can modify income records")
         serializer.save()
     
     def perform_destroy(self, instance):
         """Only admins can delete income records"""
-        if self.request.user.user_type != 'admin':
-            raise PermissionError("Only admins can delete income records")
+        if not self.principal.is_admin:
+            raise PermissionDenied("Only admins can delete income records")
         instance.delete()
     
     @action(detail=False, methods=['get'])
     def analytics(self, request):
         """Comprehensive income analytics"""
-        queryset = self.get_queryset()
-        
-
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
-        grocery_id = request.query_params.get('grocery_id')
         
         if start_date:
             try:
                 start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(date__gte=start_date)
             except ValueError:
                 return Response({'error': 'Invalid start_date format. Use YYYY-MM-DD'}, 
                               status=status.HTTP_400_BAD_REQUEST)
@@ -104,29 +103,16 @@ class DailyIncomeViewSet(viewsets.ModelViewSet):
         if end_date:
             try:
                 end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(date__lte=end_date)
             except ValueError:
                 return Response({'error': 'Invalid end_date format. Use YYYY-MM-DD'}, 
                               status=status.HTTP_400_BAD_REQUEST)
         
-        if grocery_id:
-            queryset = queryset.filter(grocery_id=grocery_id)
-        
-        analytics = queryset.aggregate(
-            total_income=Sum('amount') or 0,
-            average_daily_income=Avg('amount') or 0,
-            total_records=Count('id'),
-            max_daily_income=queryset.aggregate(max_amount=models.Max('amount'))['max_amount'] or 0,
-            min_daily_income=queryset.aggregate(min_amount=models.Min('amount'))['min_amount'] or 0
+        analytics = reports.income_analytics(
+            self.get_queryset(),
+            start_date=start_date or None,
+            end_date=end_date or None,
+            grocery_id=request.query_params.get('grocery_id'),
         )
-        
-        analytics.update({
-            'date_range': {
-                'start_date': start_date.isoformat() if start_date else None,
-                'end_date': end_date.isoformat() if end_date else None,
-            }
-        })
-        
         return Response(analytics)
     
     @action(detail=False, methods=['get'])
@@ -139,115 +125,44 @@ class DailyIncomeViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Invalid year or month parameter'}, 
                           status=status.HTTP_400_BAD_REQUEST)
         
-        queryset = self.get_queryset().filter(
-            date__year=year,
-            date__month=month
-        )
-        
-        daily_data = {}
-        total_amount = 0
-        
-        for income in queryset:
-            day = income.date.day
-            amount = float(income.amount)
-            if day not in daily_data:
-                daily_data[day] = {
-                    'amount': 0,
-                    'records_count': 0
-                }
-            daily_data[day]['amount'] += amount
-            daily_data[day]['records_count'] += 1
-            total_amount += amount
-        
-
-        grocery_breakdown = {}
-        if request.user.user_type == 'admin':
-            grocery_totals = queryset.values('grocery__name').annotate(
-                total=Sum('amount'),
-                count=Count('id')
-            ).order_by('-total')
-            
-            for item in grocery_totals:
-                grocery_breakdown[item['grocery__name']] = {
-                    'total': float(item['total']),
-                    'records': item['count']
-                }
-        
-        return Response({
-            'year': year,
-            'month': month,
-            'daily_breakdown': daily_data,
-            'grocery_breakdown': grocery_breakdown,
-            'summary': {
-                'total_income': total_amount,
-                'total_days_recorded': len(daily_data),
-                'average_daily': total_amount / len(daily_data) if daily_data else 0
-            }
-        })
+        return Response(reports.monthly_report(
+            self.get_queryset(), year, month,
+            include_grocery_breakdown=self.principal.is_admin,
+        ))
     
     @action(detail=False, methods=['get'])
     def weekly_trends(self, request):
         """Weekly income trends"""
         weeks_back = int(request.query_params.get('weeks', 4))
-        end_date = date.today()
-        start_date = end_date - timedelta(weeks=weeks_back)
-        
-        queryset = self.get_queryset().filter(
-            date__gte=start_date,
-            date__lte=end_date
-        )
-        
-        weekly_data = queryset.annotate(
-            week=TruncWeek('date')
-        ).values('week').annotate(
-            total_income=Sum('amount'),
-            record_count=Count('id')
-        ).order_by('week')
-        
-
-        trends = []
-        for week in weekly_data:
-            trends.append({
-                'week_start': week['week'].strftime('%Y-%m-%d'),
-                'total_income': float(week['total_income']),
-                'records_count': week['record_count']
-            })
-        
-        return Response({
-            'period': f"{start_date} to {end_date}",
-            'weekly_trends': trends
-        })
+        return Response(reports.weekly_trends(self.get_queryset(), weeks_back))
     
     @action(detail=False, methods=['get'])
     def my_income_summary(self, request):
         """Supplier's own income summary"""
-        if request.user.user_type != 'supplier':
+        if not self.principal.is_supplier:
             return Response({'error': 'Only suppliers can access this endpoint'}, 
                           status=status.HTTP_403_FORBIDDEN)
         
-        try:
-            supplier_profile = request.user.supplier_profile
-            if not supplier_profile.assigned_grocery:
-                return Response({'error': 'No grocery assigned'}, 
-                              status=status.HTTP_404_NOT_FOUND)
-            
-            # Get last 30 days
-            thirty_days_ago = date.today() - timedelta(days=30)
-            queryset = self.get_queryset().filter(date__gte=thirty_days_ago)
-            
-            summary = queryset.aggregate(
-                total_30_days=Sum('amount') or 0,
-                average_daily=Avg('amount') or 0,
-                total_records=Count('id')
-            )
-            
-            summary.update({
-                'grocery_name': supplier_profile.assigned_grocery.name,
-                'period': f"Last 30 days ({thirty_days_ago} to {date.today()})"
-            })
-            
-            return Response(summary)
-            
-        except AttributeError:
-            return Response({'error': 'Supplier profile not found'}, 
+        grocery_name = Grocery.objects.filter(
+            pk=self.principal.assigned_grocery_id
+        ).values_list('name', flat=True).first()
+        if grocery_name is None:
+            return Response({'error': 'No grocery assigned'}, 
                           status=status.HTTP_404_NOT_FOUND)
+        
+        # Get last 30 days
+        thirty_days_ago = date.today() - timedelta(days=30)
+        queryset = self.get_queryset().filter(date__gte=thirty_days_ago)
+        
+        summary = queryset.aggregate(
+            total_30_days=Sum('amount') or 0,
+            average_daily=Avg('amount') or 0,
+            total_records=Count('id')
+        )
+        
+        summary.update({
+            'grocery_name': grocery_name,
+            'period': f"Last 30 days ({thirty_days_ago} to {date.today()})"
+        })
+        
+        return Response(summary)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ItemType, Item
+from .models import ItemType, Item, ArchivedItem, InventorySnapshot, StockMovement, StockTransfer, StockTransferLine
 
 @admin.register(ItemType)
 class ItemTypeAdmin(admin.ModelAdmin):
@@ -9,4 +9,33 @@ class ItemTypeAdmin(admin.ModelAdmin):
 class ItemAdmin(admin.ModelAdmin):
     list_display = ("id", "name", "item_type", "location", "price", "grocery", "added_by", "quantity_in_stock", "reorder_level")
     list_filter = ("location", "item_type", "grocery")
-    search_fields = ("name", "sku")
\ No newline at end of file
+    search_fields = ("name", "sku")
+
+@admin.register(ArchivedItem)
+class ArchivedItemAdmin(admin.ModelAdmin):
+    list_display = ("original_id", "name", "sku", "grocery_id", "deleted_at", "archived_at")
+    search_fields = ("name", "sku")
+    readonly_fields = ("original_id", "grocery_id", "name", "sku", "deleted_at", "archived_at", "data")
+
+@admin.register(InventorySnapshot)
+class InventorySnapshotAdmin(admin.ModelAdmin):
+    list_display = ("date", "grocery", "item_type", "location", "item_count", "total_quantity", "total_value", "low_stock_count")
+    list_filter = ("date", "location", "item_type")
+    date_hierarchy = "date"
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ("item", "quantity", "reason", "created_at")
+    list_filter = ("reason",)
+    raw_id_fields = ("item",)
+
+class StockTransferLineInline(admin.TabularInline):
+    model = StockTransferLine
+    raw_id_fields = ("source_item", "destination_item")
+    extra = 0
+
+@admin.register(StockTransfer)
+class StockTransferAdmin(admin.ModelAdmin):
+    list_display = ("id", "source", "destination", "line_count", "total_quantity", "created_by", "created_at")
+    list_filter = ("source", "destination")
+    inlines = [StockTransferLineInline]
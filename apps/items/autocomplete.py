@@ -0,0 +1,250 @@
+"""
+Item name autocomplete from a per-worker prefix index.
+
+Each worker keeps, per grocery, a sorted array with an entry per word of
+every active item's name, ordered by the normalized name from that word
+on. A typeahead query is a binary search for the prefix followed by a
+short scan, so it costs microseconds and no query however large the
+catalog.
+
+Indexes are built lazily, on a grocery's first query, and kept current
+incrementally: item writes publish their changes after commit to a short
+journal in the Django cache, numbered by a per-grocery version.
+A worker whose index is behind replays the missing entries; one too far
+behind (or missing an entry) rebuilds instead. The journal also carries an
+epoch token that is replaced whenever the counter is lost from the cache,
+so an evicted counter can never make a stale index look current. Indexes are evicted least
+recently used first once the worker holds more than
+``AUTOCOMPLETE_MAX_ENTRIES`` keys.
+
+The journal only reaches other workers through a shared cache (Redis, with
+``REDIS_URL``). With the default per-process cache a worker sees its own
+writes at once and everyone else's when its index is rebuilt, which happens
+at the latest ``AUTOCOMPLETE_INDEX_TTL`` seconds after it was built.
+"""
+import threading
+import time
+import uuid
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+EPOCH_CACHE_KEY = 'items:autocomplete:{}:epoch'
+VERSION_CACHE_KEY = 'items:autocomplete:{}:version'
+CHANGE_CACHE_KEY = 'items:autocomplete:{}:change:{}'
+
+# Low bits of an index entry holding the word's offset in the normalized name
+OFFSET_BITS = 16
+OFFSET_MASK = (1 << OFFSET_BITS) - 1
+
+# grocery_id -> GroceryIndex, least recently used first
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+
+def word_offsets(normalized):
+    """Where each word of a normalized name starts"""
+    offsets = [0]
+    position = normalized.find(' ')
+    while position != -1:
+        offsets.append(position + 1)
+        position = normalized.find(' ', position + 1)
+    return offsets
+
+
+class GroceryIndex:
+    """
+    One grocery's active items, sorted by every word-start suffix of their
+    normalized names.
+
+    An entry is a single integer, ``item id << 16 | offset`` of the word in
+    the normalized name (names are at most 255 characters, and casefolding
+    at most triples that), so the sorted array costs 8 bytes per word and
+    each name is stored once.
+    """
+
+    def __init__(self, epoch, version, rows):
+        self.epoch = epoch
+        self.version = version
+        self.expires = time.monotonic() + settings.AUTOCOMPLETE_INDEX_TTL
+        # item id -> (normalized name, name, sku)
+        self.items = {}
+        entries, suffixes = [], []
+        for item_id, name, sku in rows:
+            normalized = normalize(name)
+            self.items[item_id] = (normalized, name, sku)
+            for offset in word_offsets(normalized):
+                entries.append((item_id << OFFSET_BITS) | offset)
+                suffixes.append(normalized[offset:])
+        # Sorting positions by a list lookup keeps the comparisons in C
+        order = sorted(range(len(entries)), key=suffixes.__getitem__)
+        self.entries = array('q', [entries[position] for position in order])
+
+    def __len__(self):
+        return len(self.entries)
+
+    def suffix(self, entry):
+        return self.items[entry >> OFFSET_BITS][0][entry & OFFSET_MASK:]
+
+    def search(self, prefix, limit):
+        entries, suffix = self.entries, self.suffix
+        results, seen = [], set()
+        position = bisect_left(entries, prefix, key=suffix)
+        while position < len(entries) and len(results) < limit:
+            entry = entries[position]
+            if not suffix(entry).startswith(prefix):
+                break
+            item_id = entry >> OFFSET_BITS
+            if item_id not in seen:
+                seen.add(item_id)
+                _, name, sku = self.items[item_id]
+                results.append({'id': item_id, 'name': name, 'sku': sku})
+            position += 1
+        return results
+
+    def set(self, item_id, name, sku):
+        self.remove(item_id)
+        normalized = normalize(name)
+        self.items[item_id] = (normalized, name, sku)
+        for offset in word_offsets(normalized):
+            entry = (item_id << OFFSET_BITS) | offset
+            self.entries.insert(bisect_left(self.entries, self.suffix(entry), key=self.suffix), entry)
+
+    def remove(self, item_id):
+        if item_id not in self.items:
+            return
+        normalized = self.items[item_id][0]
+        for offset in word_offsets(normalized):
+            entry = (item_id << OFFSET_BITS) | offset
+            position = bisect_left(self.entries, normalized[offset:], key=self.suffix)
+            while self.entries[position] != entry:
+                position += 1
+            del self.entries[position]
+        del self.items[item_id]
+
+
+def _start_journal(grocery_id):
+    if cache.add(VERSION_CACHE_KEY.format(grocery_id), 0, None):
+        # Versions restart from 0 and may repeat ones workers have seen
+        cache.set(EPOCH_CACHE_KEY.format(grocery_id), uuid.uuid4().hex, None)
+
+
+def current_state(grocery_id):
+    """``(epoch, version)`` of the grocery's journal"""
+    keys = (EPOCH_CACHE_KEY.format(grocery_id), VERSION_CACHE_KEY.format(grocery_id))
+    state = cache.get_many(keys)
+    if len(state) < 2:
+        _start_journal(grocery_id)
+        cache.add(keys[0], uuid.uuid4().hex, None)
+        state = cache.get_many(keys)
+    return state.get(keys[0]), state.get(keys[1])
+
+
+def publish(grocery_id, change):
+    """Journal ``change`` for every worker once the write commits"""
+    def send():
+        _start_journal(grocery_id)
+        version = cache.incr(VERSION_CACHE_KEY.format(grocery_id))
+        cache.set(CHANGE_CACHE_KEY.format(grocery_id, version), change, settings.AUTOCOMPLETE_JOURNAL_TTL)
+    transaction.on_commit(send)
+
+
+def item_saved(item):
+    if item.is_deleted:
+        publish(item.grocery_id, ('remove', item.pk))
+    else:
+        publish(item.grocery_id, ('set', item.pk, item.name, item.sku))
+
+
+def item_removed(item):
+    publish(item.grocery_id, ('remove', item.pk))
+
+
+def items_created(grocery_id, items):
+    """Items added without post_save (bulk_create)"""
+    for item in items:
+        publish(grocery_id, ('set', item.pk, item.name, item.sku))
+
+
+def reset_grocery(grocery_id):
+    """Rebuild the grocery's indexes (items changed in bulk)"""
+    publish(grocery_id, ('reset',))
+
+
+def clear():
+    with _lock:
+        _indexes.clear()
+
+
+def _build(grocery_id, epoch, version):
+    from .models import Item
+
+    rows = Item.objects.filter(grocery_id=grocery_id).order_by().values_list('id', 'name', 'sku')
+    return GroceryIndex(epoch, version, rows.iterator(chunk_size=10000))
+
+
+def _catch_up(grocery_id, index, version):
+    """Replay journal entries up to ``version``; False if the index must be rebuilt"""
+    if version - index.version > settings.AUTOCOMPLETE_JOURNAL_SIZE:
+        return False
+    keys = {
+        number: CHANGE_CACHE_KEY.format(grocery_id, number)
+        for number in range(index.version + 1, version + 1)
+    }
+    changes = cache.get_many(keys.values())
+    if len(changes) != len(keys):
+        return False
+    with _lock:
+        # Another thread may have replayed some of them meanwhile
+        for number in range(index.version + 1, version + 1):
+            change = changes[keys[number]]
+            if change[0] == 'reset':
+                return False
+            if change[0] == 'set':
+                index.set(*change[1:])
+            else:
+                index.remove(change[1])
+            index.version = number
+    return True
+
+
+def _get_index(grocery_id):
+    epoch, version = current_state(grocery_id)
+    with _lock:
+        index = _indexes.get(grocery_id)
+        if index is not None:
+            _indexes.move_to_end(grocery_id)
+    if index is not None and index.epoch == epoch and index.expires > time.monotonic() and (
+        index.version >= version or _catch_up(grocery_id, index, version)
+    ):
+        return index
+
+    # Changes published while this runs have a later version and are replayed next time
+    index = _build(grocery_id, epoch, version)
+    with _lock:
+        _indexes[grocery_id] = index
+        _indexes.move_to_end(grocery_id)
+        total = sum(len(cached) for cached in _indexes.values())
+        # The index just built stays, even if it is larger than the limit alone
+        while total > settings.AUTOCOMPLETE_MAX_ENTRIES and len(_indexes) > 1:
+            _, evicted = _indexes.popitem(last=False)
+            total -= len(evicted)
+    return index
+
+
+def autocomplete(grocery_id, query, limit):
+    """Active items of a grocery with a word of their name starting with ``query``"""
+    prefix = normalize(query)
+    if not prefix:
+        return []
+    index = _get_index(grocery_id)
+    with _lock:
+        return index.search(prefix, limit)
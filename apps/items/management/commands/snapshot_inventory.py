@@ -0,0 +1,30 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.items.snapshots import take_inventory_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Record today's stock per grocery, item type and location for trend "
+        "charts. Run nightly from cron when Celery beat is not used."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help="Date to file the snapshot under (YYYY-MM-DD, default today). "
+                 "The snapshot is always of current stock."
+        )
+
+    def handle(self, *args, **options):
+        snapshot_date = None
+        if options['date']:
+            try:
+                snapshot_date = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError("--date must be YYYY-MM-DD")
+
+        rows = take_inventory_snapshot(snapshot_date)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} inventory snapshot rows"))
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:50
+
+import django.core.serializers.json
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groceries', '0002_soft_delete_archive'),
+        ('items', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True)),
+                ('deleted_at', models.DateTimeField(null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('grocery_id', models.BigIntegerField(db_index=True)),
+                ('name', models.CharField(max_length=255)),
+                ('sku', models.CharField(blank=True, max_length=50)),
+            ],
+            options={
+                'verbose_name': 'Archived Item',
+                'verbose_name_plural': 'Archived Items',
+                'ordering': ['-archived_at'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='item',
+            name='items_item_grocery_5151c5_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='item',
+            name='items_item_name_1c746e_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='item',
+            name='items_item_price_cb7806_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='item',
+            name='items_item_is_dele_79eaf1_idx',
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['grocery', 'item_type'], name='item_active_grocery_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['name'], name='item_active_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['price'], name='item_active_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at'], name='item_deleted_at_idx'),
+        ),
+    ]
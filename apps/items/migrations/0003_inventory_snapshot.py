@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groceries', '0002_soft_delete_archive'),
+        ('items', '0002_soft_delete_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('location', models.CharField(choices=[('first_floor', 'First Floor'), ('second_floor', 'Second Floor'), ('basement', 'Basement'), ('storage', 'Storage'), ('freezer', 'Freezer'), ('display', 'Display Area')], max_length=20)),
+                ('item_count', models.PositiveIntegerField()),
+                ('total_quantity', models.PositiveBigIntegerField()),
+                ('total_value', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('low_stock_count', models.PositiveIntegerField()),
+                ('out_of_stock_count', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('grocery', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_snapshots', to='groceries.grocery')),
+                ('item_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_snapshots', to='items.itemtype')),
+            ],
+            options={
+                'verbose_name': 'Inventory Snapshot',
+                'verbose_name_plural': 'Inventory Snapshots',
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['grocery', 'date'], name='inv_snapshot_grocery_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'grocery', 'item_type', 'location'), name='unique_inventory_snapshot_per_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:11
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_duplicate_skus(apps, schema_editor):
+    """SKUs were never unique: refuse to migrate until duplicated active SKUs are resolved"""
+    Item = apps.get_model('items', 'Item')
+    active = Item.objects.filter(is_deleted=False).exclude(sku='')
+    duplicates = list(
+        active.order_by().values('grocery_id', 'sku').annotate(count=Count('id')).filter(count__gt=1)
+        .order_by('grocery_id', 'sku')
+    )
+    if not duplicates:
+        return
+    lines = [
+        f"  grocery {row['grocery_id']}, SKU {row['sku']!r}: items "
+        f"{sorted(active.filter(grocery_id=row['grocery_id'], sku=row['sku']).values_list('id', flat=True))}"
+        for row in duplicates
+    ]
+    raise RuntimeError(
+        "Active items share a SKU within their grocery. Change or clear the SKU of, or "
+        "delete, all but one item of each, then run migrate again:\n" + "\n".join(lines)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groceries', '0002_soft_delete_archive'),
+        ('items', '0003_inventory_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_skus, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='item',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_deleted', False), models.Q(('sku', ''), _negated=True)), fields=('grocery', 'sku'), name='unique_active_sku_per_grocery'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groceries', '0003_changes_index'),
+        ('items', '0006_stock_transfer'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['updated_at', 'id'], name='item_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['grocery', 'updated_at', 'id'], name='item_grocery_changes_idx'),
+        ),
+    ]
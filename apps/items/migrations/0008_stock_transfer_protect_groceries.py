@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groceries', '0003_changes_index'),
+        ('items', '0007_changes_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stocktransfer',
+            name='destination',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transfers_in', to='groceries.grocery'),
+        ),
+        migrations.AlterField(
+            model_name='stocktransfer',
+            name='source',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transfers_out', to='groceries.grocery'),
+        ),
+    ]
@@ -3,7 +3,8 @@ from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from apps.core.models import TimeStampedModel, SoftDeleteModel
+from apps.core.models import TimeStampedModel, SoftDeleteModel, ArchiveModel, FieldTrackerMixin
+from apps.core.signals import soft_deleted, restored
 from apps.accounts.models import User
 from apps.groceries.models import Grocery
 
@@ -22,9 +23,9 @@ class ItemType(TimeStampedModel):
     @property
     def active_items_count(self):
         """Count of non-deleted items of this type"""
-        return self.item_set.filter(is_deleted=False).count()
+        return self.items.filter(is_deleted=False).count()
 
-class Item(TimeStampedModel, SoftDeleteModel):
+class Item(FieldTrackerMixin, TimeStampedModel, SoftDeleteModel):
     LOCATION_CHOICES = (
         ('first_floor', 'First Floor'),
         ('second_floor', 'Second Floor'),
@@ -69,16 +70,39 @@ class Item(TimeStampedModel, SoftDeleteModel):
                 fields=['name', 'grocery'],
                 condition=models.Q(is_deleted=False),
                 name='unique_active_item_per_grocery'
-            )
+            ),
+            # Also the index behind exact SKU lookups (apps.items.pos)
+            models.UniqueConstraint(
+                fields=['grocery', 'sku'],
+                condition=models.Q(is_deleted=False) & ~models.Q(sku=''),
+                name='unique_active_sku_per_grocery'
+            ),
         ]
         ordering = ['-created_at']
         verbose_name = 'Item'
         verbose_name_plural = 'Items'
+        # Partial indexes cover only active rows, so soft-deleted rows do not
+        # bloat the indexes every SoftDeleteManager query goes through.
         indexes = [
-            models.Index(fields=['grocery', 'item_type']),
-            models.Index(fields=['name']),
-            models.Index(fields=['price']),
-            models.Index(fields=['is_deleted']),
+            models.Index(
+                fields=['grocery', 'item_type'], name='item_active_grocery_type_idx',
+                condition=models.Q(is_deleted=False)
+            ),
+            models.Index(
+                fields=['name'], name='item_active_name_idx',
+                condition=models.Q(is_deleted=False)
+            ),
+            models.Index(
+                fields=['price'], name='item_active_price_idx',
+                condition=models.Q(is_deleted=False)
+            ),
+            models.Index(
+                fields=['deleted_at'], name='item_deleted_at_idx',
+                condition=models.Q(is_deleted=True)
+            ),
+            # Delta sync reads changes, deleted rows included, in this order
+            models.Index(fields=['updated_at', 'id'], name='item_changes_idx'),
+            models.Index(fields=['grocery', 'updated_at', 'id'], name='item_grocery_changes_idx'),
         ]
     
     def clean(self):
@@ -93,6 +117,17 @@ class Item(TimeStampedModel, SoftDeleteModel):
         self.clean()
         super().save(*args, **kwargs)
     
+    def restore(self):
+        if self.grocery.is_deleted:
+            raise ValidationError("Cannot restore items of a deleted grocery")
+        clash = models.Q(name=self.name) | models.Q(sku=self.sku) if self.sku else models.Q(name=self.name)
+        taken = set(Item.objects.filter(clash, grocery_id=self.grocery_id).values_list('name', flat=True)[:2])
+        if self.name in taken:
+            raise ValidationError("An active item with this name already exists in this grocery")
+        if taken:
+            raise ValidationError("An active item with this SKU already exists in this grocery")
+        super().restore()
+    
     def __str__(self):
         return f"{self.name} - {self.grocery.name if self.grocery else 'No Grocery'}"
     
@@ -133,11 +168,189 @@ def sync_item_to_neo4j(sender, instance, created, **kwargs):
         except Exception as e:
             print(f"Neo4j sync error: {e}")
 
+@receiver(soft_deleted, sender=Item)
 @receiver(post_delete, sender=Item)
 def remove_item_from_neo4j(sender, instance, **kwargs):
-    """Remove item from Neo4j when hard deleted"""
+    """Remove item from Neo4j when soft deleted or hard deleted"""
+    if kwargs['signal'] is post_delete and instance.is_deleted:
+        # The node went away when the item was soft deleted
+        return
     try:
         from neo4j_integration.queries import GroceryGraphQueries
         GroceryGraphQueries.delete_item_node(instance.id)
     except Exception as e:
         print(f"Neo4j delete error: {e}")
+
+
+@receiver(restored, sender=Item)
+def restore_item_in_neo4j(sender, instance, **kwargs):
+    """Recreate the item node when restored"""
+    try:
+        from neo4j_integration.queries import GroceryGraphQueries
+        GroceryGraphQueries.create_item_nodes(instance.grocery_id, [{
+            'id': instance.id,
+            'name': instance.name,
+            'type': instance.item_type.name,
+            'price': float(instance.price),
+        }])
+    except Exception as e:
+        print(f"Neo4j sync error: {e}")
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+@receiver(soft_deleted, sender=Item)
+@receiver(restored, sender=Item)
+@receiver(soft_deleted, sender=Grocery)
+@receiver(restored, sender=Grocery)
+def invalidate_sku_cache(sender, instance, **kwargs):
+    """Cached POS lookups of the grocery are stale after any item write"""
+    from .pos import invalidate_grocery
+    invalidate_grocery(instance.pk if sender is Grocery else instance.grocery_id)
+
+
+@receiver(post_save, sender=Item)
+@receiver(soft_deleted, sender=Item)
+@receiver(restored, sender=Item)
+def journal_item_name(sender, instance, update_fields=None, **kwargs):
+    """Autocomplete indexes follow name and SKU changes"""
+    if update_fields is not None and not {'name', 'sku'} & set(update_fields):
+        return
+    from .autocomplete import item_saved
+    item_saved(instance)
+
+
+@receiver(post_save, sender=Item)
+def publish_stock_change(sender, instance, created, **kwargs):
+    """Live event streams follow stock levels"""
+    if instance.is_deleted or not (created or instance.has_changed('quantity_in_stock', 'reorder_level')):
+        return
+    from apps.core import events
+    loaded = getattr(instance, '_loaded_values', {})
+    was_low = None
+    if not created and 'quantity_in_stock' in loaded and 'reorder_level' in loaded:
+        was_low = loaded['quantity_in_stock'] <= loaded['reorder_level']
+    events.stock_changed(instance.pk, instance.grocery_id, instance.quantity_in_stock,
+                         instance.reorder_level, was_low)
+
+
+@receiver(post_delete, sender=Item)
+def journal_item_removal(sender, instance, **kwargs):
+    from .autocomplete import item_removed
+    item_removed(instance)
+
+
+@receiver(soft_deleted, sender=Grocery)
+@receiver(restored, sender=Grocery)
+def reset_autocomplete(sender, instance, **kwargs):
+    """The grocery's items were deleted or restored in bulk"""
+    from .autocomplete import reset_grocery
+    reset_grocery(instance.pk)
+
+class ArchivedItem(ArchiveModel):
+    """Item purged after its soft-delete retention period"""
+    grocery_id = models.BigIntegerField(db_index=True)
+    name = models.CharField(max_length=255)
+    sku = models.CharField(max_length=50, blank=True)
+    
+    archived_fields = ('grocery_id', 'name', 'sku')
+    
+    class Meta:
+        verbose_name = 'Archived Item'
+        verbose_name_plural = 'Archived Items'
+        ordering = ['-archived_at']
+
+
+class InventorySnapshot(models.Model):
+    """
+    Daily stock totals per (grocery, item type, location).
+
+    Rows are written set-based by ``apps.items.snapshots`` and never edited,
+    so history survives later changes to the items themselves.
+    """
+    date = models.DateField()
+    grocery = models.ForeignKey(Grocery, on_delete=models.CASCADE, related_name='inventory_snapshots')
+    item_type = models.ForeignKey(ItemType, on_delete=models.CASCADE, related_name='inventory_snapshots')
+    location = models.CharField(max_length=20, choices=Item.LOCATION_CHOICES)
+    item_count = models.PositiveIntegerField()
+    total_quantity = models.PositiveBigIntegerField()
+    total_value = models.DecimalField(max_digits=16, decimal_places=2)
+    low_stock_count = models.PositiveIntegerField()
+    out_of_stock_count = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'grocery', 'item_type', 'location'],
+                name='unique_inventory_snapshot_per_day'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['grocery', 'date'], name='inv_snapshot_grocery_date_idx'),
+        ]
+        ordering = ['date']
+        verbose_name = 'Inventory Snapshot'
+        verbose_name_plural = 'Inventory Snapshots'
+    
+    def __str__(self):
+        return f"{self.date} {self.grocery_id}/{self.item_type_id}/{self.location}"
+
+
+class StockMovement(models.Model):
+    """
+    An append-only record of a change to an item's stock.
+
+    Quantities are signed (negative for stock going out); reorder
+    suggestions estimate consumption from them (see ``apps.items.reorder``).
+    """
+    SALE = 'sale'
+    ADJUSTMENT = 'adjustment'
+    TRANSFER = 'transfer'
+    REASON_CHOICES = (
+        (SALE, 'Sale'),
+        (ADJUSTMENT, 'Adjustment'),
+        (TRANSFER, 'Transfer'),
+    )
+    
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='stock_movements')
+    quantity = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['item', 'created_at'], name='stock_movement_item_time_idx'),
+        ]
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.item_id} {self.quantity:+d} ({self.reason})"
+
+
+class StockTransfer(models.Model):
+    """Stock moved between two groceries in one transaction (see ``apps.items.transfers``)"""
+    # Protected so purging one grocery cannot erase the other side's history
+    source = models.ForeignKey(Grocery, on_delete=models.PROTECT, related_name='transfers_out')
+    destination = models.ForeignKey(Grocery, on_delete=models.PROTECT, related_name='transfers_in')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='stock_transfers')
+    line_count = models.PositiveIntegerField()
+    total_quantity = models.PositiveIntegerField()
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.source_id} -> {self.destination_id}: {self.total_quantity} units"
+
+
+class StockTransferLine(models.Model):
+    transfer = models.ForeignKey(StockTransfer, on_delete=models.CASCADE, related_name='lines')
+    source_item = models.ForeignKey(Item, on_delete=models.SET_NULL, null=True, related_name='+')
+    destination_item = models.ForeignKey(Item, on_delete=models.SET_NULL, null=True, related_name='+')
+    quantity = models.PositiveIntegerField()
+    
+    def __str__(self):
+        return f"{self.quantity} x {self.source_item_id} -> {self.destination_item_id}"
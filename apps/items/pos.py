@@ -0,0 +1,127 @@
+"""
+Point-of-sale SKU lookups and basket pricing.
+
+Recently scanned (grocery, SKU) pairs are kept in a per-worker LRU so a
+basket is usually priced without touching the database; misses are fetched
+together in one query through the unique (grocery, sku) index.
+
+Entries are tagged with their grocery's cache generation, a token kept in
+the Django cache. Any write to one of the grocery's items replaces the
+token (after commit), which invalidates that grocery's entries at the cost
+of one cache read per lookup - in every worker when the cache is shared
+(Redis, with ``REDIS_URL``). With the default per-process cache only the
+writing worker's entries are invalidated; the others serve the old row
+until it expires ``SKU_CACHE_TTL`` seconds after it was fetched.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+GENERATION_CACHE_KEY = 'items:sku_generation:{}'
+
+SKU_FIELDS = ('id', 'sku', 'name', 'location', 'price', 'quantity_in_stock', 'reorder_level')
+
+# (grocery_id, sku) -> (generation, expires at, row or None if there is no such item)
+_entries = OrderedDict()
+_lock = threading.Lock()
+
+
+def grocery_generation(grocery_id):
+    key = GENERATION_CACHE_KEY.format(grocery_id)
+    generation = cache.get(key)
+    if generation is None:
+        # A fresh token rather than a counter, so an evicted key can never
+        # make stale entries current again
+        cache.add(key, uuid.uuid4().hex, None)
+        generation = cache.get(key)
+    return generation
+
+
+def invalidate_grocery(grocery_id):
+    """Drop every worker's cached SKUs of a grocery once the write commits"""
+    key = GENERATION_CACHE_KEY.format(grocery_id)
+    transaction.on_commit(lambda: cache.set(key, uuid.uuid4().hex, None))
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+def lookup_skus(grocery_id, skus):
+    """Active items of a grocery by exact SKU, as ``{sku: row}``"""
+    from .models import Item
+
+    generation = grocery_generation(grocery_id)
+    now = time.monotonic()
+    found, misses = {}, []
+    with _lock:
+        for sku in dict.fromkeys(skus):
+            key = (grocery_id, sku)
+            entry = _entries.get(key)
+            if entry is not None and entry[0] == generation and entry[1] > now:
+                _entries.move_to_end(key)
+                if entry[2] is not None:
+                    found[sku] = entry[2]
+            else:
+                misses.append(sku)
+
+    if misses:
+        rows = {
+            row['sku']: row
+            for row in Item.objects.filter(grocery_id=grocery_id, sku__in=misses)
+            .order_by().values(*SKU_FIELDS, item_type_name=F('item_type__name'))
+        }
+        found.update(rows)
+        expires_at = now + settings.SKU_CACHE_TTL
+        with _lock:
+            # Unknown SKUs are cached too; adding the item bumps the generation
+            for sku in misses:
+                _entries[(grocery_id, sku)] = (generation, expires_at, rows.get(sku))
+                _entries.move_to_end((grocery_id, sku))
+            while len(_entries) > settings.SKU_CACHE_SIZE:
+                _entries.popitem(last=False)
+    return found
+
+
+def price_basket(grocery_id, lines):
+    """
+    Price ``lines`` of ``{'sku', 'quantity'}`` against a grocery's items.
+
+    Unknown SKUs are reported in ``missing`` and left out of the total;
+    ``available`` flags lines the current stock cannot cover.
+    """
+    items = lookup_skus(grocery_id, [line['sku'] for line in lines])
+    priced, missing = [], []
+    total = Decimal('0.00')
+    for line in lines:
+        item = items.get(line['sku'])
+        if item is None:
+            missing.append(line['sku'])
+            continue
+        line_total = item['price'] * line['quantity']
+        total += line_total
+        priced.append({
+            'sku': line['sku'],
+            'item_id': item['id'],
+            'name': item['name'],
+            'quantity': line['quantity'],
+            'unit_price': item['price'],
+            'line_total': line_total,
+            'quantity_in_stock': item['quantity_in_stock'],
+            'available': item['quantity_in_stock'] >= line['quantity'],
+        })
+    return {
+        'grocery': grocery_id,
+        'lines': priced,
+        'missing': missing,
+        'item_count': sum(line['quantity'] for line in priced),
+        'total': total,
+    }
@@ -0,0 +1,81 @@
+"""
+Reorder suggestions from recorded consumption.
+
+Each item's daily consumption rate is the stock that went out over the last
+``window_days`` (its ``StockMovement`` rows, other than transfers) divided
+by the window. From it:
+
+- reorder point = rate * (lead time + safety days), rounded up
+- order quantity = enough to cover ``cover_days`` past the reorder point
+
+Items without consumption in the window keep their manual reorder level.
+Everything is computed by the database in a single statement, so a page of
+suggestions - or a whole chain - costs one query, not one per item.
+"""
+from datetime import timedelta
+
+from django.db.models import (
+    BooleanField, Case, ExpressionWrapper, F, FloatField, IntegerField, Q, Sum, Value, When,
+)
+from django.db.models.functions import Cast, Ceil, Coalesce, Greatest
+from django.utils import timezone
+
+from .models import StockMovement
+
+SUGGESTION_FIELDS = (
+    'id', 'name', 'sku', 'grocery_id', 'quantity_in_stock', 'reorder_level',
+    'consumed', 'daily_rate', 'days_of_stock', 'reorder_point', 'order_quantity', 'needs_reorder',
+)
+
+
+def _ceil(expression):
+    return Cast(Ceil(expression), IntegerField())
+
+
+def reorder_suggestions(queryset, window_days, lead_time_days, safety_days, cover_days):
+    """
+    ``queryset`` (items) annotated with suggestions, most urgent first.
+
+    Returns a values queryset of ``SUGGESTION_FIELDS``, ready to paginate.
+    """
+    since = timezone.now() - timedelta(days=window_days)
+    # An aggregate over a join, not a correlated subquery: every annotation
+    # below refers to it, and a subquery would be re-run for each reference
+    consumed = -Sum('stock_movements__quantity', filter=Q(
+        stock_movements__quantity__lt=0, stock_movements__created_at__gte=since,
+    ) & ~Q(stock_movements__reason=StockMovement.TRANSFER))
+
+    return queryset.annotate(
+        consumed=Coalesce(consumed, Value(0)),
+        daily_rate=ExpressionWrapper(
+            Cast(F('consumed'), FloatField()) / Value(float(window_days)), output_field=FloatField()
+        ),
+    ).annotate(
+        reorder_point=Case(
+            When(consumed=0, then=F('reorder_level')),
+            default=_ceil(F('daily_rate') * Value(float(lead_time_days + safety_days))),
+            output_field=IntegerField(),
+        ),
+        days_of_stock=Case(
+            When(consumed=0, then=Value(None)),
+            default=ExpressionWrapper(
+                Cast(F('quantity_in_stock'), FloatField()) / F('daily_rate'), output_field=FloatField()
+            ),
+            output_field=FloatField(),
+        ),
+    ).annotate(
+        needs_reorder=ExpressionWrapper(
+            Q(quantity_in_stock__lte=F('reorder_point')), output_field=BooleanField()
+        ),
+        order_quantity=Case(
+            When(quantity_in_stock__gt=F('reorder_point'), then=Value(0)),
+            default=Greatest(
+                F('reorder_point') + _ceil(F('daily_rate') * Value(float(cover_days)))
+                - F('quantity_in_stock'),
+                Value(0),
+            ),
+            output_field=IntegerField(),
+        ),
+    ).order_by(
+        '-needs_reorder', F('days_of_stock').asc(nulls_last=True), 'pk',
+    ).values(*SUGGESTION_FIELDS)
@@ -0,0 +1,135 @@
+"""
+Inventory report computations, shared by the API actions and report jobs.
+"""
+from decimal import Decimal
+from itertools import combinations
+
+from django.db import models
+from django.db.models import Avg, Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Item
+
+
+def inventory_summary(queryset, include_grocery_breakdown=False):
+    """Stock value and low/out-of-stock counts, optionally per grocery"""
+    summary = queryset.aggregate(
+        total_items=Count('id'),
+        total_value=Sum(models.F('price') * models.F('quantity_in_stock')),
+        average_price=Avg('price'),
+        low_stock_count=Count('id', filter=Q(quantity_in_stock__lte=models.F('reorder_level'))),
+        out_of_stock_count=Count('id', filter=Q(quantity_in_stock=0))
+    )
+
+    if include_grocery_breakdown:
+        grocery_breakdown = queryset.values('grocery__name').annotate(
+            item_count=Count('id'),
+            total_value=Sum(models.F('price') * models.F('quantity_in_stock'))
+        ).order_by('-item_count')
+        summary['grocery_breakdown'] = list(grocery_breakdown)
+
+    return summary
+
+
+TREND_GROUPS = {
+    'grocery': ('grocery_id', 'grocery__name'),
+    'item_type': ('item_type_id', 'item_type__name'),
+    'location': ('location', 'location'),
+}
+
+
+def inventory_trends(queryset, start_date, end_date, group_by=None):
+    """
+    Daily stock totals from an ``InventorySnapshot`` queryset.
+
+    Returns one series per group (or a single 'total' series), each with a
+    point per snapshot date in the range.
+    """
+    key_field, label_field = TREND_GROUPS.get(group_by, (None, None))
+    group_fields = [key_field, label_field] if key_field else []
+    rows = queryset.filter(date__gte=start_date, date__lte=end_date).values(
+        *dict.fromkeys(group_fields), 'date'
+    ).annotate(
+        item_count=Sum('item_count'),
+        total_quantity=Sum('total_quantity'),
+        total_value=Sum('total_value'),
+        low_stock_count=Sum('low_stock_count'),
+        out_of_stock_count=Sum('out_of_stock_count'),
+    ).order_by(*dict.fromkeys(group_fields), 'date')
+
+    series = {}
+    for row in rows:
+        key = row[key_field] if key_field else 'total'
+        if key not in series:
+            series[key] = {
+                'key': key,
+                'label': row[label_field] if key_field else 'Total',
+                'points': [],
+            }
+        series[key]['points'].append({
+            'date': row['date'].isoformat(),
+            'item_count': row['item_count'],
+            'total_quantity': row['total_quantity'],
+            'total_value': row['total_value'],
+            'low_stock_count': row['low_stock_count'],
+            'out_of_stock_count': row['out_of_stock_count'],
+        })
+
+    return {
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'group_by': group_by,
+        'series': list(series.values()),
+    }
+
+
+CUBE_METRICS = ('item_count', 'total_quantity', 'total_value', 'low_stock_count', 'out_of_stock_count')
+
+
+def inventory_cube(queryset, dimensions):
+    """
+    Stock totals for every combination of ``dimensions`` (keys of
+    ``TREND_GROUPS``), from the grand total down to the finest cells.
+
+    The finest cells come from one GROUP BY; every roll-up is summed from
+    them, as all the metrics are additive. A rolled-up dimension is None in
+    its cells.
+    """
+    fields = [field for dimension in dimensions for field in dict.fromkeys(TREND_GROUPS[dimension])]
+    rows = queryset.values(*fields).annotate(
+        item_count=Count('id'),
+        total_quantity=Coalesce(Sum('quantity_in_stock'), 0),
+        total_value=Coalesce(
+            Sum(models.F('price') * models.F('quantity_in_stock')), Decimal('0'),
+            output_field=models.DecimalField(max_digits=16, decimal_places=2),
+        ),
+        low_stock_count=Count('id', filter=Q(quantity_in_stock__lte=models.F('reorder_level'))),
+        out_of_stock_count=Count('id', filter=Q(quantity_in_stock=0)),
+    ).order_by(*fields)
+
+    labels = {dimension: {} for dimension in dimensions}
+    for row in rows:
+        for dimension in dimensions:
+            key_field, label_field = TREND_GROUPS[dimension]
+            labels[dimension][row[key_field]] = row[label_field]
+    if 'location' in labels:
+        labels['location'] = dict(Item.LOCATION_CHOICES)
+
+    cells = []
+    for depth in range(len(dimensions) + 1):
+        for grouped in combinations(dimensions, depth):
+            totals = {}
+            for row in rows:
+                key = tuple(row[TREND_GROUPS[dimension][0]] for dimension in grouped)
+                cell = totals.setdefault(key, dict.fromkeys(CUBE_METRICS, 0))
+                for metric in CUBE_METRICS:
+                    cell[metric] += row[metric]
+            for key, metrics in totals.items():
+                cell = {}
+                for dimension in dimensions:
+                    value = key[grouped.index(dimension)] if dimension in grouped else None
+                    cell[dimension] = value
+                    cell[f'{dimension}_name'] = labels[dimension].get(value)
+                cells.append({**cell, **metrics})
+
+    return {'dimensions': list(dimensions), 'cells': cells}
@@ -1,9 +1,13 @@
+from django.conf import settings
 from rest_framework import serializers
+from apps.accounts.serializers import UserSummarySerializer
+from apps.core.principal import get_principal
+from apps.groceries.serializers import GrocerySummarySerializer
 from django.db.models import Q
-from .models import Item, ItemType
+from .models import Item, ItemType, StockTransfer, StockTransferLine
 
 class ItemTypeSerializer(serializers.ModelSerializer):
-    active_items_count = serializers.IntegerField(read_only=True)
+    active_items_count = serializers.SerializerMethodField()
     total_items = serializers.SerializerMethodField()
     
 
@@ -12,8 +16,16 @@ class ItemTypeSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'active_items_count', 'total_items', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
     
+    def get_active_items_count(self, obj):
+        # Annotated by ItemTypeViewSet; fall back to a query for plain instances
+        if hasattr(obj, 'active_items'):
+            return obj.active_items
+        return obj.active_items_count
+    
     def get_total_items(self, obj):
         """Get total items including soft deleted"""
+        if hasattr(obj, 'total_items'):
+            return obj.total_items
         return obj.items.count()
     
     def validate_name(self, value):
@@ -23,6 +35,12 @@ class ItemTypeSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError("Item type with this name already exists.")
         return value
 
+class ItemTypeSummarySerializer(serializers.ModelSerializer):
+    """Nested item type for ?expand=item_type"""
+    class Meta:
+        model = ItemType
+        fields = ['id', 'name']
+
 class ItemSerializer(serializers.ModelSerializer):
     item_type_name = serializers.CharField(source='item_type.name', read_only=True)
     grocery_name = serializers.CharField(source='grocery.name', read_only=True)
@@ -42,6 +60,16 @@ class ItemSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'added_by', 'created_at', 'updated_at']
+        expandable_fields = {
+            'grocery': GrocerySummarySerializer,
+            'item_type': ItemTypeSummarySerializer,
+            'added_by': UserSummarySerializer,
+        }
+        field_sources = {
+            'formatted_price': ['price'],
+            'stock_status': ['quantity_in_stock', 'reorder_level'],
+            'is_low_stock': ['quantity_in_stock', 'reorder_level'],
+        }
 
 
     def get_is_low_stock(self, obj):
@@ -60,22 +88,15 @@ class ItemCreateSerializer(serializers.ModelSerializer):
     
     def validate_grocery(self, value):
         """Validate grocery access and status"""
-        user = self.context['request'].user
-        
         # Check if grocery is soft deleted
         if value.is_deleted:
             raise serializers.ValidationError("Cannot add items to deleted grocery")
         
         # Supplier permission check
-        if user.user_type == 'supplier':
-            try:
-                supplier_profile = user.supplier_profile
-                if supplier_profile.assigned_grocery != value:
-                    raise serializers.ValidationError(
-                        "Suppliers can only add items to their assigned grocery"
-                    )
-            except AttributeError:
-                raise serializers.ValidationError("Supplier profile not found")
+        if not get_principal(self.context['request']).can_access_grocery(value.pk):
+            raise serializers.ValidationError(
+                "Suppliers can only add items to their assigned grocery"
+            )
         return value
     
     def validate_item_type(self, value):
@@ -88,22 +109,27 @@ class ItemCreateSerializer(serializers.ModelSerializer):
         """Cross-field validation"""
         name = attrs.get('name')
         grocery = attrs.get('grocery')
+        sku = attrs.get('sku')
         
-        # Check for duplicate item names in same grocery (excluding soft deleted)
+        # Check for duplicate item names or SKUs in same grocery (excluding
+        # soft deleted), both in one query
         if name and grocery:
-            existing_query = Item.objects.filter(
-                name__iexact=name,
-                grocery=grocery,
-                is_deleted=False
-            )
+            duplicates = Q(name__iexact=name)
+            if sku:
+                duplicates |= Q(sku=sku)
+            existing_query = Item.objects.filter(duplicates, grocery=grocery, is_deleted=False)
             
             # Exclude current instance during updates
             if self.instance:
                 existing_query = existing_query.exclude(id=self.instance.id)
             
-            if existing_query.exists():
+            for existing_name, existing_sku in existing_query.values_list('name', 'sku')[:2]:
+                if existing_name.lower() == name.lower():
+                    raise serializers.ValidationError({
+                        'name': f"Item '{name}' already exists in {grocery.name}"
+                    })
                 raise serializers.ValidationError({
-                    'name': f"Item '{name}' already exists in {grocery.name}"
+                    'sku': f"SKU '{sku}' is already used in {grocery.name}"
                 })
         
         # Validate stock levels
@@ -132,6 +158,13 @@ class ItemUpdateSerializer(serializers.ModelSerializer):
         if value <= 0:
             raise serializers.ValidationError("Price must be positive")
         return value
+    
+    def validate_sku(self, value):
+        """SKUs are unique among a grocery's active items"""
+        if value and value != self.instance.sku:
+            if Item.objects.filter(grocery_id=self.instance.grocery_id, sku=value).exclude(id=self.instance.id).exists():
+                raise serializers.ValidationError("This SKU is already used in this grocery")
+        return value
 
 class ItemListSerializer(serializers.ModelSerializer):
     """Lighter serializer for list views"""
@@ -143,3 +176,78 @@ class ItemListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Item
         fields = ['id', 'name', 'item_type_name', 'location', 'formatted_price', 'grocery_name', 'stock_status']
+        field_sources = {
+            'formatted_price': ['price'],
+            'stock_status': ['quantity_in_stock', 'reorder_level'],
+        }
+
+
+class SkuLookupSerializer(serializers.Serializer):
+    """Batch SKU lookup; grocery defaults to the supplier's own"""
+    grocery = serializers.IntegerField(required=False, min_value=1)
+    skus = serializers.ListField(
+        child=serializers.CharField(max_length=50),
+        allow_empty=False,
+        max_length=settings.SKU_LOOKUP_MAX_SKUS,
+    )
+
+class BasketLineSerializer(serializers.Serializer):
+    sku = serializers.CharField(max_length=50)
+    quantity = serializers.IntegerField(min_value=1, default=1)
+
+class BasketSerializer(serializers.Serializer):
+    """Basket to price; grocery defaults to the supplier's own"""
+    grocery = serializers.IntegerField(required=False, min_value=1)
+    lines = BasketLineSerializer(many=True, allow_empty=False, max_length=settings.SKU_LOOKUP_MAX_SKUS)
+
+class ReorderParamsSerializer(serializers.Serializer):
+    """Reorder suggestion settings, defaulting to the REORDER_* settings"""
+    window_days = serializers.IntegerField(min_value=1, max_value=365, default=lambda: settings.REORDER_WINDOW_DAYS)
+    lead_time_days = serializers.IntegerField(min_value=0, max_value=365, default=lambda: settings.REORDER_LEAD_TIME_DAYS)
+    safety_days = serializers.IntegerField(min_value=0, max_value=365, default=lambda: settings.REORDER_SAFETY_DAYS)
+    cover_days = serializers.IntegerField(min_value=0, max_value=365, default=lambda: settings.REORDER_COVER_DAYS)
+
+class AutocompleteParamsSerializer(serializers.Serializer):
+    """Typeahead query; grocery defaults to the supplier's own"""
+    q = serializers.CharField(max_length=100, trim_whitespace=True)
+    grocery = serializers.IntegerField(required=False, min_value=1)
+    limit = serializers.IntegerField(min_value=1, max_value=settings.AUTOCOMPLETE_MAX_RESULTS, default=10)
+
+class StockTransferLineSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StockTransferLine
+        fields = ['id', 'source_item', 'destination_item', 'quantity']
+        read_only_fields = fields
+
+class StockTransferSerializer(serializers.ModelSerializer):
+    lines = StockTransferLineSerializer(many=True, read_only=True)
+    
+    class Meta:
+        model = StockTransfer
+        fields = [
+            'id', 'source', 'destination', 'line_count', 'total_quantity', 'notes',
+            'lines', 'created_by', 'created_at',
+        ]
+        read_only_fields = fields
+        expandable_fields = {
+            'source': GrocerySummarySerializer,
+            'destination': GrocerySummarySerializer,
+            'created_by': UserSummarySerializer,
+        }
+
+class StockTransferListSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StockTransfer
+        fields = ['id', 'source', 'destination', 'line_count', 'total_quantity', 'created_by', 'created_at']
+        read_only_fields = fields
+
+class TransferLineSerializer(serializers.Serializer):
+    item = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1)
+
+class StockTransferCreateSerializer(serializers.Serializer):
+    """Items to move by source item id; source defaults to the supplier's grocery"""
+    source = serializers.IntegerField(required=False, min_value=1)
+    destination = serializers.IntegerField(min_value=1)
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+    lines = TransferLineSerializer(many=True, allow_empty=False, max_length=settings.TRANSFER_MAX_LINES)
@@ -0,0 +1,55 @@
+"""
+Nightly inventory snapshots.
+
+The live item table only knows current stock, so trends are charted from
+``InventorySnapshot`` rows written once a day. A snapshot is a single
+``INSERT ... SELECT`` of the grouped item aggregates: the database does the
+work and no item row is loaded into Python.
+"""
+from django.db import connection, models, transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.utils import timezone
+
+from .models import InventorySnapshot, Item
+
+# Column order of the grouped SELECT, which INSERT ... SELECT matches by position
+SNAPSHOT_COLUMNS = (
+    'grocery', 'item_type', 'location', 'date', 'item_count', 'total_quantity',
+    'total_value', 'low_stock_count', 'out_of_stock_count', 'created_at',
+)
+
+
+def snapshot_rows(snapshot_date, created_at):
+    """Active items grouped the way snapshots are stored"""
+    return Item.objects.order_by().values('grocery', 'item_type', 'location').annotate(
+        date=Value(snapshot_date, output_field=models.DateField()),
+        item_count=Count('id'),
+        total_quantity=Sum('quantity_in_stock'),
+        total_value=Sum(
+            F('price') * F('quantity_in_stock'),
+            output_field=models.DecimalField(max_digits=16, decimal_places=2),
+        ),
+        low_stock_count=Count('id', filter=Q(quantity_in_stock__lte=F('reorder_level'))),
+        out_of_stock_count=Count('id', filter=Q(quantity_in_stock=0)),
+        created_at=Value(created_at, output_field=models.DateTimeField()),
+    )
+
+
+def take_inventory_snapshot(snapshot_date=None):
+    """
+    Record current stock as the snapshot for ``snapshot_date`` (today).
+
+    Re-running for the same date replaces that day's rows. Returns the
+    number of rows written.
+    """
+    snapshot_date = snapshot_date or timezone.localdate()
+    opts = InventorySnapshot._meta
+    qn = connection.ops.quote_name
+    columns = ', '.join(qn(opts.get_field(name).column) for name in SNAPSHOT_COLUMNS)
+    select_sql, params = snapshot_rows(snapshot_date, timezone.now()).query.sql_with_params()
+
+    with transaction.atomic():
+        InventorySnapshot.objects.filter(date=snapshot_date).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {qn(opts.db_table)} ({columns}) {select_sql}", params)
+            return cursor.rowcount
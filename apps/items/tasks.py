@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .snapshots import take_inventory_snapshot
+
+
+@shared_task(ignore_result=True)
+def snapshot_inventory():
+    """Nightly inventory snapshot (see CELERY_BEAT_SCHEDULE)"""
+    return take_inventory_snapshot()
@@ -1,3 +1,368 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.groceries.models import Grocery
+from . import autocomplete, pos
+from .models import InventorySnapshot, Item, ItemType, StockMovement
+from .snapshots import take_inventory_snapshot
+
+
+@override_settings(NEO4J_BACKEND='local')
+class InventorySnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='snapshot-password', user_type='admin')
+        cls.grocery = Grocery.objects.create(name='Grocery', location='Somewhere', created_by=cls.admin)
+        cls.dairy, cls.bakery = ItemType.objects.bulk_create([ItemType(name='Dairy'), ItemType(name='Bakery')])
+        Item.objects.bulk_create([
+            Item(name=f'Item {n}', item_type=cls.dairy if n < 3 else cls.bakery, location='freezer',
+                 price=Decimal('2.00'), grocery=cls.grocery, quantity_in_stock=n, reorder_level=1)
+            for n in range(4)
+        ])
+        cls.deleted = Item.objects.create(
+            name='Deleted', item_type=cls.dairy, location='freezer', price=Decimal('9.00'),
+            grocery=cls.grocery, quantity_in_stock=100)
+        cls.deleted.soft_delete()
+
+    def test_snapshot_aggregates_active_items_per_group(self):
+        rows = take_inventory_snapshot(date(2025, 1, 1))
+
+        self.assertEqual(rows, 2)
+        dairy = InventorySnapshot.objects.get(item_type=self.dairy)
+        self.assertEqual(dairy.date, date(2025, 1, 1))
+        self.assertEqual(dairy.item_count, 3)
+        self.assertEqual(dairy.total_quantity, 3)
+        self.assertEqual(dairy.total_value, Decimal('6.00'))
+        self.assertEqual(dairy.low_stock_count, 2)
+        self.assertEqual(dairy.out_of_stock_count, 1)
+
+    def test_rerun_replaces_the_days_snapshot(self):
+        take_inventory_snapshot(date(2025, 1, 1))
+        Item.objects.filter(item_type=self.bakery).update(quantity_in_stock=50)
+        take_inventory_snapshot(date(2025, 1, 1))
+
+        self.assertEqual(InventorySnapshot.objects.count(), 2)
+        self.assertEqual(InventorySnapshot.objects.get(item_type=self.bakery).total_quantity, 50)
+
+    def test_trends_endpoint_returns_daily_series(self):
+        today = date.today()
+        for days_ago in (2, 1):
+            take_inventory_snapshot(today - timedelta(days=days_ago))
+        client = APIClient()
+        client.force_authenticate(self.admin)
+
+        response = client.get('/api/v1/items/inventory_trends/', {'group_by': 'item_type'})
+
+        self.assertEqual(response.status_code, 200)
+        series = {s['label']: s for s in response.data['series']}
+        self.assertEqual(set(series), {'Dairy', 'Bakery'})
+        self.assertEqual(
+            [p['date'] for p in series['Dairy']['points']],
+            [(today - timedelta(days=2)).isoformat(), (today - timedelta(days=1)).isoformat()],
+        )
+        self.assertEqual(series['Bakery']['points'][0]['total_quantity'], 3)
+
+
+    def test_cube_returns_every_roll_up(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+
+        with self.assertNumQueries(1):
+            response = client.get('/api/v1/items/inventory_cube/', {'dimensions': 'item_type,location'})
+
+        self.assertEqual(response.status_code, 200)
+        cells = {(cell['item_type'], cell['location']): cell for cell in response.data['cells']}
+        self.assertEqual(set(cells), {
+            (None, None), (self.dairy.pk, None), (self.bakery.pk, None), (None, 'freezer'),
+            (self.dairy.pk, 'freezer'), (self.bakery.pk, 'freezer'),
+        })
+        total = cells[None, None]
+        self.assertEqual((total['item_count'], total['total_quantity'], total['low_stock_count']), (4, 6, 2))
+        self.assertEqual(total['total_value'], Decimal('12.00'))
+        self.assertEqual(cells[self.dairy.pk, 'freezer']['item_type_name'], 'Dairy')
+        self.assertEqual(cells[None, 'freezer']['location_name'], 'Freezer')
+
+
+@override_settings(NEO4J_BACKEND='local')
+class PosLookupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='pos-password', user_type='admin')
+        cls.grocery = Grocery.objects.create(name='Grocery', location='Somewhere', created_by=cls.admin)
+        cls.item_type = ItemType.objects.create(name='Dairy')
+        cls.milk, cls.cheese = Item.objects.bulk_create([
+            Item(name=name, item_type=cls.item_type, location='display', price=Decimal(price),
+                 grocery=cls.grocery, sku=sku, quantity_in_stock=5)
+            for name, price, sku in (('Milk', '1.20', '4000001'), ('Cheese', '4.50', '4000002'))
+        ])
+
+    def setUp(self):
+        pos.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def price(self, lines):
+        return self.client.post('/api/v1/items/price_basket/', {
+            'grocery': self.grocery.pk, 'lines': lines}, format='json')
+
+    def test_basket_is_priced_in_one_query_then_from_cache(self):
+        lines = [{'sku': '4000001', 'quantity': 3}, {'sku': '4000002', 'quantity': 6}, {'sku': 'nope'}]
+        with self.assertNumQueries(1):
+            response = self.price(lines)
+
+        self.assertEqual(Decimal(response.data['total']), Decimal('30.60'))
+        self.assertEqual(response.data['missing'], ['nope'])
+        self.assertFalse(response.data['lines'][1]['available'])
+        with self.assertNumQueries(0):
+            self.price(lines)
+
+    def test_item_writes_invalidate_cached_skus(self):
+        self.price([{'sku': '4000001'}])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.milk.price = Decimal('1.50')
+            self.milk.save()
+
+        response = self.client.get(f'/api/v1/items/sku/4000001/?grocery={self.grocery.pk}')
+        self.assertEqual(Decimal(response.data['price']), Decimal('1.50'))
+
+    def test_duplicate_sku_in_grocery_is_rejected(self):
+        response = self.client.post('/api/v1/items/', {
+            'name': 'Yogurt', 'item_type': self.item_type.pk, 'location': 'display',
+            'price': '0.90', 'grocery': self.grocery.pk, 'sku': '4000001'}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('sku', response.data)
+
+    def reuse_sku(self, item):
+        item.soft_delete()
+        return Item.objects.create(name='Replacement', item_type=self.item_type, location='display',
+                                   price=Decimal('1.00'), grocery=self.grocery, sku=item.sku)
+
+    def test_restoring_an_item_whose_sku_was_reused_is_refused(self):
+        self.reuse_sku(self.milk)
+
+        response = self.client.post(f'/api/v1/items/{self.milk.pk}/restore/')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('SKU', response.data['error'])
+        self.assertTrue(Item.all_objects.get(pk=self.milk.pk).is_deleted)
+
+    def test_grocery_restore_skips_items_whose_sku_was_reused(self):
+        self.grocery.soft_delete()
+        # Written while the grocery was deleted, e.g. by a bulk import
+        replacement, = Item.objects.bulk_create([
+            Item(name='Replacement', item_type=self.item_type, location='display', price=Decimal('1.00'),
+                 grocery=self.grocery, sku='4000001'),
+        ])
+
+        response = self.client.post(f'/api/v1/groceries/{self.grocery.pk}/restore/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(Item.objects.filter(grocery=self.grocery).values_list('pk', flat=True)),
+            {replacement.pk, self.cheese.pk},
+        )
+
+
+@override_settings(NEO4J_BACKEND='local')
+class ReorderSuggestionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='reorder-password', user_type='admin')
+        cls.grocery = Grocery.objects.create(name='Grocery', location='Somewhere', created_by=cls.admin)
+        item_type = ItemType.objects.create(name='Dairy')
+        cls.milk, cls.cheese = Item.objects.bulk_create([
+            Item(name=name, item_type=item_type, location='display', price=Decimal('1.00'),
+                 grocery=cls.grocery, quantity_in_stock=stock)
+            for name, stock in (('Milk', 10), ('Cheese', 50))
+        ])
+        StockMovement.objects.bulk_create([
+            StockMovement(item=cls.milk, quantity=-2, reason=StockMovement.SALE) for _ in range(28)
+        ] + [
+            StockMovement(item=cls.milk, quantity=40, reason=StockMovement.ADJUSTMENT),
+            StockMovement(item=cls.cheese, quantity=-500, reason=StockMovement.SALE),
+        ])
+        # Outside the consumption window
+        StockMovement.objects.filter(item=cls.cheese).update(created_at=timezone.now() - timedelta(days=60))
+
+    def test_suggestions_follow_consumption_rate(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+
+        response = client.get('/api/v1/items/reorder_suggestions/', {
+            'grocery': self.grocery.pk, 'window_days': 28, 'lead_time_days': 3,
+            'safety_days': 2, 'cover_days': 7})
+
+        self.assertEqual(response.status_code, 200)
+        milk, cheese = response.data['results']
+        self.assertEqual((milk['id'], milk['consumed'], milk['daily_rate']), (self.milk.pk, 56, 2.0))
+        self.assertEqual((milk['reorder_point'], milk['order_quantity']), (10, 14))
+        self.assertTrue(milk['needs_reorder'])
+        # No recent consumption: the manual reorder level applies
+        self.assertEqual((cheese['consumed'], cheese['reorder_point'], cheese['order_quantity']), (0, 10, 0))
+        self.assertIsNone(cheese['days_of_stock'])
+        self.assertFalse(cheese['needs_reorder'])
+
+    def test_stock_updates_are_recorded_as_movements(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+
+        client.post(f'/api/v1/items/{self.cheese.pk}/update_stock/', {'quantity': 45}, format='json')
+
+        movement = StockMovement.objects.filter(item=self.cheese).latest('created_at')
+        self.assertEqual((movement.quantity, movement.reason), (-5, StockMovement.ADJUSTMENT))
+
+
+@override_settings(NEO4J_BACKEND='local')
+class StockTransferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='transfer-password', user_type='admin')
+        cls.north, cls.south = Grocery.objects.bulk_create([
+            Grocery(name=name, location=name, created_by=cls.admin) for name in ('North', 'South')
+        ])
+        item_type = ItemType.objects.create(name='Dairy')
+        cls.milk, cls.cheese, cls.south_milk = Item.objects.bulk_create([
+            Item(name=name, item_type=item_type, location='display', price=Decimal('1.00'),
+                 grocery=grocery, sku=sku, quantity_in_stock=stock)
+            for name, grocery, sku, stock in (
+                ('Milk', cls.north, '4000001', 10), ('Cheese', cls.north, '4000002', 3),
+                ('Whole milk', cls.south, '4000001', 1),
+            )
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def transfer(self, *lines):
+        return self.client.post('/api/v1/items/transfers/', {
+            'source': self.north.pk, 'destination': self.south.pk,
+            'lines': [{'item': item.pk, 'quantity': quantity} for item, quantity in lines]}, format='json')
+
+    def test_transfer_moves_stock_and_creates_missing_items(self):
+        # A fixed number of statements, however many lines
+        with self.assertNumQueries(13):
+            response = self.transfer((self.milk, 4), (self.cheese, 3), (self.milk, 1))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['line_count'], response.data['total_quantity']), (2, 8))
+        self.milk.refresh_from_db()
+        self.south_milk.refresh_from_db()
+        # Matched by SKU despite the different name
+        self.assertEqual((self.milk.quantity_in_stock, self.south_milk.quantity_in_stock), (5, 6))
+        south_cheese = Item.objects.get(grocery=self.south, name='Cheese')
+        self.assertEqual((south_cheese.quantity_in_stock, south_cheese.sku), (3, '4000002'))
+        self.assertEqual(StockMovement.objects.filter(reason=StockMovement.TRANSFER).count(), 4)
+
+    def test_short_stock_rejects_the_whole_transfer(self):
+        response = self.transfer((self.milk, 4), (self.cheese, 4))
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['items'], [self.cheese.pk])
+        self.milk.refresh_from_db()
+        self.assertEqual(self.milk.quantity_in_stock, 10)
+        self.assertFalse(Item.objects.filter(grocery=self.south, name='Cheese').exists())
+
+
+@override_settings(NEO4J_BACKEND='local')
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='autocomplete-password', user_type='admin')
+        cls.north, cls.south = Grocery.objects.bulk_create([
+            Grocery(name=name, location=name, created_by=cls.admin) for name in ('North', 'South')
+        ])
+        cls.item_type = ItemType.objects.create(name='Dairy')
+        cls.milk, cls.cheese, cls.south_milk = Item.objects.bulk_create([
+            Item(name=name, item_type=cls.item_type, location='display', price=Decimal('1.00'), grocery=grocery)
+            for name, grocery in (('Whole Milk', cls.north), ('Cheese', cls.north), ('Milk', cls.south))
+        ])
+        cls.supplier = User.objects.create_user(
+            email='supplier@example.com', username='supplier', password='autocomplete-password',
+            user_type='supplier')
+        cls.supplier.supplier_profile.assigned_grocery = cls.south
+        cls.supplier.supplier_profile.save()
+
+    def setUp(self):
+        autocomplete.clear()
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def names(self, query, grocery=None):
+        response = self.client.get('/api/v1/items/autocomplete/', {'q': query, 'grocery': grocery or self.north.pk})
+        self.assertEqual(response.status_code, 200)
+        return [item['name'] for item in response.data['results']]
+
+    def test_any_word_of_the_name_matches_from_memory(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.names('MIL'), ['Whole Milk'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names('whole m'), ['Whole Milk'])
+            self.assertEqual(self.names('c'), ['Cheese'])
+            self.assertEqual(self.names('butter'), [])
+
+    def test_item_writes_update_the_index_in_place(self):
+        self.names('m')
+        with self.captureOnCommitCallbacks(execute=True):
+            Item.objects.create(name='Milkshake', item_type=self.item_type, location='display',
+                                price=Decimal('2.00'), grocery=self.north)
+            self.milk.name = 'Skimmed milk'
+            self.milk.save()
+            self.cheese.soft_delete()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names('m'), ['Skimmed milk', 'Milkshake'])
+            self.assertEqual(self.names('whole'), [])
+            self.assertEqual(self.names('cheese'), [])
+
+    def test_lost_journal_rebuilds_the_index(self):
+        self.names('m')
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.milk.name = 'Oat milk'
+            self.milk.save()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.names('oat'), ['Oat milk'])
+
+    def test_names_that_grow_when_casefolded(self):
+        # 'ß' casefolds to 'ss', putting the last word past offset 255
+        long_name = 'ß' * 200 + ' Strudel'
+        with self.captureOnCommitCallbacks(execute=True):
+            Item.objects.create(name=long_name, item_type=self.item_type, location='display',
+                                price=Decimal('2.00'), grocery=self.north)
+        self.assertEqual(self.names('strudel'), [long_name])
+        self.assertEqual(self.names('whole'), ['Whole Milk'])
+
+    def test_indexes_are_rebuilt_after_their_ttl(self):
+        self.names('m')
+        # Written by another worker, whose journal this one cannot see
+        Item.objects.filter(pk=self.milk.pk).update(name='Goat milk')
+        self.assertEqual(self.names('goat'), [])
+
+        with override_settings(AUTOCOMPLETE_INDEX_TTL=0):
+            autocomplete.clear()
+            self.names('m')
+        Item.objects.filter(pk=self.milk.pk).update(name='Sheep milk')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.names('sheep'), ['Sheep milk'])
+
+    def test_suppliers_search_their_own_grocery(self):
+        self.client.force_authenticate(self.supplier)
+        response = self.client.get('/api/v1/items/autocomplete/', {'q': 'mi'})
+        self.assertEqual(response.data['grocery'], self.south.pk)
+        self.assertEqual([item['id'] for item in response.data['results']], [self.south_milk.pk])
+
+        response = self.client.get('/api/v1/items/autocomplete/', {'q': 'mi', 'grocery': self.north.pk})
+        self.assertEqual(response.status_code, 403)
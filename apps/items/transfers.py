@@ -0,0 +1,175 @@
+"""
+Atomic stock transfers between groceries.
+
+A transfer moves many items in one transaction with a fixed number of
+statements: the rows of both groceries are locked in id order (so
+concurrent transfers cannot deadlock), one conditional UPDATE takes the
+quantities off the source - matching only rows that still have enough
+stock - and one UPDATE adds them to the destination. Destination items
+missing from the destination grocery are created first, matched by SKU and
+then by name.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from apps.core import events
+
+from . import autocomplete, pos
+from .models import Item, StockMovement, StockTransfer, StockTransferLine
+
+COPIED_FIELDS = ('name', 'sku', 'item_type_id', 'location', 'price', 'reorder_level')
+
+
+class TransferError(Exception):
+    """A transfer that cannot be made; nothing was changed"""
+    def __init__(self, message, items=None):
+        super().__init__(message)
+        self.items = items or []
+
+
+class InsufficientStock(TransferError):
+    pass
+
+
+def _quantities(quantities):
+    """A per-row CASE for set-based updates"""
+    return Case(
+        *[When(pk=item_id, then=Value(quantity)) for item_id, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+
+
+def transfer_stock(source_id, destination_id, lines, user, notes=''):
+    """
+    Move ``lines`` (``{'item': source item id, 'quantity': n}``) from one
+    grocery to another and return the ``StockTransfer``.
+
+    Raises ``TransferError`` if an item is not in the source grocery, and
+    ``InsufficientStock`` if one does not have enough stock.
+    """
+    quantities = {}
+    for line in lines:
+        quantities[line['item']] = quantities.get(line['item'], 0) + line['quantity']
+
+    try:
+        with transaction.atomic():
+            return _transfer(source_id, destination_id, quantities, user, notes)
+    except IntegrityError:
+        # A concurrent transfer created one of the destination items first;
+        # a second pass matches it instead
+        with transaction.atomic():
+            return _transfer(source_id, destination_id, quantities, user, notes)
+
+
+def _transfer(source_id, destination_id, quantities, user, notes):
+    sources = {
+        row['id']: row
+        for row in Item.objects.filter(grocery_id=source_id, pk__in=quantities)
+        .order_by().values('id', *COPIED_FIELDS, item_type_name=F('item_type__name'))
+    }
+    unknown = [item_id for item_id in quantities if item_id not in sources]
+    if unknown:
+        raise TransferError("Items not found in the source grocery", unknown)
+
+    destinations = _destination_items(destination_id, sources.values())
+
+    # Lock both sides in one statement, in id order
+    stock = {
+        item_id: (quantity, reorder_level)
+        for item_id, quantity, reorder_level in Item.objects.select_for_update()
+        .filter(pk__in=[*sources, *destinations.values()]).order_by('pk')
+        .values_list('pk', 'quantity_in_stock', 'reorder_level')
+    }
+    short = [item_id for item_id, quantity in quantities.items() if stock[item_id][0] < quantity]
+    if short:
+        raise InsufficientStock("Not enough stock", short)
+
+    # The conditional update is what guarantees availability where row locks
+    # are not supported (SQLite); any row it skips aborts the transfer
+    now = timezone.now()
+    needed = _quantities(quantities)
+    taken = Item.objects.filter(pk__in=quantities, quantity_in_stock__gte=needed).update(
+        quantity_in_stock=F('quantity_in_stock') - needed, updated_at=now,
+    )
+    if taken != len(quantities):
+        raise InsufficientStock("Not enough stock", list(quantities))
+
+    received = {}
+    for item_id, quantity in quantities.items():
+        received[destinations[item_id]] = received.get(destinations[item_id], 0) + quantity
+    Item.objects.filter(pk__in=received).update(
+        quantity_in_stock=F('quantity_in_stock') + _quantities(received), updated_at=now,
+    )
+
+    StockMovement.objects.bulk_create([
+        StockMovement(item_id=item_id, quantity=sign * quantity, reason=StockMovement.TRANSFER)
+        for sign, moved in ((-1, quantities), (1, received))
+        for item_id, quantity in moved.items()
+    ])
+    transfer = StockTransfer.objects.create(
+        source_id=source_id, destination_id=destination_id, created_by=user, notes=notes,
+        line_count=len(quantities), total_quantity=sum(quantities.values()),
+    )
+    StockTransferLine.objects.bulk_create([
+        StockTransferLine(transfer=transfer, source_item_id=item_id,
+                          destination_item_id=destinations[item_id], quantity=quantity)
+        for item_id, quantity in quantities.items()
+    ])
+
+    for grocery_id, sign, moved in ((source_id, -1, quantities), (destination_id, 1, received)):
+        for item_id, quantity in moved.items():
+            before, reorder_level = stock[item_id]
+            events.stock_changed(item_id, grocery_id, before + sign * quantity, reorder_level,
+                                 before <= reorder_level)
+
+    pos.invalidate_grocery(source_id)
+    pos.invalidate_grocery(destination_id)
+    return transfer
+
+
+def _destination_items(destination_id, sources):
+    """``{source item id: destination item id}``, creating missing items"""
+    sources = list(sources)
+    skus = [row['sku'] for row in sources if row['sku']]
+    names = [row['name'] for row in sources]
+    by_sku, by_name = {}, {}
+    for item_id, sku, name in Item.objects.filter(grocery_id=destination_id).filter(
+        Q(sku__in=skus) | Q(name__in=names)
+    ).values_list('id', 'sku', 'name'):
+        if sku:
+            by_sku[sku] = item_id
+        by_name[name] = item_id
+
+    matched, missing = {}, []
+    for row in sources:
+        item_id = (row['sku'] and by_sku.get(row['sku'])) or by_name.get(row['name'])
+        if item_id:
+            matched[row['id']] = item_id
+        else:
+            missing.append(row)
+
+    if missing:
+        created = Item.objects.bulk_create([
+            Item(grocery_id=destination_id, quantity_in_stock=0,
+                 **{field: row[field] for field in COPIED_FIELDS})
+            for row in missing
+        ])
+        for row, item in zip(missing, created):
+            matched[row['id']] = item.pk
+        autocomplete.items_created(destination_id, created)
+        nodes = [
+            {'id': item.pk, 'name': item.name, 'type': row['item_type_name'], 'price': float(item.price)}
+            for row, item in zip(missing, created)
+        ]
+        transaction.on_commit(lambda: _create_item_nodes(destination_id, nodes))
+    return matched
+
+
+def _create_item_nodes(grocery_id, nodes):
+    # bulk_create sends no post_save, so the graph is synced here
+    try:
+        from neo4j_integration.queries import GroceryGraphQueries
+        GroceryGraphQueries.create_item_nodes(grocery_id, nodes)
+    except Exception as e:
+        print(f"Neo4j sync error: {e}")
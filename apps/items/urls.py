@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ItemViewSet, ItemTypeViewSet
+from .views import ItemViewSet, ItemTypeViewSet, StockTransferViewSet
 
 router = DefaultRouter()
 router.register(r'types', ItemTypeViewSet)
+router.register(r'transfers', StockTransferViewSet)
 router.register(r'', ItemViewSet)
 
 urlpatterns = [
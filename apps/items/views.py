@@ -1,17 +1,29 @@
-from rest_framework import viewsets, permissions, status
+from rest_framework import mixins, viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.core.exceptions import ValidationError
+from rest_framework.exceptions import ValidationError as DRFValidationError
+from django.db import models
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django.db.models import Q, Count, Avg, Sum
-from .models import Item, ItemType
+from datetime import date, timedelta
+from . import autocomplete, pos, reorder, reports, transfers
+from .models import InventorySnapshot, Item, ItemType, StockMovement, StockTransfer
 from .serializers import (
     ItemSerializer, ItemTypeSerializer, ItemCreateSerializer, 
-    ItemUpdateSerializer, ItemListSerializer
+    ItemUpdateSerializer, ItemListSerializer, SkuLookupSerializer, BasketSerializer,
+    ReorderParamsSerializer, AutocompleteParamsSerializer, StockTransferSerializer, StockTransferListSerializer,
+    StockTransferCreateSerializer,
+)
+from apps.core.mixins import (
+    ChangesMixin, ConditionalGetMixin, GroceryScopedMixin, ReplicaReadMixin, SparseFieldsetMixin,
+    ValuesListMixin,
 )
 from apps.core.permissions import IsAdminUser
+from apps.groceries.models import Grocery
 
-class ItemTypeViewSet(viewsets.ModelViewSet):
+class ItemTypeViewSet(SparseFieldsetMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """Item types management with proper permissions"""
     queryset = ItemType.objects.annotate(
         total_items=Count('items'),
@@ -22,6 +34,11 @@ class ItemTypeViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'description']
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
+    replica_actions = ('list', 'retrieve', 'items')
+    query_budgets = {
+        'list': 2, 'retrieve': 1, 'create': 5, 'update': 4, 'partial_update': 4,
+        'destroy': 5, 'items': 2,
+    }
     
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -40,12 +57,13 @@ class ItemTypeViewSet(viewsets.ModelViewSet):
     def items(self, request, pk=None):
         """Get all items of this type"""
         item_type = self.get_object()
-        items = item_type.items.filter(is_deleted=False)
+        items = item_type.items.filter(is_deleted=False).select_related('item_type', 'grocery')
         
         serializer = ItemListSerializer(items, many=True)
         return Response(serializer.data)
 
-class ItemViewSet(viewsets.ModelViewSet):
+class ItemViewSet(GroceryScopedMixin, ChangesMixin, SparseFieldsetMixin, ReplicaReadMixin,
+                  ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     Comprehensive items management with proper permissions and business logic
     """
@@ -56,6 +74,23 @@ class ItemViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'item_type__name', 'sku']
     ordering_fields = ['name', 'price', 'created_at', 'quantity_in_stock']
     ordering = ['-created_at']
+    replica_actions = (
+        'list', 'retrieve', 'my_grocery_items', 'low_stock_items', 'inventory_summary',
+        'inventory_trends', 'by_sku', 'reorder_suggestions', 'inventory_cube',
+    )
+    query_budgets = {
+        'list': 3, 'retrieve': 1, 'create': 4, 'update': 3, 'partial_update': 3,
+        'destroy': 4, 'my_grocery_items': 3, 'low_stock_items': 1,
+        'inventory_summary': 2, 'inventory_cube': 1, 'inventory_trends': 1, 'restore': 5, 'update_stock': 4,
+        'by_sku': 1, 'sku_lookup': 1, 'price_basket': 1, 'reorder_suggestions': 2, 'autocomplete': 1,
+        'changes': 1,
+    }
+    throttle_costs = {
+        'inventory_summary': 20, 'inventory_cube': 20, 'inventory_trends': 20,
+        'reorder_suggestions': 20,
+    }
+    changes_serializer_class = ItemSerializer
+    validator_related = ('item_type', 'grocery', 'added_by')
     
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update']:
@@ -69,23 +104,14 @@ class ItemViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         queryset = super().get_queryset()
-        user = self.request.user
-        
-        if user.user_type == 'supplier':
-            if self.action in ['list', 'retrieve']:
-                # Suppliers can read all items
-                return queryset
-            else:
-                # For modification actions, only their assigned grocery
-                try:
-                    assigned_grocery = user.supplier_profile.assigned_grocery
-                    if assigned_grocery:
-                        return queryset.filter(grocery=assigned_grocery)
-                except AttributeError:
-                    pass
-                return queryset.none()
-        
-        return queryset
+        if self.action in ['list', 'retrieve']:
+            # Suppliers can read all items
+            return queryset
+        # For other actions, only their assigned grocery
+        return self.scope_queryset(queryset)
+    
+    def get_changes_queryset(self):
+        return self.scope_queryset(Item.all_objects.select_related('item_type', 'grocery', 'added_by'))
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -98,73 +124,42 @@ class ItemViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         """Create item with proper validation and Neo4j sync"""
-        user = self.request.user
-        
-        # Additional supplier validation
-        if user.user_type == 'supplier':
-            try:
-                supplier_profile = user.supplier_profile
-                grocery = serializer.validated_data['grocery']
-                if supplier_profile.assigned_grocery != grocery:
-                    raise PermissionError("Cannot add items to other grocery stores")
-            except AttributeError:
-                raise PermissionError("Supplier profile not found")
-        
-        item = serializer.save(added_by=user)
+        self.check_grocery_access(
+            serializer.validated_data['grocery'].pk, "Cannot add items to other grocery stores"
+        )
+        item = serializer.save(added_by=self.request.user)
         # Neo4j sync is handled by signal
     
     def perform_update(self, serializer):
         """Update item with permission checks"""
-        user = self.request.user
-        instance = self.get_object()
-        
-        if user.user_type == 'supplier':
-            try:
-                supplier_profile = user.supplier_profile
-                if supplier_profile.assigned_grocery != instance.grocery:
-                    raise PermissionError("Cannot modify items from other grocery stores")
-            except AttributeError:
-                raise PermissionError("Supplier profile not found")
-        
+        self.check_grocery_access(
+            serializer.instance.grocery_id, "Cannot modify items from other grocery stores"
+        )
         serializer.save()
     
     def perform_destroy(self, instance):
         """Soft delete with permission checks"""
-        user = self.request.user
-        
-        if user.user_type == 'supplier':
-            try:
-                supplier_profile = user.supplier_profile
-                if supplier_profile.assigned_grocery != instance.grocery:
-                    raise PermissionError("Cannot delete items from other grocery stores")
-            except AttributeError:
-                raise PermissionError("Supplier profile not found")
-        
+        self.check_grocery_access(instance.grocery_id, "Cannot delete items from other grocery stores")
         instance.soft_delete()
     
     @action(detail=False, methods=['get'])
     def my_grocery_items(self, request):
         """Get items from supplier's assigned grocery"""
-        if request.user.user_type != 'supplier':
+        if not self.principal.is_supplier:
             return Response({'error': 'Only suppliers can access this endpoint'}, 
                           status=status.HTTP_403_FORBIDDEN)
-        
-        try:
-            supplier_profile = request.user.supplier_profile
-            if supplier_profile.assigned_grocery:
-                items = self.get_queryset().filter(grocery=supplier_profile.assigned_grocery)
-                page = self.paginate_queryset(items)
-                if page is not None:
-                    serializer = self.get_serializer(page, many=True)
-                    return self.get_paginated_response(serializer.data)
-                serializer = self.get_serializer(items, many=True)
-                return Response(serializer.data)
-            else:
-                return Response({'error': 'No grocery assigned'}, 
-                              status=status.HTTP_404_NOT_FOUND)
-        except AttributeError:
-            return Response({'error': 'Supplier profile not found'}, 
+        if self.principal.assigned_grocery_id is None:
+            return Response({'error': 'No grocery assigned'}, 
                           status=status.HTTP_404_NOT_FOUND)
+        
+        # get_queryset is already scoped to the supplier's grocery
+        items = self.get_queryset()
+        page = self.paginate_queryset(items)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(items, many=True)
+        return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def low_stock_items(self, request):
@@ -179,25 +174,148 @@ class ItemViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def inventory_summary(self, request):
         """Get inventory summary statistics"""
-        queryset = self.get_queryset()
-        
-        summary = queryset.aggregate(
-            total_items=Count('id'),
-            total_value=Sum(models.F('price') * models.F('quantity_in_stock')),
-            average_price=Avg('price'),
-            low_stock_count=Count('id', filter=Q(quantity_in_stock__lte=models.F('reorder_level'))),
-            out_of_stock_count=Count('id', filter=Q(quantity_in_stock=0))
+        summary = reports.inventory_summary(
+            self.get_queryset(),
+            include_grocery_breakdown=request.user.user_type == 'admin',
         )
+        return Response(summary)
+    
+    @action(detail=False, methods=['get'])
+    def inventory_cube(self, request):
+        """Stock totals by grocery, item type and location with every roll-up"""
+        dimensions = [
+            dimension for dimension in
+            (request.query_params.get('dimensions') or 'grocery,item_type,location').split(',')
+            if dimension
+        ]
+        unknown = [dimension for dimension in dimensions if dimension not in reports.TREND_GROUPS]
+        if unknown or len(set(dimensions)) != len(dimensions):
+            return Response({'error': f"dimensions must be distinct values of {', '.join(reports.TREND_GROUPS)}"},
+                          status=status.HTTP_400_BAD_REQUEST)
         
-        # Add breakdown by grocery for admins
-        if request.user.user_type == 'admin':
-            grocery_breakdown = queryset.values('grocery__name').annotate(
-                item_count=Count('id'),
-                total_value=Sum(models.F('price') * models.F('quantity_in_stock'))
-            ).order_by('-item_count')
-            summary['grocery_breakdown'] = list(grocery_breakdown)
+        # Drill down by fixing any dimension
+        items = self.get_queryset()
+        try:
+            for field in ('grocery', 'item_type', 'location'):
+                if request.query_params.get(field):
+                    items = items.filter(**{field: request.query_params[field]})
+        except ValueError:
+            return Response({'error': 'Invalid grocery or item_type'},
+                          status=status.HTTP_400_BAD_REQUEST)
         
-        return Response(summary)
+        return Response(reports.inventory_cube(items, dimensions))
+    
+    @action(detail=False, methods=['get'])
+    def reorder_suggestions(self, request):
+        """Suggested reorder points and quantities from recent consumption, most urgent first"""
+        params = ReorderParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        
+        items = self.scope_queryset(Item.objects.all())
+        try:
+            for field in ('grocery', 'item_type', 'location'):
+                if request.query_params.get(field):
+                    items = items.filter(**{field: request.query_params[field]})
+        except ValueError:
+            return Response({'error': 'Invalid grocery or item_type'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        suggestions = reorder.reorder_suggestions(items, **params.validated_data)
+        if request.query_params.get('needs_reorder') in ('true', '1'):
+            suggestions = suggestions.filter(needs_reorder=True)
+        page = self.paginate_queryset(suggestions)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(list(suggestions))
+    
+    @action(detail=False, methods=['get'])
+    def inventory_trends(self, request):
+        """Daily inventory time series from the nightly snapshots"""
+        try:
+            end_date = date.fromisoformat(request.query_params.get('end_date') or date.today().isoformat())
+            start_date = date.fromisoformat(
+                request.query_params.get('start_date') or (end_date - timedelta(days=365)).isoformat()
+            )
+        except ValueError:
+            return Response({'error': 'Invalid date format. Use YYYY-MM-DD'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        if start_date > end_date:
+            return Response({'error': 'start_date must not be after end_date'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        group_by = request.query_params.get('group_by') or None
+        if group_by is not None and group_by not in reports.TREND_GROUPS:
+            return Response({'error': f"group_by must be one of {', '.join(reports.TREND_GROUPS)}"},
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        snapshots = self.scope_queryset(InventorySnapshot.objects.all())
+        try:
+            for field in ('grocery', 'item_type', 'location'):
+                if request.query_params.get(field):
+                    snapshots = snapshots.filter(**{field: request.query_params[field]})
+        except ValueError:
+            return Response({'error': 'Invalid grocery or item_type'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(reports.inventory_trends(snapshots, start_date, end_date, group_by))
+    
+    def get_pos_grocery(self, grocery_id=None):
+        """Grocery for POS lookups: as given, else the supplier's own"""
+        grocery_id = grocery_id or self.principal.assigned_grocery_id
+        if grocery_id is None:
+            raise DRFValidationError({'grocery': 'This field is required.'})
+        return grocery_id
+    
+    @action(detail=False, methods=['get'], url_path=r'sku/(?P<sku>[^/]+)')
+    def by_sku(self, request, sku=None):
+        """Exact SKU lookup (barcode scan)"""
+        try:
+            grocery_id = self.get_pos_grocery(int(request.query_params.get('grocery') or 0))
+        except ValueError:
+            return Response({'error': 'Invalid grocery'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        item = pos.lookup_skus(grocery_id, [sku]).get(sku)
+        if item is None:
+            return Response({'error': 'Item not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(item)
+    
+    @action(detail=False, methods=['post'])
+    def sku_lookup(self, request):
+        """Look up many SKUs of one grocery at once"""
+        serializer = SkuLookupSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        grocery_id = self.get_pos_grocery(serializer.validated_data.get('grocery'))
+        skus = serializer.validated_data['skus']
+        
+        items = pos.lookup_skus(grocery_id, skus)
+        return Response({
+            'grocery': grocery_id,
+            'items': [items[sku] for sku in dict.fromkeys(skus) if sku in items],
+            'missing': [sku for sku in dict.fromkeys(skus) if sku not in items],
+        })
+    
+    @action(detail=False, methods=['post'])
+    def price_basket(self, request):
+        """Price a basket of SKUs and quantities"""
+        serializer = BasketSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        grocery_id = self.get_pos_grocery(serializer.validated_data.get('grocery'))
+        return Response(pos.price_basket(grocery_id, serializer.validated_data['lines']))
+    
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """Item name typeahead from the in-memory prefix index"""
+        params = AutocompleteParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        grocery_id = self.get_pos_grocery(params.validated_data.get('grocery'))
+        self.check_grocery_access(grocery_id)
+        
+        query = params.validated_data['q']
+        return Response({
+            'grocery': grocery_id,
+            'query': query,
+            'results': autocomplete.autocomplete(grocery_id, query, params.validated_data['limit']),
+        })
     
     @action(detail=True, methods=['post'])
     def restore(self, request, pk=None):
@@ -207,12 +325,15 @@ class ItemViewSet(viewsets.ModelViewSet):
                           status=status.HTTP_403_FORBIDDEN)
         
         try:
-            item = Item.all_objects.get(pk=pk, is_deleted=True)
+            item = Item.all_objects.select_related('grocery', 'item_type').get(pk=pk, is_deleted=True)
             item.restore()
             return Response({'message': 'Item restored successfully'})
         except Item.DoesNotExist:
             return Response({'error': 'Deleted item not found'}, 
                           status=status.HTTP_404_NOT_FOUND)
+        except ValidationError as e:
+            return Response({'error': e.messages[0]}, 
+                          status=status.HTTP_400_BAD_REQUEST)
     
     @action(detail=True, methods=['post'])
     def update_stock(self, request, pk=None):
@@ -233,21 +354,83 @@ class ItemViewSet(viewsets.ModelViewSet):
                           status=status.HTTP_400_BAD_REQUEST)
         
         # Permission check for suppliers
-        if request.user.user_type == 'supplier':
-            try:
-                supplier_profile = request.user.supplier_profile
-                if supplier_profile.assigned_grocery != item.grocery:
-                    return Response({'error': 'Cannot update stock for other grocery stores'}, 
-                                  status=status.HTTP_403_FORBIDDEN)
-            except AttributeError:
-                return Response({'error': 'Supplier profile not found'}, 
-                              status=status.HTTP_404_NOT_FOUND)
+        if not self.principal.can_access_grocery(item.grocery_id):
+            return Response({'error': 'Cannot update stock for other grocery stores'}, 
+                          status=status.HTTP_403_FORBIDDEN)
         
+        change = new_quantity - item.quantity_in_stock
         item.quantity_in_stock = new_quantity
-        item.save()
+        item.save(update_fields=['quantity_in_stock', 'updated_at'])
+        if change:
+            StockMovement.objects.create(item=item, quantity=change, reason=StockMovement.ADJUSTMENT)
         
         return Response({
             'message': 'Stock updated successfully',
             'new_quantity': new_quantity,
             'stock_status': item.stock_status
         })
+
+
+class StockTransferViewSet(GroceryScopedMixin,
+                           SparseFieldsetMixin,
+                           ValuesListMixin,
+                           mixins.CreateModelMixin,
+                           mixins.ListModelMixin,
+                           mixins.RetrieveModelMixin,
+                           viewsets.GenericViewSet):
+    """
+    Stock transfers between groceries.
+
+    POST a destination and lines of source items and quantities; the whole
+    transfer is applied atomically or not at all (409 if stock is short).
+    Suppliers transfer from their own grocery and see transfers in or out of it.
+    """
+    queryset = StockTransfer.objects.all()
+    serializer_class = StockTransferSerializer
+    filterset_fields = ['source', 'destination']
+    ordering_fields = ['created_at', 'total_quantity']
+    ordering = ['-created_at']
+    query_budgets = {'list': 2, 'retrieve': 2, 'create': 13}
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.principal.is_supplier:
+            grocery_id = self.principal.assigned_grocery_id
+            if grocery_id is None:
+                return queryset.none()
+            queryset = queryset.filter(Q(source_id=grocery_id) | Q(destination_id=grocery_id))
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related('lines')
+        return queryset
+    
+    def get_serializer_class(self):
+        if self.action == 'create':
+            return StockTransferCreateSerializer
+        elif self.action == 'list':
+            return StockTransferListSerializer
+        return StockTransferSerializer
+    
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        source_id = data.get('source') or self.principal.assigned_grocery_id
+        if source_id is None:
+            raise DRFValidationError({'source': 'This field is required.'})
+        self.check_grocery_access(source_id, "Cannot transfer stock from other grocery stores")
+        if data['destination'] == source_id:
+            raise DRFValidationError({'destination': 'Must differ from the source grocery.'})
+        if not Grocery.objects.filter(pk=data['destination']).exists():
+            raise DRFValidationError({'destination': 'Grocery not found.'})
+        
+        try:
+            stock_transfer = transfers.transfer_stock(
+                source_id, data['destination'], data['lines'], request.user, data['notes'],
+            )
+        except transfers.InsufficientStock as e:
+            return Response({'error': str(e), 'items': e.items}, status=status.HTTP_409_CONFLICT)
+        except transfers.TransferError as e:
+            return Response({'error': str(e), 'items': e.items}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(StockTransferSerializer(stock_transfer).data, status=status.HTTP_201_CREATED)
@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import ReportJob
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "report_type", "status", "scope", "requested_by", "created_at", "finished_at")
+    list_filter = ("report_type", "status")
+    search_fields = ("id", "fingerprint", "requested_by__username")
+    readonly_fields = ("result", "result_file", "result_size", "error", "started_at", "finished_at")
+    ordering = ("-created_at",)
@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.reports.models import ReportJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired report jobs and their result files, and fail jobs "
+        "whose worker died so identical reports can be submitted again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-minutes', type=int, default=60,
+                            help='Fail jobs pending or running for longer than this')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        stale = ReportJob.objects.active().filter(
+            created_at__lt=now - timedelta(minutes=options['stale_minutes'])
+        )
+        expired = ReportJob.objects.expired()
+
+        if options['dry_run']:
+            self.stdout.write(f"Would fail {stale.count()} stale and delete {expired.count()} expired report jobs")
+            return
+
+        failed = stale.update(
+            status=ReportJob.FAILED, error='Abandoned by its worker',
+            finished_at=now, expires_at=now, updated_at=now,
+        )
+        # Deleted through the ORM so post_delete removes the result files
+        deleted, _ = expired.delete()
+        self.stdout.write(self.style.SUCCESS(
+            f"Failed {failed} stale and deleted {deleted} expired report jobs"
+        ))
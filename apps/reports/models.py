@@ -0,0 +1,100 @@
+import os
+import uuid
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from apps.core.models import TimeStampedModel
+from apps.accounts.models import User
+
+
+class ReportJobQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(status__in=ReportJob.ACTIVE_STATUSES)
+
+    def reusable(self, fingerprint):
+        """Jobs an identical submission can share: in flight, or finished and unexpired"""
+        return self.filter(fingerprint=fingerprint).filter(
+            models.Q(status__in=ReportJob.ACTIVE_STATUSES)
+            | models.Q(status=ReportJob.SUCCEEDED, expires_at__gt=timezone.now())
+        ).order_by('-created_at')
+
+    def expired(self):
+        return self.filter(expires_at__lt=timezone.now())
+
+
+class ReportJob(TimeStampedModel):
+    """A report computed in the background and kept until ``expires_at``"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    )
+    ACTIVE_STATUSES = (PENDING, RUNNING)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    report_type = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True)
+    # Data the report may see: 'all' or 'grocery:<id>' (see apps.reports.registry)
+    scope = models.CharField(max_length=50)
+    fingerprint = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    requested_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='report_jobs'
+    )
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    result_file = models.CharField(max_length=255, blank=True)
+    result_size = models.PositiveIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ReportJobQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'report_jobs'
+        ordering = ['-created_at']
+        constraints = [
+            # At most one computation in flight per fingerprint
+            models.UniqueConstraint(
+                fields=['fingerprint'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='report_job_active_fingerprint_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='report_job_expires_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.report_type} ({self.status})"
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+    @property
+    def result_path(self):
+        if not self.result_file:
+            return None
+        return os.path.join(settings.REPORT_STORAGE_DIR, self.result_file)
+
+
+@receiver(post_delete, sender=ReportJob)
+def remove_report_file(sender, instance, **kwargs):
+    """Delete the stored result file along with its job"""
+    path = instance.result_path
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
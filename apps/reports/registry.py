@@ -0,0 +1,117 @@
+"""
+Reports that can be run as background jobs.
+
+Each report declares a serializer for its parameters and computes its result
+from a queryset narrowed to the job's scope, so a supplier's job only ever
+sees their own grocery's data, exactly as the matching API action would.
+"""
+import hashlib
+import json
+
+from django.utils import timezone
+from rest_framework import serializers
+
+from apps.income import reports as income_reports
+from apps.income.models import DailyIncome
+from apps.items import reorder, reports as item_reports
+from apps.items.models import Item
+from apps.items.serializers import ReorderParamsSerializer
+
+ALL = 'all'
+NONE = 'none'
+
+
+def scope_for(principal):
+    """The data a principal's reports may cover"""
+    if not principal.is_supplier:
+        return ALL
+    if principal.assigned_grocery_id is None:
+        return NONE
+    return f'grocery:{principal.assigned_grocery_id}'
+
+
+def apply_scope(queryset, scope):
+    if scope == ALL:
+        return queryset
+    if scope.startswith('grocery:'):
+        return queryset.filter(grocery_id=int(scope.split(':', 1)[1]))
+    return queryset.none()
+
+
+def fingerprint(report_type, params, scope):
+    """Identical submissions share one computation"""
+    key = json.dumps([report_type, params, scope], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class IncomeAnalyticsParams(serializers.Serializer):
+    start_date = serializers.DateField(required=False, allow_null=True)
+    end_date = serializers.DateField(required=False, allow_null=True)
+    grocery_id = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+
+
+class MonthlyReportParams(serializers.Serializer):
+    year = serializers.IntegerField(min_value=1900, max_value=9999, default=lambda: timezone.now().year)
+    month = serializers.IntegerField(min_value=1, max_value=12, default=lambda: timezone.now().month)
+
+
+class WeeklyTrendsParams(serializers.Serializer):
+    weeks = serializers.IntegerField(min_value=1, max_value=520, default=4)
+
+
+class NoParams(serializers.Serializer):
+    pass
+
+
+class ReportSpec:
+    def __init__(self, queryset, params_serializer, compute):
+        self.queryset = queryset
+        self.params_serializer = params_serializer
+        self.compute = compute
+
+    def clean_params(self, params):
+        """Validated parameters in their JSON form, defaults filled in"""
+        serializer = self.params_serializer(data=params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.data
+
+    def run(self, params, scope):
+        serializer = self.params_serializer(data=params)
+        serializer.is_valid(raise_exception=True)
+        queryset = apply_scope(self.queryset(), scope)
+        return self.compute(queryset, scope, **serializer.validated_data)
+
+
+REPORTS = {
+    'income.analytics': ReportSpec(
+        lambda: DailyIncome.objects.all(),
+        IncomeAnalyticsParams,
+        lambda queryset, scope, **params: income_reports.income_analytics(queryset, **params),
+    ),
+    'income.monthly_report': ReportSpec(
+        lambda: DailyIncome.objects.all(),
+        MonthlyReportParams,
+        lambda queryset, scope, year, month: income_reports.monthly_report(
+            queryset, year, month, include_grocery_breakdown=scope == ALL,
+        ),
+    ),
+    'income.weekly_trends': ReportSpec(
+        lambda: DailyIncome.objects.all(),
+        WeeklyTrendsParams,
+        lambda queryset, scope, weeks: income_reports.weekly_trends(queryset, weeks),
+    ),
+    'items.inventory_summary': ReportSpec(
+        lambda: Item.objects.all(),
+        NoParams,
+        lambda queryset, scope: item_reports.inventory_summary(
+            queryset, include_grocery_breakdown=scope == ALL,
+        ),
+    ),
+    'items.reorder_suggestions': ReportSpec(
+        lambda: Item.objects.all(),
+        ReorderParamsSerializer,
+        lambda queryset, scope, **params: {
+            'suggestions': list(reorder.reorder_suggestions(queryset, **params).filter(needs_reorder=True)),
+        },
+    ),
+}
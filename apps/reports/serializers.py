@@ -0,0 +1,50 @@
+from rest_framework import serializers
+from rest_framework.reverse import reverse
+from apps.accounts.serializers import UserSummarySerializer
+from .models import ReportJob
+from .registry import REPORTS
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    requested_by_name = serializers.CharField(source='requested_by.username', read_only=True, default=None)
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            'id', 'report_type', 'params', 'status', 'result', 'result_size',
+            'download_url', 'error', 'requested_by', 'requested_by_name',
+            'created_at', 'started_at', 'finished_at', 'expires_at',
+        ]
+        read_only_fields = fields
+        expandable_fields = {'requested_by': UserSummarySerializer}
+        field_sources = {'download_url': ['status']}
+
+    def get_download_url(self, obj):
+        if obj.status != ReportJob.SUCCEEDED:
+            return None
+        return reverse('reportjob-download', args=[obj.pk], request=self.context.get('request'))
+
+
+class ReportJobListSerializer(serializers.ModelSerializer):
+    """Job status without the (possibly large) inline result"""
+    class Meta:
+        model = ReportJob
+        fields = [
+            'id', 'report_type', 'params', 'status', 'result_size', 'error',
+            'created_at', 'finished_at', 'expires_at',
+        ]
+        read_only_fields = fields
+
+
+class ReportJobCreateSerializer(serializers.Serializer):
+    report_type = serializers.ChoiceField(choices=sorted(REPORTS))
+    params = serializers.DictField(required=False, default=dict)
+
+    def validate(self, attrs):
+        spec = REPORTS[attrs['report_type']]
+        try:
+            attrs['params'] = spec.clean_params(attrs['params'])
+        except serializers.ValidationError as e:
+            raise serializers.ValidationError({'params': e.detail})
+        return attrs
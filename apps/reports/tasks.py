@@ -0,0 +1,84 @@
+import gzip
+import json
+import logging
+import os
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import ReportJob
+from .registry import REPORTS, fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+def submit_report(report_type, params, user, scope):
+    """
+    Return ``(job, created)`` for a report request.
+
+    An identical request (same report, parameters and scope) that is still
+    running or has an unexpired result is shared instead of recomputed.
+    """
+    key = fingerprint(report_type, params, scope)
+
+    job = ReportJob.objects.reusable(key).first()
+    if job is not None:
+        return job, False
+
+    try:
+        with transaction.atomic():
+            job = ReportJob.objects.create(
+                report_type=report_type, params=params, scope=scope,
+                fingerprint=key, requested_by=user,
+            )
+    except IntegrityError:
+        # An identical job was submitted concurrently and won the race
+        return ReportJob.objects.reusable(key).first(), False
+
+    job_id = str(job.pk)
+    transaction.on_commit(lambda: run_report_job.delay(job_id))
+    return job, True
+
+
+def store_result(job, result):
+    """Keep small results inline and write large ones gzipped to disk"""
+    payload = json.dumps(result, cls=DjangoJSONEncoder).encode()
+    job.result_size = len(payload)
+    if len(payload) <= settings.REPORT_INLINE_MAX_BYTES:
+        job.result = json.loads(payload)
+        return
+
+    os.makedirs(settings.REPORT_STORAGE_DIR, exist_ok=True)
+    job.result_file = f'{job.pk}.json.gz'
+    path = job.result_path
+    partial = f'{path}.part'
+    with gzip.open(partial, 'wb') as f:
+        f.write(payload)
+    os.replace(partial, path)
+
+
+@shared_task(ignore_result=True)
+def run_report_job(job_id):
+    """Compute a pending report job; a job is only ever claimed by one worker"""
+    claimed = ReportJob.objects.filter(pk=job_id, status=ReportJob.PENDING).update(
+        status=ReportJob.RUNNING, started_at=timezone.now(), updated_at=timezone.now(),
+    )
+    if not claimed:
+        return
+
+    job = ReportJob.objects.get(pk=job_id)
+    try:
+        result = REPORTS[job.report_type].run(job.params, job.scope)
+        store_result(job, result)
+        job.status = ReportJob.SUCCEEDED
+    except Exception as e:
+        logger.exception("Report job %s failed", job_id)
+        job.status = ReportJob.FAILED
+        job.error = str(e)
+    job.finished_at = timezone.now()
+    job.expires_at = job.finished_at + timedelta(seconds=settings.REPORT_RESULT_TTL)
+    job.save()
@@ -0,0 +1,134 @@
+import gzip
+import json
+import tempfile
+import time
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.core import throttling
+from apps.groceries.models import Grocery
+from apps.income.models import DailyIncome
+from .models import ReportJob
+from .registry import ALL
+
+
+class ReportJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='report-password', user_type='admin')
+        cls.supplier = User.objects.create_user(
+            email='supplier@example.com', username='supplier', password='report-password', user_type='supplier')
+        cls.grocery, cls.other_grocery = Grocery.objects.bulk_create([
+            Grocery(name=f'Grocery {n}', location='Somewhere', created_by=cls.admin) for n in range(2)
+        ])
+        profile = cls.supplier.supplier_profile
+        profile.assigned_grocery = cls.grocery
+        profile.save()
+        cls.supplier.refresh_from_db()
+        today = date.today()
+        DailyIncome.objects.bulk_create([
+            DailyIncome(grocery=grocery, date=today, amount=Decimal(amount), recorded_by=cls.admin)
+            for grocery, amount in ((cls.grocery, '100.00'), (cls.other_grocery, '50.00'))
+        ])
+
+    def setUp(self):
+        storage = tempfile.TemporaryDirectory()
+        self.addCleanup(storage.cleanup)
+        self.enterContext(override_settings(REPORT_STORAGE_DIR=storage.name, NEO4J_BACKEND='local'))
+        # Every test submits several exports
+        throttling.clear()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def submit(self, user, report_type='income.analytics', params=None):
+        # Jobs are queued on commit; tasks run eagerly without a broker
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client_for(user).post(
+                '/api/v1/reports/', {'report_type': report_type, 'params': params or {}}, format='json')
+        if response.status_code < 400:
+            response = self.client_for(user).get(f"/api/v1/reports/{response.data['id']}/")
+        return response
+
+    def test_identical_submissions_share_one_job(self):
+        first = self.submit(self.admin)
+        second = self.submit(self.admin)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(first.data['status'], ReportJob.SUCCEEDED)
+        self.assertEqual(first.data['id'], second.data['id'])
+        self.assertEqual(ReportJob.objects.count(), 1)
+        self.assertEqual(Decimal(first.data['result']['total_income']), Decimal('150'))
+
+    def test_supplier_reports_cover_their_grocery_only(self):
+        response = self.submit(self.supplier)
+
+        self.assertEqual(Decimal(response.data['result']['total_income']), Decimal('100'))
+        admin_jobs = self.client_for(self.admin).get('/api/v1/reports/')
+        self.assertEqual(admin_jobs.data['count'], 1)
+        self.submit(self.admin)
+        supplier_jobs = self.client_for(self.supplier).get('/api/v1/reports/')
+        self.assertEqual(supplier_jobs.data['count'], 1)
+
+    def test_invalid_params_are_rejected(self):
+        response = self.submit(self.admin, 'income.monthly_report', {'month': 13})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('month', response.data['params'])
+        self.assertFalse(ReportJob.objects.exists())
+
+    @override_settings(REPORT_INLINE_MAX_BYTES=10)
+    def test_large_results_are_stored_compressed(self):
+        response = self.submit(self.admin, 'income.monthly_report')
+        job = ReportJob.objects.get(pk=response.data['id'])
+
+        self.assertIsNone(response.data['result'])
+        self.assertTrue(job.result_file)
+        download = self.client_for(self.admin).get(response.data['download_url'])
+        self.assertEqual(download['Content-Type'], 'application/gzip')
+        report = json.loads(gzip.decompress(b''.join(download.streaming_content)))
+        self.assertEqual(report['summary']['total_income'], 150.0)
+
+        job.delete()
+        with self.assertRaises(FileNotFoundError):
+            open(job.result_path, 'rb')
+
+    def test_wait_view_returns_the_job_as_retrieve_does(self):
+        job_id = self.submit(self.supplier).data['id']
+        client = self.client_for(self.supplier)
+
+        waited = client.get(f'/api/v1/reports/{job_id}/wait/', {'wait': 5})
+
+        self.assertEqual(waited.status_code, 200)
+        self.assertEqual(waited.json(), client.get(f'/api/v1/reports/{job_id}/').json())
+        self.assertTrue(waited['Location'].endswith(f'/api/v1/reports/{job_id}/'))
+        admin_job = self.submit(self.admin).data['id']
+        self.assertEqual(client.get(f'/api/v1/reports/{admin_job}/wait/').status_code, 404)
+
+    @patch('apps.reports.views.POLL_INTERVAL', 0.01)
+    # Every poll re-reads the job
+    @override_settings(REPORT_MAX_WAIT=0.05, REPORT_SYNC_MAX_WAIT=0.05, SERVER_TIMING={
+        **settings.SERVER_TIMING, 'N_PLUS_ONE_ACTION': 'off', 'QUERY_BUDGET_ACTION': 'off'})
+    def test_long_polls_are_capped(self):
+        job = ReportJob.objects.create(
+            report_type='income.analytics', scope=ALL, fingerprint='pending', requested_by=self.admin)
+        client = self.client_for(self.admin)
+
+        for path in (f'/api/v1/reports/{job.pk}/', f'/api/v1/reports/{job.pk}/wait/'):
+            with self.subTest(path=path):
+                started = time.monotonic()
+                response = client.get(path, {'wait': 60})
+                self.assertLess(time.monotonic() - started, 5)
+                self.assertEqual(response.status_code, 202)
+                self.assertEqual(response['Retry-After'], '2')
+                self.assertEqual(client.get(path, {'wait': 'soon'}).status_code, 400)
@@ -0,0 +1,11 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import ReportJobViewSet, ReportJobWaitView
+
+router = DefaultRouter()
+router.register(r'', ReportJobViewSet)
+
+urlpatterns = [
+    path('<uuid:pk>/wait/', ReportJobWaitView.as_view(), name='reportjob-wait'),
+    path('', include(router.urls)),
+]
@@ -0,0 +1,173 @@
+import asyncio
+import gzip
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import FileResponse, HttpResponse, JsonResponse
+from django.urls import reverse
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from apps.core.mixins import GroceryScopedMixin, SparseFieldsetMixin
+from apps.core.principal import get_principal
+from apps.core.views import AsyncAPIView
+from .models import ReportJob
+from .registry import scope_for
+from .serializers import ReportJobSerializer, ReportJobListSerializer, ReportJobCreateSerializer
+from .tasks import submit_report
+
+# Seconds between status checks while a client long-polls with ?wait=
+POLL_INTERVAL = 0.5
+
+
+def parse_wait(request, limit):
+    """Seconds to long-poll for, or None if ?wait= is not a number"""
+    try:
+        return min(float(request.GET.get('wait', 0)), limit)
+    except ValueError:
+        return None
+
+
+def job_headers(job, location):
+    headers = {'Location': location}
+    if job.is_active:
+        headers['Retry-After'] = str(settings.REPORT_RETRY_AFTER)
+    return headers
+
+
+class ReportJobViewSet(GroceryScopedMixin,
+                       SparseFieldsetMixin,
+                       mixins.CreateModelMixin,
+                       mixins.ListModelMixin,
+                       mixins.RetrieveModelMixin,
+                       viewsets.GenericViewSet):
+    """
+    Background report jobs.
+
+    POST a report_type and params to get a job (202 while it is computing),
+    then poll it - optionally with ?wait=<seconds> - until it succeeds.
+    Waiting here holds a sync worker, so it is capped at
+    REPORT_SYNC_MAX_WAIT; ``ReportJobWaitView`` long-polls for longer.
+    Results too large to inline are served gzipped from ``download``.
+    """
+    queryset = ReportJob.objects.select_related('requested_by')
+    serializer_class = ReportJobSerializer
+    filterset_fields = ['report_type', 'status']
+    ordering_fields = ['created_at', 'finished_at']
+    ordering = ['-created_at']
+    query_budgets = {'list': 2, 'retrieve': 1, 'create': 7, 'download': 1}
+    throttle_costs = {'create': 100, 'download': 100}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # Jobs are shared by everyone who may see the same data
+        if not self.principal.is_admin:
+            queryset = queryset.filter(scope=scope_for(self.principal))
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'create':
+            return ReportJobCreateSerializer
+        elif self.action == 'list':
+            return ReportJobListSerializer
+        return ReportJobSerializer
+
+    def create(self, request, *args, **kwargs):
+        """Submit a report, or join an identical one already computed or in flight"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        job, created = submit_report(
+            serializer.validated_data['report_type'],
+            serializer.validated_data['params'],
+            request.user,
+            scope_for(self.principal),
+        )
+        # An eager or fast worker may already have finished it
+        job.refresh_from_db()
+        return self._job_response(job)
+
+    def retrieve(self, request, *args, **kwargs):
+        job = self.get_object()
+        wait = parse_wait(request, settings.REPORT_SYNC_MAX_WAIT)
+        if wait is None:
+            return Response({'error': 'wait must be a number of seconds'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        deadline = time.monotonic() + wait
+        while job.is_active and time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            job.refresh_from_db()
+        return self._job_response(job)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """The result as a gzipped JSON file"""
+        job = self.get_object()
+        if job.status != ReportJob.SUCCEEDED:
+            return Response({'error': f'Report is {job.status}'}, status=status.HTTP_409_CONFLICT)
+
+        filename = f'{job.report_type}-{job.pk}.json.gz'
+        if job.result_file:
+            try:
+                return FileResponse(
+                    open(job.result_path, 'rb'), as_attachment=True,
+                    filename=filename, content_type='application/gzip',
+                )
+            except FileNotFoundError:
+                return Response({'error': 'Report file is no longer available'},
+                                status=status.HTTP_410_GONE)
+
+        response = HttpResponse(
+            gzip.compress(json.dumps(job.result, cls=DjangoJSONEncoder).encode()),
+            content_type='application/gzip',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    def _job_response(self, job):
+        data = ReportJobSerializer(job, context=self.get_serializer_context()).data
+        location = self.reverse_action('detail', args=[job.pk])
+        return Response(data, status=status.HTTP_202_ACCEPTED if job.is_active else status.HTTP_200_OK,
+                        headers=job_headers(job, location))
+
+
+class ReportJobWaitView(AsyncAPIView):
+    """
+    Long-poll a report job for up to REPORT_MAX_WAIT seconds.
+
+    Under ASGI the wait is awaited, so polling clients do not hold a worker;
+    the response is the job as ``ReportJobViewSet.retrieve`` returns it.
+    """
+    query_budgets = {'get': 1}
+
+    async def get(self, request, pk):
+        wait = parse_wait(request, settings.REPORT_MAX_WAIT)
+        if wait is None:
+            return JsonResponse({'error': 'wait must be a number of seconds'},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        principal = await sync_to_async(get_principal)(request)
+        jobs = ReportJob.objects.select_related('requested_by')
+        if not principal.is_admin:
+            jobs = jobs.filter(scope=scope_for(principal))
+        job = await jobs.filter(pk=pk).afirst()
+        if job is None:
+            return JsonResponse({'detail': 'No ReportJob matches the given query.'},
+                                status=status.HTTP_404_NOT_FOUND)
+
+        deadline = time.monotonic() + wait
+        while job.is_active and time.monotonic() < deadline:
+            await asyncio.sleep(POLL_INTERVAL)
+            await job.arefresh_from_db()
+
+        data = await sync_to_async(lambda: ReportJobSerializer(job, context={'request': request}).data)()
+        location = request.build_absolute_uri(reverse('reportjob-detail', args=[job.pk]))
+        response = JsonResponse(data, encoder=DjangoJSONEncoder,
+                                status=status.HTTP_202_ACCEPTED if job.is_active else status.HTTP_200_OK)
+        for name, value in job_headers(job, location).items():
+            response[name] = value
+        return response
@@ -0,0 +1,21 @@
+from django.contrib import admin
+from .models import Receipt, ReceiptLine, SalesIncomeShard
+
+
+class ReceiptLineInline(admin.TabularInline):
+    model = ReceiptLine
+    raw_id_fields = ("item",)
+    extra = 0
+
+@admin.register(Receipt)
+class ReceiptAdmin(admin.ModelAdmin):
+    list_display = ("receipt_id", "grocery", "till_id", "sold_at", "total", "line_count", "recorded_by")
+    list_filter = ("grocery", "date")
+    search_fields = ("receipt_id", "till_id")
+    date_hierarchy = "date"
+    inlines = [ReceiptLineInline]
+
+@admin.register(SalesIncomeShard)
+class SalesIncomeShardAdmin(admin.ModelAdmin):
+    list_display = ("grocery", "date", "shard", "amount", "receipt_count")
+    list_filter = ("date",)
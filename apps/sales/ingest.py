@@ -0,0 +1,200 @@
+"""
+POS sales ingestion.
+
+A batch of receipts is written in a fixed number of statements however
+many lines it has: one UPDATE decrements the stock of every sold item, the
+stock movements, receipts and their lines are bulk inserted, and the batch's takings are
+added to a sharded per-day accumulator (``SalesIncomeShard``). Tills are
+spread over the shards, so they do not queue on one income row;
+``rollup_sales_income`` folds the shards into ``DailyIncome``.
+"""
+import random
+import zlib
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from apps.core import events
+from apps.core.utils import additive_upsert
+from apps.income.models import DailyIncome
+from apps.items import pos
+from apps.items.models import Item, StockMovement
+from .models import Receipt, ReceiptLine, SalesIncomeShard
+
+
+def shard_for(till_id):
+    """Each till always lands on the same shard"""
+    if not till_id:
+        return random.randrange(settings.SALES_INCOME_SHARDS)
+    return zlib.crc32(till_id.encode()) % settings.SALES_INCOME_SHARDS
+
+
+def ingest_receipts(grocery_id, receipts, user):
+    """
+    Record validated ``receipts`` for a grocery.
+
+    Receipts whose ``receipt_id`` is already recorded are reported as
+    duplicates and skipped, so a till can safely resend a batch. Receipts
+    with unknown items or a future ``sold_at`` are rejected; the rest of the
+    batch is still recorded.
+    """
+    try:
+        with transaction.atomic():
+            return _ingest(grocery_id, receipts, user)
+    except IntegrityError:
+        # A concurrent retry of some of these receipts committed first; a
+        # second pass sees them and skips them as duplicates
+        with transaction.atomic():
+            return _ingest(grocery_id, receipts, user)
+
+
+def _ingest(grocery_id, receipts, user):
+    now = timezone.now()
+    recorded = set(
+        Receipt.objects.filter(
+            grocery_id=grocery_id, receipt_id__in=[r['receipt_id'] for r in receipts]
+        ).values_list('receipt_id', flat=True)
+    )
+
+    item_ids = {line['item'] for r in receipts for line in r['lines'] if line.get('item')}
+    skus = {line['sku'] for r in receipts for line in r['lines'] if line.get('sku') and not line.get('item')}
+    by_id, by_sku = {}, {}
+    for row in Item.objects.filter(grocery_id=grocery_id).filter(
+        Q(pk__in=item_ids) | Q(sku__in=skus)
+    ).values('id', 'sku', 'price'):
+        by_id[row['id']] = by_sku[row['sku']] = row
+
+    result = {'accepted': [], 'duplicates': [], 'rejected': [], 'lines': 0, 'total': Decimal('0.00')}
+    new_receipts, receipt_lines, sold, takings = [], [], {}, {}
+    for receipt in receipts:
+        receipt_id = receipt['receipt_id']
+        if receipt_id in recorded:
+            result['duplicates'].append(receipt_id)
+            continue
+        sold_at = receipt.get('sold_at') or now
+        if sold_at > now + timezone.timedelta(minutes=5):
+            result['rejected'].append({'receipt_id': receipt_id, 'error': 'sold_at is in the future'})
+            continue
+
+        lines, unknown = [], []
+        for line in receipt['lines']:
+            item = by_id.get(line['item']) if line.get('item') else by_sku.get(line.get('sku'))
+            if item is None:
+                unknown.append(str(line.get('item') or line.get('sku')))
+                continue
+            unit_price = line.get('unit_price', item['price'])
+            lines.append(ReceiptLine(
+                item_id=item['id'], sku=item['sku'], quantity=line['quantity'],
+                unit_price=unit_price, line_total=unit_price * line['quantity'],
+            ))
+        if unknown:
+            result['rejected'].append({'receipt_id': receipt_id, 'error': f"Unknown items: {', '.join(unknown)}"})
+            continue
+
+        recorded.add(receipt_id)
+        total = sum((line.line_total for line in lines), Decimal('0.00'))
+        date = timezone.localdate(sold_at)
+        new_receipts.append(Receipt(
+            grocery_id=grocery_id, receipt_id=receipt_id, till_id=receipt.get('till_id', ''),
+            sold_at=sold_at, date=date, total=total, line_count=len(lines), recorded_by=user,
+        ))
+        receipt_lines.append(lines)
+        for line in lines:
+            sold[line.item_id] = sold.get(line.item_id, 0) + line.quantity
+        key = (date, shard_for(receipt.get('till_id')))
+        amount, count = takings.get(key, (Decimal('0.00'), 0))
+        takings[key] = (amount + total, count + 1)
+        result['accepted'].append(receipt_id)
+        result['lines'] += len(lines)
+        result['total'] += total
+
+    if not new_receipts:
+        return result
+
+    StockMovement.objects.bulk_create([
+        StockMovement(item_id=item_id, quantity=-quantity, reason=StockMovement.SALE)
+        for item_id, quantity in sold.items()
+    ])
+
+    Receipt.objects.bulk_create(new_receipts)
+    for receipt, lines in zip(new_receipts, receipt_lines):
+        for line in lines:
+            line.receipt = receipt
+    ReceiptLine.objects.bulk_create([line for lines in receipt_lines for line in lines], batch_size=1000)
+
+    additive_upsert(
+        SalesIncomeShard,
+        [
+            {'grocery_id': grocery_id, 'date': date, 'shard': shard, 'amount': amount,
+             'receipt_count': count, 'recorded_by_id': user.pk}
+            for (date, shard), (amount, count) in takings.items()
+        ],
+        unique_fields=('grocery', 'date', 'shard'),
+        add_fields=('amount', 'receipt_count'),
+    )
+    # Last, so the stock stamp is taken after every lock wait and trails the
+    # commit by far less than SYNC_COMMIT_LAG
+    _decrement_stock(grocery_id, sold)
+    pos.invalidate_grocery(grocery_id)
+    return result
+
+
+def _decrement_stock(grocery_id, sold):
+    """
+    Take every sold quantity off stock in one UPDATE (floored at zero).
+
+    ``updated_at`` is stamped once the rows are locked: a stamp taken before
+    waiting on another till could land behind delta sync cursors that
+    devices have already passed.
+    """
+    # Lock in id order so tills selling overlapping items cannot deadlock
+    stock = list(Item.objects.select_for_update().filter(pk__in=sold).order_by('pk').values_list(
+        'pk', 'quantity_in_stock', 'reorder_level',
+    ))
+    now = timezone.now()
+    for item_id, quantity, reorder_level in stock:
+        events.stock_changed(item_id, grocery_id, max(0, quantity - sold[item_id]), reorder_level,
+                             quantity <= reorder_level)
+    Item.objects.filter(pk__in=sold).update(
+        quantity_in_stock=Greatest(
+            F('quantity_in_stock') - Case(
+                *[When(pk=item_id, then=Value(quantity)) for item_id, quantity in sold.items()],
+                output_field=IntegerField(),
+            ),
+            Value(0),
+        ),
+        updated_at=now,
+    )
+
+
+def rollup_sales_income():
+    """Fold the sales shards into ``DailyIncome``; returns the income rows touched"""
+    now = timezone.now()
+    with transaction.atomic():
+        shards = list(
+            SalesIncomeShard.objects.select_for_update()
+            .values_list('pk', 'grocery_id', 'date', 'amount', 'recorded_by_id')
+        )
+        if not shards:
+            return 0
+
+        totals = {}
+        for _, grocery_id, date, amount, recorded_by_id in shards:
+            row = totals.setdefault((grocery_id, date), {
+                'grocery_id': grocery_id, 'date': date, 'amount': Decimal('0.00'),
+                'recorded_by_id': recorded_by_id, 'notes': '', 'created_at': now, 'updated_at': now,
+            })
+            row['amount'] += amount
+
+        additive_upsert(
+            DailyIncome, list(totals.values()),
+            unique_fields=('grocery', 'date'), add_fields=('amount',), update_fields=('updated_at',),
+        )
+        SalesIncomeShard.objects.filter(pk__in=[shard[0] for shard in shards]).delete()
+        for row in totals.values():
+            events.income_recorded(row['grocery_id'], row['date'], row['amount'])
+    return len(totals)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.sales.ingest import rollup_sales_income
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold recorded POS takings into daily income. Run every minute from "
+        "cron when Celery beat is not used."
+    )
+
+    def handle(self, *args, **options):
+        rows = rollup_sales_income()
+        self.stdout.write(self.style.SUCCESS(f"Updated {rows} daily income rows"))
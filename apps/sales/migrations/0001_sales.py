@@ -0,0 +1,73 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('groceries', '0002_soft_delete_archive'),
+        ('items', '0004_unique_active_sku'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Receipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('receipt_id', models.CharField(max_length=64)),
+                ('till_id', models.CharField(blank=True, max_length=64)),
+                ('sold_at', models.DateTimeField()),
+                ('date', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('line_count', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('grocery', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='receipts', to='groceries.grocery')),
+                ('recorded_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='receipts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-sold_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReceiptLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sku', models.CharField(blank=True, max_length=50)),
+                ('quantity', models.PositiveIntegerField()),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('line_total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('item', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='receipt_lines', to='items.item')),
+                ('receipt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='sales.receipt')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SalesIncomeShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('receipt_count', models.PositiveIntegerField()),
+                ('grocery', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='groceries.grocery')),
+                ('recorded_by', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='receipt',
+            index=models.Index(fields=['grocery', 'date'], name='receipt_grocery_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='receipt',
+            constraint=models.UniqueConstraint(fields=('grocery', 'receipt_id'), name='unique_receipt_per_grocery'),
+        ),
+        migrations.AddConstraint(
+            model_name='salesincomeshard',
+            constraint=models.UniqueConstraint(fields=('grocery', 'date', 'shard'), name='unique_sales_income_shard'),
+        ),
+    ]
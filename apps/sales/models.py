@@ -0,0 +1,63 @@
+from django.db import models
+from apps.accounts.models import User
+from apps.groceries.models import Grocery
+from apps.items.models import Item
+
+
+class Receipt(models.Model):
+    """A till receipt; ``receipt_id`` is the client's key that makes retries safe"""
+    grocery = models.ForeignKey(Grocery, on_delete=models.PROTECT, related_name='receipts')
+    receipt_id = models.CharField(max_length=64)
+    till_id = models.CharField(max_length=64, blank=True)
+    sold_at = models.DateTimeField()
+    date = models.DateField()
+    total = models.DecimalField(max_digits=12, decimal_places=2)
+    line_count = models.PositiveIntegerField()
+    recorded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='receipts')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['grocery', 'receipt_id'], name='unique_receipt_per_grocery')
+        ]
+        indexes = [
+            models.Index(fields=['grocery', 'date'], name='receipt_grocery_date_idx'),
+        ]
+        ordering = ['-sold_at']
+    
+    def __str__(self):
+        return f"{self.receipt_id} - {self.grocery_id} - ${self.total}"
+
+
+class ReceiptLine(models.Model):
+    receipt = models.ForeignKey(Receipt, on_delete=models.CASCADE, related_name='lines')
+    # Kept (as the SKU) when a purged item row goes away
+    item = models.ForeignKey(Item, on_delete=models.SET_NULL, null=True, related_name='receipt_lines')
+    sku = models.CharField(max_length=50, blank=True)
+    quantity = models.PositiveIntegerField()
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    line_total = models.DecimalField(max_digits=12, decimal_places=2)
+    
+    def __str__(self):
+        return f"{self.quantity} x {self.item_id} @ {self.unit_price}"
+
+
+class SalesIncomeShard(models.Model):
+    """
+    Sales totals not yet folded into ``DailyIncome``.
+
+    Tills add to one of ``SALES_INCOME_SHARDS`` rows per grocery and day, so
+    concurrent tills rarely wait on the same row; ``rollup_sales_income``
+    periodically moves the sums into the day's single income row.
+    """
+    grocery = models.ForeignKey(Grocery, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()
+    shard = models.PositiveSmallIntegerField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    receipt_count = models.PositiveIntegerField()
+    recorded_by = models.ForeignKey(User, on_delete=models.PROTECT, related_name='+')
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['grocery', 'date', 'shard'], name='unique_sales_income_shard')
+        ]
@@ -0,0 +1,60 @@
+from decimal import Decimal
+
+from django.conf import settings
+from rest_framework import serializers
+from apps.accounts.serializers import UserSummarySerializer
+from apps.groceries.serializers import GrocerySummarySerializer
+from .models import Receipt, ReceiptLine
+
+
+class ReceiptLineSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ReceiptLine
+        fields = ['id', 'item', 'sku', 'quantity', 'unit_price', 'line_total']
+        read_only_fields = fields
+
+
+class ReceiptSerializer(serializers.ModelSerializer):
+    lines = ReceiptLineSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Receipt
+        fields = [
+            'id', 'grocery', 'receipt_id', 'till_id', 'sold_at', 'date', 'total',
+            'line_count', 'lines', 'recorded_by', 'created_at',
+        ]
+        read_only_fields = fields
+        expandable_fields = {'grocery': GrocerySummarySerializer, 'recorded_by': UserSummarySerializer}
+
+
+class ReceiptListSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Receipt
+        fields = ['id', 'grocery', 'receipt_id', 'till_id', 'sold_at', 'total', 'line_count']
+        read_only_fields = fields
+
+
+class SaleLineSerializer(serializers.Serializer):
+    """A sold item by id or SKU; unit_price defaults to the item's price"""
+    item = serializers.IntegerField(required=False, min_value=1)
+    sku = serializers.CharField(max_length=50, required=False)
+    quantity = serializers.IntegerField(min_value=1)
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'), required=False)
+
+    def validate(self, attrs):
+        if not attrs.get('item') and not attrs.get('sku'):
+            raise serializers.ValidationError("Either item or sku is required")
+        return attrs
+
+
+class SaleSerializer(serializers.Serializer):
+    receipt_id = serializers.CharField(max_length=64)
+    till_id = serializers.CharField(max_length=64, required=False, allow_blank=True, default='')
+    sold_at = serializers.DateTimeField(required=False)
+    lines = SaleLineSerializer(many=True, allow_empty=False)
+
+
+class SalesBatchSerializer(serializers.Serializer):
+    """Receipts from a till; grocery defaults to the supplier's own"""
+    grocery = serializers.IntegerField(required=False, min_value=1)
+    receipts = SaleSerializer(many=True, allow_empty=False, max_length=settings.SALES_MAX_RECEIPTS_PER_BATCH)
@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .ingest import rollup_sales_income as rollup
+
+
+@shared_task(ignore_result=True)
+def rollup_sales_income():
+    """Fold POS takings into daily income (see CELERY_BEAT_SCHEDULE)"""
+    return rollup()
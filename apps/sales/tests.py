@@ -0,0 +1,102 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.groceries.models import Grocery
+from apps.income.models import DailyIncome
+from apps.items.models import Item, ItemType
+from .ingest import ingest_receipts, rollup_sales_income
+from .models import Receipt, SalesIncomeShard
+
+
+@override_settings(NEO4J_BACKEND='local', SALES_INCOME_SHARDS=4)
+class SalesIngestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='sales-password', user_type='admin')
+        cls.grocery = Grocery.objects.create(name='Grocery', location='Somewhere', created_by=cls.admin)
+        item_type = ItemType.objects.create(name='Dairy')
+        cls.milk, cls.cheese = Item.objects.bulk_create([
+            Item(name=name, item_type=item_type, location='display', price=Decimal(price),
+                 grocery=cls.grocery, sku=sku, quantity_in_stock=5)
+            for name, price, sku in (('Milk', '1.20', '4000001'), ('Cheese', '4.50', '4000002'))
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def record(self, *receipts):
+        return self.client.post('/api/v1/sales/', {
+            'grocery': self.grocery.pk, 'receipts': list(receipts)}, format='json')
+
+    def test_batch_records_receipts_and_takes_stock(self):
+        response = self.record(
+            {'receipt_id': 'r1', 'till_id': 'till-1', 'lines': [
+                {'sku': '4000001', 'quantity': 2}, {'item': self.cheese.pk, 'quantity': 1}]},
+            {'receipt_id': 'r2', 'till_id': 'till-2', 'lines': [{'sku': '4000001', 'quantity': 4}]},
+            {'receipt_id': 'r3', 'lines': [{'sku': 'nope', 'quantity': 1}]},
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['accepted'], ['r1', 'r2'])
+        self.assertEqual(response.data['rejected'][0]['receipt_id'], 'r3')
+        self.assertEqual(response.data['total'], Decimal('11.70'))
+        self.milk.refresh_from_db()
+        self.cheese.refresh_from_db()
+        # Overselling floors stock at zero
+        self.assertEqual((self.milk.quantity_in_stock, self.cheese.quantity_in_stock), (0, 4))
+        self.assertEqual(Receipt.objects.get(receipt_id='r1').lines.count(), 2)
+
+    def test_resent_receipts_are_duplicates(self):
+        receipt = {'receipt_id': 'r1', 'lines': [{'sku': '4000002', 'quantity': 1}]}
+        self.record(receipt)
+        response = self.record(receipt)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['duplicates'], ['r1'])
+        self.assertEqual(Receipt.objects.count(), 1)
+        self.cheese.refresh_from_db()
+        self.assertEqual(self.cheese.quantity_in_stock, 4)
+
+    @override_settings(SYNC_COMMIT_LAG=2)
+    def test_stock_stamp_trails_the_commit_by_less_than_the_sync_lag(self):
+        # Every statement takes a second, as when tills queue on each other's locks
+        clock = [timezone.now()]
+
+        def slow(execute, sql, params, many, context):
+            clock[0] += timedelta(seconds=1)
+            return execute(sql, params, many, context)
+
+        with patch('django.utils.timezone.now', side_effect=lambda: clock[0]), \
+                connection.execute_wrapper(slow):
+            ingest_receipts(self.grocery.pk, [
+                {'receipt_id': 'r1', 'till_id': 'till-1', 'lines': [{'sku': '4000001', 'quantity': 1}]},
+            ], self.admin)
+        committed = clock[0]
+
+        self.milk.refresh_from_db()
+        self.assertEqual(self.milk.quantity_in_stock, 4)
+        self.assertLessEqual(committed - self.milk.updated_at, timedelta(seconds=2))
+
+    def test_rollup_adds_takings_to_daily_income(self):
+        today = timezone.localdate()
+        DailyIncome.objects.create(grocery=self.grocery, date=today, amount=Decimal('10.00'),
+                                   recorded_by=self.admin, notes='Manual entry')
+        for n in range(6):
+            self.record({'receipt_id': f'r{n}', 'till_id': f'till-{n}', 'lines': [
+                {'sku': '4000002', 'quantity': 1, 'unit_price': '2.00'}]})
+
+        self.assertEqual(rollup_sales_income(), 1)
+        income = DailyIncome.objects.get(grocery=self.grocery, date=today)
+        self.assertEqual(income.amount, Decimal('22.00'))
+        self.assertEqual(income.notes, 'Manual entry')
+        self.assertFalse(SalesIncomeShard.objects.exists())
+        self.assertEqual(rollup_sales_income(), 0)
@@ -0,0 +1,59 @@
+from rest_framework import mixins, status, viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from apps.core.mixins import GroceryScopedMixin, ReplicaReadMixin, SparseFieldsetMixin, ValuesListMixin
+from .ingest import ingest_receipts
+from .models import Receipt
+from .serializers import ReceiptSerializer, ReceiptListSerializer, SalesBatchSerializer
+
+
+class ReceiptViewSet(GroceryScopedMixin,
+                     SparseFieldsetMixin,
+                     ReplicaReadMixin,
+                     ValuesListMixin,
+                     mixins.CreateModelMixin,
+                     mixins.ListModelMixin,
+                     mixins.RetrieveModelMixin,
+                     viewsets.GenericViewSet):
+    """
+    POS sales.
+
+    POST a batch of receipts to record them: stock is taken off the sold
+    items and the takings are added to the day's income. Resending a receipt
+    is harmless - its receipt_id is reported back as a duplicate.
+    """
+    queryset = Receipt.objects.all()
+    serializer_class = ReceiptSerializer
+    filterset_fields = ['grocery', 'date', 'till_id']
+    ordering_fields = ['sold_at', 'total']
+    ordering = ['-sold_at']
+    query_budgets = {'list': 2, 'retrieve': 2, 'create': 10}
+
+    def get_queryset(self):
+        queryset = self.scope_queryset(super().get_queryset())
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related('lines')
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'create':
+            return SalesBatchSerializer
+        elif self.action == 'list':
+            return ReceiptListSerializer
+        return ReceiptSerializer
+
+    def create(self, request, *args, **kwargs):
+        """Record a batch of receipts"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        grocery_id = serializer.validated_data.get('grocery') or self.principal.assigned_grocery_id
+        if grocery_id is None:
+            raise ValidationError({'grocery': 'This field is required.'})
+        self.check_grocery_access(grocery_id, "Cannot record sales for other grocery stores")
+
+        result = ingest_receipts(grocery_id, serializer.validated_data['receipts'], request.user)
+        return Response(
+            result,
+            status=status.HTTP_201_CREATED if result['accepted'] else status.HTTP_200_OK,
+        )
@@ -0,0 +1,15 @@
+"""
+Celery application for background jobs (report generation).
+
+Without REDIS_URL tasks run eagerly in-process, so local development and
+tests need no broker or worker.
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.development')
+
+app = Celery('config')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -0,0 +1,19 @@
+"""
+Gunicorn profile serving the ASGI application with uvicorn workers.
+
+    gunicorn -c config/gunicorn_asgi.py config.asgi:application
+
+Each worker runs an event loop, so async views such as the grocery analytics
+endpoint keep serving other requests while they await slow graph queries;
+sync DRF views still run in a thread per request.
+"""
+import multiprocessing
+
+import decouple
+
+bind = decouple.config('GUNICORN_BIND', default='0.0.0.0:8000')
+workers = decouple.config('GUNICORN_WORKERS', default=multiprocessing.cpu_count(), cast=int)
+worker_class = 'uvicorn_worker.UvicornWorker'
+timeout = decouple.config('GUNICORN_TIMEOUT', default=30, cast=int)
+graceful_timeout = decouple.config('GUNICORN_GRACEFUL_TIMEOUT', default=30, cast=int)
+keepalive = decouple.config('GUNICORN_KEEPALIVE', default=5, cast=int)
@@ -1,8 +1,10 @@
 """
 Base settings for grocery management system.
 """
+import importlib.util
 import os
 from pathlib import Path
+from celery.schedules import crontab
 from decouple import config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -34,12 +36,17 @@ LOCAL_APPS = [
     'apps.groceries', 
     'apps.items',
     'apps.income',
+    'apps.reports',
+    'apps.sales',
     'apps.core',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'apps.core.middleware.ServerTimingMiddleware',
+    'apps.core.middleware.CompressionMiddleware',
+    'apps.core.middleware.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -70,6 +77,16 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
+# Read replicas. Environment settings list replica aliases from DATABASES in
+# DATABASE_REPLICAS; views opt in through ReplicaReadMixin. A replica lagging
+# more than REPLICA_MAX_LAG seconds is skipped, and clients are pinned to the
+# primary for READ_YOUR_WRITES_SECONDS after their own writes.
+DATABASE_ROUTERS = ['apps.core.db_routers.ReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_MAX_LAG = config('REPLICA_MAX_LAG', default=5.0, cast=float)
+REPLICA_LAG_CHECK_INTERVAL = config('REPLICA_LAG_CHECK_INTERVAL', default=1.0, cast=float)
+READ_YOUR_WRITES_SECONDS = config('READ_YOUR_WRITES_SECONDS', default=10, cast=int)
+
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.User'
 
@@ -105,12 +122,24 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.accounts.authentication.ClaimsJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'apps.core.renderers.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'apps.core.throttling.CostBasedThrottle',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': [
@@ -121,6 +150,53 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+# MessagePack is negotiated (Accept / Content-Type: application/msgpack) when
+# the msgpack package from requirements.txt is installed
+if importlib.util.find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].insert(1, 'apps.core.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append('apps.core.parsers.MessagePackParser')
+
+# Response compression (apps.core.middleware.CompressionMiddleware): bodies of
+# these content types of at least COMPRESSION_MIN_SIZE bytes are brotli- (when
+# installed) or gzip-encoded for clients that accept it. Levels are 1-9 for
+# gzip and 0-11 for brotli; higher is smaller and slower.
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+COMPRESSION_GZIP_LEVEL = config('COMPRESSION_GZIP_LEVEL', default=6, cast=int)
+COMPRESSION_BROTLI_LEVEL = config('COMPRESSION_BROTLI_LEVEL', default=5, cast=int)
+COMPRESSION_CONTENT_TYPES = ('application/json', 'application/msgpack', 'application/vnd.oai.openapi')
+
+# Delta sync (changes/ endpoints; apps.core.sync). Pages stop at rows written
+# SYNC_COMMIT_LAG seconds ago, so every transaction that stamped a row before
+# the cursor has committed by the time the cursor passes it: keep it above the
+# longest write transaction plus any clock skew between app servers.
+SYNC_COMMIT_LAG = config('SYNC_COMMIT_LAG', default=5.0, cast=float)
+SYNC_PAGE_SIZE = config('SYNC_PAGE_SIZE', default=500, cast=int)
+
+# Cost-based throttling (apps.core.throttling): each request is charged its
+# action's throttle_costs entry (1 if undeclared) against the user's bucket,
+# sized by user type, and a supplier's grocery's bucket; unauthenticated
+# requests are charged per client address. A bucket holds up to 'capacity'
+# tokens and refills at 'rate' tokens per second. Buckets are shared through
+# Redis when REDIS_URL is set and kept per process otherwise.
+THROTTLE_BUCKETS = {
+    'admin': {
+        'capacity': config('THROTTLE_ADMIN_CAPACITY', default=3000, cast=int),
+        'rate': config('THROTTLE_ADMIN_RATE', default=30.0, cast=float),
+    },
+    'supplier': {
+        'capacity': config('THROTTLE_SUPPLIER_CAPACITY', default=1000, cast=int),
+        'rate': config('THROTTLE_SUPPLIER_RATE', default=10.0, cast=float),
+    },
+    'grocery': {
+        'capacity': config('THROTTLE_GROCERY_CAPACITY', default=3000, cast=int),
+        'rate': config('THROTTLE_GROCERY_RATE', default=30.0, cast=float),
+    },
+    'anon': {
+        'capacity': config('THROTTLE_ANON_CAPACITY', default=100, cast=int),
+        'rate': config('THROTTLE_ANON_RATE', default=1.0, cast=float),
+    },
+}
+
 # JWT Configuration
 from datetime import timedelta
 
@@ -128,6 +204,136 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
+    'TOKEN_OBTAIN_SERIALIZER': 'apps.accounts.serializers.CustomTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'apps.accounts.serializers.CustomTokenRefreshSerializer',
+}
+
+# How long a user's current token version may be served from the cache.
+# With a per-process cache this bounds how long a revoked token stays valid.
+TOKEN_VERSION_CACHE_TIMEOUT = config('TOKEN_VERSION_CACHE_TIMEOUT', default=60, cast=int)
+
+# Bulk supplier provisioning - the provision_suppliers command hashes
+# passwords across a process pool once a batch has at least
+# SUPPLIER_PROVISIONING_POOL_THRESHOLD rows. The API hashes in the request
+# worker, so it only takes SUPPLIER_PROVISIONING_REQUEST_ROWS accounts per
+# call; SUPPLIER_PROVISIONING_MAX_ROWS bounds bulk reassignment
+SUPPLIER_PROVISIONING_WORKERS = config('SUPPLIER_PROVISIONING_WORKERS', default=os.cpu_count() or 1, cast=int)
+SUPPLIER_PROVISIONING_POOL_THRESHOLD = config('SUPPLIER_PROVISIONING_POOL_THRESHOLD', default=16, cast=int)
+SUPPLIER_PROVISIONING_REQUEST_ROWS = config('SUPPLIER_PROVISIONING_REQUEST_ROWS', default=20, cast=int)
+SUPPLIER_PROVISIONING_MAX_ROWS = config('SUPPLIER_PROVISIONING_MAX_ROWS', default=1000, cast=int)
+
+# Soft-deleted items and groceries older than this are moved to the archive
+# tables by the purge_soft_deleted command
+SOFT_DELETE_RETENTION_DAYS = config('SOFT_DELETE_RETENTION_DAYS', default=90, cast=int)
+
+# POS SKU lookups - each worker keeps up to SKU_CACHE_SIZE recent (grocery,
+# SKU) rows for SKU_CACHE_TTL seconds. Item writes invalidate them at once in
+# every worker through the shared cache (REDIS_URL); without it, only in the
+# writing worker, and other workers may serve a row for up to SKU_CACHE_TTL.
+# Batch lookups and baskets accept at most SKU_LOOKUP_MAX_SKUS entries.
+SKU_CACHE_SIZE = config('SKU_CACHE_SIZE', default=50000, cast=int)
+SKU_CACHE_TTL = config('SKU_CACHE_TTL', default=300, cast=int)
+SKU_LOOKUP_MAX_SKUS = config('SKU_LOOKUP_MAX_SKUS', default=2000, cast=int)
+
+# Item name autocomplete - each worker indexes the names of the groceries it
+# is queried for, evicting the least recently used once it holds more than
+# AUTOCOMPLETE_MAX_ENTRIES entries (one per word of each name, about 65
+# bytes each with the names). Workers replay up to AUTOCOMPLETE_JOURNAL_SIZE
+# item changes from the cache and rebuild an index that is further behind, or
+# older than AUTOCOMPLETE_INDEX_TTL seconds. Without REDIS_URL the cache is per
+# process, so other workers' changes only show up once the index is rebuilt.
+AUTOCOMPLETE_MAX_ENTRIES = config('AUTOCOMPLETE_MAX_ENTRIES', default=2000000, cast=int)
+AUTOCOMPLETE_JOURNAL_SIZE = config('AUTOCOMPLETE_JOURNAL_SIZE', default=1000, cast=int)
+AUTOCOMPLETE_JOURNAL_TTL = config('AUTOCOMPLETE_JOURNAL_TTL', default=86400, cast=int)
+AUTOCOMPLETE_INDEX_TTL = config('AUTOCOMPLETE_INDEX_TTL', default=300, cast=int)
+AUTOCOMPLETE_MAX_RESULTS = config('AUTOCOMPLETE_MAX_RESULTS', default=50, cast=int)
+
+# Stock transfers between groceries move at most TRANSFER_MAX_LINES items
+TRANSFER_MAX_LINES = config('TRANSFER_MAX_LINES', default=1000, cast=int)
+
+# Reorder suggestions - consumption is averaged over REORDER_WINDOW_DAYS;
+# stock should last REORDER_LEAD_TIME_DAYS plus REORDER_SAFETY_DAYS at the
+# reorder point, and an order covers REORDER_COVER_DAYS more. Requests may
+# override each of these.
+REORDER_WINDOW_DAYS = config('REORDER_WINDOW_DAYS', default=28, cast=int)
+REORDER_LEAD_TIME_DAYS = config('REORDER_LEAD_TIME_DAYS', default=3, cast=int)
+REORDER_SAFETY_DAYS = config('REORDER_SAFETY_DAYS', default=2, cast=int)
+REORDER_COVER_DAYS = config('REORDER_COVER_DAYS', default=7, cast=int)
+
+# POS sales ingestion - takings accumulate in SALES_INCOME_SHARDS rows per
+# grocery and day (one per till) until rolled up into DailyIncome. A batch
+# holds at most SALES_MAX_RECEIPTS_PER_BATCH receipts.
+SALES_INCOME_SHARDS = config('SALES_INCOME_SHARDS', default=16, cast=int)
+SALES_MAX_RECEIPTS_PER_BATCH = config('SALES_MAX_RECEIPTS_PER_BATCH', default=500, cast=int)
+
+# Live events (/api/v1/events/; apps.core.events) - each worker buffers the
+# last SSE_BUFFER_SIZE events for clients resuming with Last-Event-ID (the
+# Redis stream is capped to the same length). Idle streams get a comment every
+# SSE_HEARTBEAT seconds and are closed after SSE_MAX_DURATION seconds;
+# clients reconnect after SSE_RETRY_MS milliseconds.
+SSE_BUFFER_SIZE = config('SSE_BUFFER_SIZE', default=10000, cast=int)
+SSE_HEARTBEAT = config('SSE_HEARTBEAT', default=15.0, cast=float)
+SSE_MAX_DURATION = config('SSE_MAX_DURATION', default=3600.0, cast=float)
+SSE_RETRY_MS = config('SSE_RETRY_MS', default=3000, cast=int)
+
+# Cache - shared Redis when configured, per-process memory otherwise
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Celery - report jobs go through Redis when configured; without it tasks
+# run eagerly in the requesting process, so no broker or worker is needed
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default=REDIS_URL or 'memory://')
+CELERY_TASK_ALWAYS_EAGER = config('CELERY_TASK_ALWAYS_EAGER', default=not REDIS_URL, cast=bool)
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TIMEZONE = TIME_ZONE
+
+# Periodic jobs for `celery -A config beat`; without beat run the matching
+# management commands (snapshot_inventory, rollup_sales_income) from cron
+CELERY_BEAT_SCHEDULE = {
+    'snapshot-inventory': {
+        'task': 'apps.items.tasks.snapshot_inventory',
+        'schedule': crontab(hour=0, minute=15),
+    },
+    'rollup-sales-income': {
+        'task': 'apps.sales.tasks.rollup_sales_income',
+        'schedule': 60.0,
+    },
+}
+
+# Report jobs - results above REPORT_INLINE_MAX_BYTES are written gzipped to
+# REPORT_STORAGE_DIR; all results are shared for REPORT_RESULT_TTL seconds.
+# Clients may long-poll a job from the async wait/ endpoint for up to
+# REPORT_MAX_WAIT seconds; ?wait= on the sync detail view holds a worker
+# thread, so it is capped at REPORT_SYNC_MAX_WAIT.
+REPORT_STORAGE_DIR = config('REPORT_STORAGE_DIR', default=str(BASE_DIR / 'var' / 'reports'))
+REPORT_INLINE_MAX_BYTES = config('REPORT_INLINE_MAX_BYTES', default=64 * 1024, cast=int)
+REPORT_RESULT_TTL = config('REPORT_RESULT_TTL', default=15 * 60, cast=int)
+REPORT_MAX_WAIT = config('REPORT_MAX_WAIT', default=20.0, cast=float)
+REPORT_SYNC_MAX_WAIT = config('REPORT_SYNC_MAX_WAIT', default=2.0, cast=float)
+REPORT_RETRY_AFTER = config('REPORT_RETRY_AFTER', default=2, cast=int)
+
+# Per-request Server-Timing header and N+1 query detection.
+# N_PLUS_ONE_ACTION and QUERY_BUDGET_ACTION are one of 'off', 'log' or
+# 'raise'; lower SAMPLE_RATE to profile only a fraction of production traffic.
+SERVER_TIMING = {
+    'ENABLED': config('SERVER_TIMING_ENABLED', default=True, cast=bool),
+    'SAMPLE_RATE': config('SERVER_TIMING_SAMPLE_RATE', default=1.0, cast=float),
+    'N_PLUS_ONE_THRESHOLD': config('N_PLUS_ONE_THRESHOLD', default=5, cast=int),
+    'N_PLUS_ONE_ACTION': config('N_PLUS_ONE_ACTION', default='log'),
+    'QUERY_BUDGET_ACTION': config('QUERY_BUDGET_ACTION', default='log'),
 }
 
 # Spectacular settings
@@ -33,10 +33,30 @@ except:
     # Fallback to SQLite if PostgreSQL not available
     pass
 
+# Optional read replica: a Postgres standby (DB_REPLICA_HOST) or, locally, a
+# second SQLite file refreshed with `manage.py sync_local_replica`
+if config('DB_REPLICA_HOST', default=None) and DATABASES['default']['ENGINE'].endswith('postgresql'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': config('DB_REPLICA_HOST'),
+        'PORT': config('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+elif config('USE_SQLITE_REPLICA', default=False, cast=bool) and DATABASES['default']['ENGINE'].endswith('sqlite3'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
 # Neo4j Configuration
 NEO4J_URI = config('NEO4J_URI', default='bolt://localhost:7687')
 NEO4J_USER = config('NEO4J_USER', default='neo4j')
 NEO4J_PASSWORD = config('NEO4J_PASSWORD', default='password123')
+# 'neo4j' for the real server, 'local' for the in-process stand-in
+NEO4J_BACKEND = config('NEO4J_BACKEND', default='neo4j')
+NEO4J_LOCAL_LATENCY = config('NEO4J_LOCAL_LATENCY', default=0.0, cast=float)
 
 
 # Development-specific settings
@@ -25,6 +25,9 @@ urlpatterns = [
         path('api/v1/groceries/', include('apps.groceries.urls')),
         path('api/v1/items/', include('apps.items.urls')),
         path('api/v1/income/', include('apps.income.urls')),
+        path('api/v1/reports/', include('apps.reports.urls')),
+        path('api/v1/sales/', include('apps.sales.urls')),
+        path('api/v1/events/', include('apps.core.urls')),
         
     # API Documentation
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
@@ -1,5 +1,10 @@
-from neo4j import GraphDatabase
+import asyncio
+import time
+import weakref
+
+from neo4j import AsyncGraphDatabase, GraphDatabase
 from django.conf import settings
+from apps.core.instrumentation import record_neo4j
 
 class Neo4jConnection:
     def __init__(self):
@@ -7,15 +12,120 @@ class Neo4jConnection:
             settings.NEO4J_URI,
             auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
         )
-    
+
     def close(self):
         if self.driver is not None:
             self.driver.close()
-    
+
     def query(self, query, parameters=None, db=None):
-        with self.driver.session(database=db) as session:
+        with record_neo4j(), self.driver.session(database=db) as session:
             result = session.run(query, parameters)
             return [record for record in result]
 
-# Singleton instance
-neo4j_db = Neo4jConnection()
+class LocalGraphConnection:
+    """
+    In-process stand-in for Neo4j used by benchmarks and tests.
+
+    Every query returns no records after an optional simulated latency.
+    """
+    def __init__(self):
+        self.latency = getattr(settings, 'NEO4J_LOCAL_LATENCY', 0.0)
+        self.calls = 0
+
+    def close(self):
+        pass
+
+    def query(self, query, parameters=None, db=None):
+        with record_neo4j():
+            self.calls += 1
+            if self.latency:
+                time.sleep(self.latency)
+            return []
+
+GRAPH_BACKENDS = {
+    'neo4j': Neo4jConnection,
+    'local': LocalGraphConnection,
+}
+
+class GraphConnectionProxy:
+    """Resolve the graph backend from settings on use, so it can be swapped"""
+    def __init__(self):
+        self._connections = {}
+
+    @property
+    def connection(self):
+        backend = getattr(settings, 'NEO4J_BACKEND', 'neo4j')
+        if backend not in self._connections:
+            self._connections[backend] = GRAPH_BACKENDS[backend]()
+        return self._connections[backend]
+
+    def close(self):
+        for connection in self._connections.values():
+            connection.close()
+        self._connections.clear()
+
+    def query(self, query, parameters=None, db=None):
+        return self.connection.query(query, parameters, db)
+
+class AsyncNeo4jConnection:
+    def __init__(self):
+        self.driver = AsyncGraphDatabase.driver(
+            settings.NEO4J_URI,
+            auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
+        )
+
+    async def close(self):
+        if self.driver is not None:
+            await self.driver.close()
+
+    async def query(self, query, parameters=None, db=None):
+        with record_neo4j():
+            async with self.driver.session(database=db) as session:
+                result = await session.run(query, parameters)
+                return [record async for record in result]
+
+class AsyncLocalGraphConnection(LocalGraphConnection):
+    """Async counterpart of LocalGraphConnection; latency is awaited, not slept"""
+    async def close(self):
+        pass
+
+    async def query(self, query, parameters=None, db=None):
+        with record_neo4j():
+            self.calls += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return []
+
+ASYNC_GRAPH_BACKENDS = {
+    'neo4j': AsyncNeo4jConnection,
+    'local': AsyncLocalGraphConnection,
+}
+
+class AsyncGraphConnectionProxy:
+    """
+    Async graph connection resolved from settings on use.
+
+    Async drivers are bound to the event loop that created them, so one
+    connection is kept per running loop.
+    """
+    def __init__(self):
+        self._connections = weakref.WeakKeyDictionary()
+
+    @property
+    def connection(self):
+        backend = getattr(settings, 'NEO4J_BACKEND', 'neo4j')
+        connections = self._connections.setdefault(asyncio.get_running_loop(), {})
+        if backend not in connections:
+            connections[backend] = ASYNC_GRAPH_BACKENDS[backend]()
+        return connections[backend]
+
+    async def close(self):
+        for connection in self._connections.pop(asyncio.get_running_loop(), {}).values():
+            await connection.close()
+
+    async def query(self, query, parameters=None, db=None):
+        return await self.connection.query(query, parameters, db)
+
+# Singleton instances
+neo4j_db = GraphConnectionProxy()
+async_neo4j_db = AsyncGraphConnectionProxy()
@@ -1,4 +1,12 @@
-from .connection import neo4j_db
+from .connection import async_neo4j_db, neo4j_db
+
+GROCERY_ANALYTICS_QUERY = """
+MATCH (g:Grocery {id: $grocery_id})<-[:BELONGS_TO]-(i:Item)
+RETURN g.name as grocery_name, 
+       count(i) as total_items,
+       avg(i.price) as avg_price,
+       collect(DISTINCT i.type) as item_types
+"""
 
 class GroceryGraphQueries:
     @staticmethod
@@ -13,6 +21,19 @@ class GroceryGraphQueries:
             'location': location
         })
     
+    @staticmethod
+    def update_grocery_node(grocery_id, name, location):
+        query = """
+        MERGE (g:Grocery {id: $grocery_id})
+        SET g.name = $name, g.location = $location
+        RETURN g
+        """
+        return neo4j_db.query(query, {
+            'grocery_id': grocery_id,
+            'name': name,
+            'location': location
+        })
+    
     @staticmethod
     def create_item_node(item_id, name, item_type, price, grocery_id):
         query = """
@@ -30,12 +51,59 @@ class GroceryGraphQueries:
         })
     
     @staticmethod
-    def get_grocery_analytics(grocery_id):
+    def delete_item_node(item_id):
+        query = """
+        MATCH (i:Item {id: $item_id})
+        DETACH DELETE i
+        """
+        return neo4j_db.query(query, {'item_id': item_id})
+    
+    @staticmethod
+    def create_item_nodes(grocery_id, items):
+        """Upsert item nodes (dicts of id, name, type, price) under a grocery"""
+        query = """
+        MATCH (g:Grocery {id: $grocery_id})
+        UNWIND $items AS item
+        MERGE (i:Item {id: item.id})
+        SET i.name = item.name, i.type = item.type, i.price = item.price
+        MERGE (i)-[:BELONGS_TO]->(g)
+        """
+        return neo4j_db.query(query, {'grocery_id': grocery_id, 'items': items})
+    
+    @staticmethod
+    def delete_item_nodes(item_ids):
+        query = """
+        MATCH (i:Item) WHERE i.id IN $item_ids
+        DETACH DELETE i
+        """
+        return neo4j_db.query(query, {'item_ids': list(item_ids)})
+    
+    @staticmethod
+    def delete_grocery_node(grocery_id):
+        """Remove a grocery node together with its item nodes"""
+        query = """
+        MATCH (g:Grocery {id: $grocery_id})
+        OPTIONAL MATCH (g)<-[:BELONGS_TO]-(i:Item)
+        DETACH DELETE i, g
+        """
+        return neo4j_db.query(query, {'grocery_id': grocery_id})
+    
+    @staticmethod
+    def delete_grocery_nodes(grocery_ids):
         query = """
-        MATCH (g:Grocery {id: $grocery_id})<-[:BELONGS_TO]-(i:Item)
-        RETURN g.name as grocery_name, 
-               count(i) as total_items,
-               avg(i.price) as avg_price,
-               collect(DISTINCT i.type) as item_types
+        MATCH (g:Grocery) WHERE g.id IN $grocery_ids
+        OPTIONAL MATCH (g)<-[:BELONGS_TO]-(i:Item)
+        DETACH DELETE i, g
         """
-        return neo4j_db.query(query, {'grocery_id': grocery_id})
\ No newline at end of file
+        return neo4j_db.query(query, {'grocery_ids': list(grocery_ids)})
+    
+    @staticmethod
+    def get_grocery_analytics(grocery_id):
+        return neo4j_db.query(GROCERY_ANALYTICS_QUERY, {'grocery_id': grocery_id})
+
+
+class AsyncGroceryGraphQueries:
+    """Read queries for async views, on the async driver"""
+    @staticmethod
+    async def get_grocery_analytics(grocery_id):
+        return await async_neo4j_db.query(GROCERY_ANALYTICS_QUERY, {'grocery_id': grocery_id})